@@ -15,16 +15,54 @@
 
 # Code adapted from https://developers.google.com/calendar/quickstart/python
 from __future__ import print_function
+import asyncio
+import contextlib
+import functools
 import json
 import datetime
+import email.utils
+import enum
+import inspect
+import time
 import pickle
+import queue
+import random
 import os.path
+import re
+import shutil
+import sys
+import bisect
+import collections
+import gzip
+import heapq
+import itertools
+import sqlite3
+import threading
+import zoneinfo
+from concurrent.futures import ThreadPoolExecutor
+import httplib2
+from dateutil.rrule import rrulestr
 from googleapiclient.discovery import build
+from googleapiclient.errors import HttpError
+from googleapiclient.http import HttpRequest
+from google_auth_httplib2 import AuthorizedHttp
 from google_auth_oauthlib.flow import InstalledAppFlow
 from google.auth.transport.requests import Request
 
 # If modifying these scopes, delete the file token.pickle.
 SCOPES = ['https://www.googleapis.com/auth/calendar']
+TOKEN_FILE = 'token.pickle'
+TOKEN_REFRESH_MARGIN = datetime.timedelta(minutes=5)
+CREDENTIALS_LOCK = threading.Lock()
+HTTP_POOL = threading.local()
+HTTP_TIMEOUT = 60
+# Environment variable which makes get_calendar_api() return an in-process CalendarEmulator instead of the real API,
+# set to 1 for empty calendars or to the path of an NDJSON or JSON array file of events to load
+EMULATOR_ENV = "CALENDAR_EMULATOR"
+# Environment variable naming a file the main program keeps up to date with its metrics in Prometheus text format
+METRICS_ENV = "CALENDAR_METRICS_FILE"
+# Environment variable choosing how the main program lists events: text, or tsv or jsonl for piping to other tools
+OUTPUT_FORMAT_ENV = "CALENDAR_OUTPUT_FORMAT"
 
 months = {
     "JAN": "01",
@@ -40,21 +78,134 @@ months = {
     "NOV": "11",
     "DEC": "12"
 }
-HOUR_ADJUSTMENT = "+10:00"
+# IANA time zone of users who have not configured one
+DEFAULT_TIME_ZONE = "Australia/Melbourne"
 MAX_YEAR = 2050
+# Years covered by the precomputed UTC offset transitions of each time zone
+TRANSITION_YEARS = (1970, MAX_YEAR + 1)
+# Longest string parse_datetimes accepts, an RFC 3339 dateTime with nanoseconds and an offset
+MAX_DATETIME_LENGTH = 35
+DEFAULT_PAGE_SIZE = 250
+# Blocks of an IntervalIndex are split in two of this many intervals once they hold more than twice as many
+INTERVAL_BLOCK_SIZE = 64
+# Partial response projection holding only what the display and search paths read
+LIST_FIELDS = "nextPageToken,items(id,status,summary,start)"
+# Item fields searched by keyword, the same ones the cache's keyword index covers
+SEARCH_FIELDS = "nextPageToken,items(id,status,summary,start,location,description,attendees(email))"
+# Item fields needed to expand recurring events locally, added to any partial response projection
+RECURRENCE_FIELDS = ("end", "recurrence", "recurringEventId", "originalStartTime")
+CACHE_FILE = "events_cache.sqlite3"
+# Seconds for which a synced cache answers reads without asking the API for changes
+SYNC_INTERVAL = 30
+# The Calendar API accepts at most 50 calls in a single batch request
+BATCH_LIMIT = 50
+BATCH_RETRIES = 3
+RETRY_STATUSES = {403, 429, 500, 502, 503, 504}
+# API methods which only read calendars, so sending them leaves the cache in sync. freebusy.query is sent as a POST.
+READ_ONLY_METHODS = frozenset({"calendar.events.get", "calendar.events.list", "calendar.events.instances",
+                               "calendar.freebusy.query", "calendar.calendarList.get", "calendar.calendarList.list",
+                               "calendar.calendars.get", "calendar.colors.get", "calendar.settings.get",
+                               "calendar.settings.list"})
+RATE_LIMIT_REASONS = {"rateLimitExceeded", "userRateLimitExceeded"}
+# Requests per second allowed for the whole project and for each user, after an initial burst
+PROJECT_RATE = 100
+USER_RATE = 10
+RATE_BURST = 50
+MAX_RETRIES = 5
+BACKOFF_BASE_DELAY = 1
+BACKOFF_MAX_DELAY = 64
+BULK_ACTIONS = ("delete", "cancel", "restore")
+DEFAULT_MAX_IN_FLIGHT = 8
+# Seconds for which an events list response answers identical list requests, and the bounds of the read cache
+READ_CACHE_TTL = 10
+READ_CACHE_ENTRIES = 256
+READ_CACHE_BYTES = 32 * 1024 * 1024
+# Calendars read at once when an EventManager covers several calendars
+DEFAULT_MAX_PARALLEL = 8
+# Events each concurrently read calendar or shard may fetch ahead of the caller, and how often a reader the caller
+# stopped consuming checks whether it should give up
+STREAM_QUEUE_SIZE = DEFAULT_PAGE_SIZE
+STREAM_POLL_INTERVAL = 0.1
+# Key added to events read from several calendars, holding the calendar each event came from
+SOURCE_FIELD = "calendarId"
+# The free/busy endpoint accepts at most 50 calendars per query
+FREEBUSY_CALENDAR_LIMIT = 50
+# Longest window a single free/busy query may cover, a little under the endpoint's limit of about two months
+FREEBUSY_MAX_SPAN = datetime.timedelta(days=60)
+# Events are created with maxAttendees=20, so free slots are only searched for that many attendees
+MAX_ATTENDEES = 20
+DEFAULT_WORKING_HOURS = (datetime.time(9), datetime.time(17))
+SLOT_STEP = datetime.timedelta(minutes=30)
+DEFAULT_SLOT_LIMIT = 10
+CHECKPOINT_SUFFIX = ".checkpoint"
+EXPORT_FORMATS = ("ndjson", "ndjson.gz", "ics")
+EXPORT_BUFFER_SIZE = 1024 * 1024
+ICS_LINE_LIMIT = 75
+ICS_HEADER = "BEGIN:VCALENDAR\r\nVERSION:2.0\r\nPRODID:-//MyEventManager//EN\r\n"
+ICS_FOOTER = "END:VCALENDAR\r\n"
+JSON_CHUNK_SIZE = 64 * 1024
+MAX_RECORD_SIZE = 16 * 1024 * 1024
+JSON_WHITESPACE = re.compile(r"[ \t\n\r]*")
+OUTPUT_FORMATS = ("text", "tsv", "jsonl")
+OUTPUT_COLUMNS = ("number", "id", "status", "date", "time", "offset", "summary")
+OUTPUT_RULE = "-" * 73
+# Starts of API resources which are shown by slicing the string, without parsing it
+START_PATTERN = re.compile(r"(\d{4}-\d{2}-\d{2})T(\d{2}:\d{2}):\d{2}(?:\.\d+)?(Z|[+-]\d{2}:\d{2})")
+TSV_ESCAPES = str.maketrans({"\\": "\\\\", "\t": "\\t", "\n": "\\n", "\r": "\\r"})
+SHARD_MONTHS = {
+    "year": 12,
+    "quarter": 3,
+    "month": 1
+}
+TOKEN_PATTERN = re.compile(r"[a-z0-9]+")
+METRICS_NAMESPACE = "myeventmanager"
+# Upper bounds in seconds of the buckets of every timing histogram
+HISTOGRAM_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+METRIC_HELP = {
+    "method_seconds": "Time spent in EventManager methods, including the API requests they make.",
+    "api_request_seconds": "Time taken by API requests, including rate limiting, retries and decoding.",
+    "api_decode_seconds": "Time spent decoding API responses.",
+    "api_calls_total": "API requests made, by method and outcome. Requests in batches are counted on their own.",
+    "api_request_bytes_total": "Bytes of request bodies sent to the API.",
+    "api_response_bytes_total": "Bytes of response bodies received from the API.",
+    "api_retries_total": "API requests retried, by the status of the error they failed with.",
+    "cache_requests_total": "Cache reads answered without syncing (hit) or after syncing with the API (miss).",
+    "read_cache_requests_total": "List requests answered by the read cache (hit), by joining an identical request "
+                                 "in flight (shared) or by the API (miss)."
+}
+# EventManager methods whose calls are timed when metrics are enabled
+INSTRUMENTED_METHODS = ("get_upcoming_events", "iter_events", "list_events", "sync", "add_new_events",
+                        "add_events_bulk", "bulk_update", "find_conflicts", "find_free_slots", "get_events_from_year",
+                        "get_past_events", "get_future_events", "search_by_keyword", "search_cache", "delete_event",
+                        "cancel_event", "restore_event", "import_events", "export_events")
+# Relative weight of a keyword match in each indexed field when ranking search results
+FIELD_WEIGHTS = {
+    "summary": 3,
+    "location": 2,
+    "description": 1,
+    "attendees": 1
+}
 
 
+@functools.lru_cache(maxsize=None)
 def get_calendar_api():
     """
     Get an object which allows you to consume the Google Calendar API.
     You do not need to worry about what this function exactly does, nor create test cases for it.
+    The service is built once per process from the discovery document bundled with the client library, and every
+    thread reuses its own pooled HTTP connection.
+    When CALENDAR_EMULATOR is set, an offline emulator of the API is returned instead.
     """
+    if os.environ.get(EMULATOR_ENV) is not None:
+        from MyEventManagerEmulator import CalendarEmulator
+        return CalendarEmulator.from_setting(os.environ[EMULATOR_ENV])
+
     creds = None
     # The file token.pickle stores the user's access and refresh tokens, and is
     # created automatically when the authorization flow completes for the first
     # time.
-    if os.path.exists('token.pickle'):
-        with open('token.pickle', 'rb') as token:
+    if os.path.exists(TOKEN_FILE):
+        with open(TOKEN_FILE, 'rb') as token:
             creds = pickle.load(token)
 
     # If there are no (valid) credentials available, let the user log in.
@@ -66,17 +217,1591 @@ def get_calendar_api():
                 'credentials.json', SCOPES)
             creds = flow.run_local_server(port=0)
         # Save the credentials for the next run
-        with open('token.pickle', 'wb') as token:
-            pickle.dump(creds, token)
+        save_credentials(creds)
+
+    return build('calendar', 'v3', http=get_authorized_http(creds), static_discovery=True,
+                 requestBuilder=functools.partial(build_request, creds))
+
+
+def save_credentials(creds):
+    """
+    Save the credentials so that the next run does not need to log in or refresh again
+    """
+    with open(TOKEN_FILE, 'wb') as token:
+        pickle.dump(creds, token)
+
+
+def refresh_credentials(creds):
+    """
+    Refresh the access token once it is within TOKEN_REFRESH_MARGIN of expiring, rather than waiting for a request
+    to fail with an expired token
+    """
+    with CREDENTIALS_LOCK:
+        if creds.expiry is None or not creds.refresh_token:
+            return False
+        if creds.expiry - datetime.datetime.utcnow() > TOKEN_REFRESH_MARGIN:
+            return False
+        creds.refresh(Request())
+        save_credentials(creds)
+        return True
+
+
+def get_authorized_http(creds):
+    """
+    Return the current thread's authorised HTTP connection, creating it on first use.
+    httplib2 connections are not thread-safe, so each thread keeps its own and reuses it for every request.
+    """
+    http = getattr(HTTP_POOL, "http", None)
+    if http is None:
+        http = AuthorizedHttp(creds, http=httplib2.Http(timeout=HTTP_TIMEOUT))
+        HTTP_POOL.http = http
+    return http
+
+
+def build_request(creds, http, *args, **kwargs):
+    """
+    Request builder for the service which refreshes credentials ahead of expiry and sends the request over the
+    calling thread's pooled connection
+    """
+    refresh_credentials(creds)
+    return HttpRequest(get_authorized_http(creds), *args, **kwargs)
+
+
+def zone_transitions(zone, start_year, end_year):
+    """
+    Return the UTC timestamps at which the offset of a zoneinfo zone changes between the start of start_year and the
+    start of end_year, and the offset in seconds from each one on. The offset is sampled daily and every change
+    found is narrowed down to the second by bisection.
+    """
+    def offset(timestamp):
+        return int(datetime.datetime.fromtimestamp(timestamp, zone).utcoffset().total_seconds())
+
+    day = 24 * 60 * 60
+    timestamp = datetime.datetime(start_year, 1, 1, tzinfo=datetime.timezone.utc).timestamp()
+    end = datetime.datetime(end_year, 1, 1, tzinfo=datetime.timezone.utc).timestamp()
+    transitions = [float("-inf")]
+    offsets = [offset(timestamp)]
+    while timestamp < end:
+        if offset(timestamp + day) != offsets[-1]:
+            low, high = timestamp, timestamp + day
+            while high - low > 1:
+                middle = (low + high) // 2
+                if offset(middle) == offsets[-1]:
+                    low = middle
+                else:
+                    high = middle
+            transitions.append(high)
+            offsets.append(offset(high))
+        timestamp += day
+    return transitions, offsets
+
+
+class TimeZone:
+    """
+    An IANA time zone with its UTC offset transitions precomputed over TRANSITION_YEARS, so a batch of instants is
+    converted to local time with fixed offsets, found by walking the transitions, rather than a zone lookup per
+    call. The transitions are only computed for the first batch conversion, keeping them out of startup.
+    Use get_time_zone() to share one instance, and its tables, per zone.
+    """
+
+    def __init__(self, name):
+        self.name = name
+        self.zone = zoneinfo.ZoneInfo(name)
+        self.transitions = None
+        self.offsets = None
+        self.fixed = None
+        self.limits = (datetime.datetime(TRANSITION_YEARS[0], 1, 1, tzinfo=datetime.timezone.utc).timestamp(),
+                       datetime.datetime(TRANSITION_YEARS[1], 1, 1, tzinfo=datetime.timezone.utc).timestamp())
+
+    def build(self):
+        """
+        Compute the transition table, and the fixed offset timezone for each offset in it
+        """
+        transitions, offsets = zone_transitions(self.zone, *TRANSITION_YEARS)
+        self.fixed = {offset: datetime.timezone(datetime.timedelta(seconds=offset)) for offset in set(offsets)}
+        self.offsets = offsets
+        self.transitions = transitions
+
+    def __repr__(self):
+        return f"TimeZone({self.name!r})"
+
+    def localize(self, date_time):
+        """
+        Attach the zone to a naive local date and time, using the offset in effect at that time of year
+        """
+        return date_time.replace(tzinfo=self.zone)
+
+    def now(self):
+        """
+        Return the current local time in the zone
+        """
+        return datetime.datetime.now(self.zone)
+
+    def convert(self, timestamps):
+        """
+        Convert a batch of UTC timestamps to local datetimes with fixed offsets. Consecutive timestamps usually fall
+        between the same transitions, which are only searched again once a timestamp leaves them.
+        """
+        if self.transitions is None:
+            self.build()
+        converted = []
+        low = high = None
+        for timestamp in timestamps:
+            if not self.limits[0] <= timestamp < self.limits[1]:
+                converted.append(datetime.datetime.fromtimestamp(timestamp, self.zone))
+                continue
+            if low is None or not low <= timestamp < high:
+                position = bisect.bisect_right(self.transitions, timestamp) - 1
+                low = self.transitions[position]
+                high = self.transitions[position + 1] if position + 1 < len(self.transitions) else self.limits[1]
+                fixed = self.fixed[self.offsets[position]]
+            converted.append(datetime.datetime.fromtimestamp(timestamp, fixed))
+        return converted
+
+
+@functools.lru_cache(maxsize=None)
+def get_time_zone(name=DEFAULT_TIME_ZONE):
+    """
+    Return the TimeZone for an IANA zone name, building its transition table only once per process
+    """
+    return TimeZone(name)
+
+
+def shift_years(date_time, years):
+    """
+    Move a datetime by whole years, falling back to the 28th for 29 February in a year that is not a leap year
+    """
+    try:
+        return date_time.replace(year=date_time.year + years)
+    except ValueError:
+        return date_time.replace(year=date_time.year + years, day=28)
+
+
+def parse_datetime(date_time):
+    """
+    Parse an RFC 3339 dateTime or all-day date string into a timezone-aware datetime.
+    Strings without an offset are taken as local time in DEFAULT_TIME_ZONE.
+    """
+    if len(date_time) == 10:
+        date_time = f"{date_time}T00:00:00"
+    parsed = datetime.datetime.fromisoformat(date_time.replace("Z", "+00:00"))
+    if parsed.tzinfo is None:
+        parsed = get_time_zone().localize(parsed)
+    return parsed
+
+
+def to_utc_string(date_time):
+    """
+    Normalise an RFC 3339 dateTime or all-day date string to a UTC ISO string so that it sorts chronologically
+    """
+    return parse_datetime(date_time).astimezone(datetime.timezone.utc).isoformat()
+
+
+def parse_datetimes(strings, time_zone=None):
+    """
+    Parse a batch of RFC 3339 dateTime or date strings and DD-MON-YY dates into a NumPy datetime64[s] array of UTC
+    times in one vectorized pass, returning it with a boolean mask of the rows that are valid. Invalid rows are NaT.
+    Dates, and times without an offset, are local times in the TimeZone given or DEFAULT_TIME_ZONE. Fractions of a
+    second are checked and dropped. NumPy is only imported when this is called.
+    """
+    import numpy
+
+    # Lay the strings out as rows of ASCII codes, one column longer than the longest valid string so longer strings
+    # show up in their length. Characters outside ASCII can never be valid, so they are replaced by "?".
+    if not isinstance(strings, (list, numpy.ndarray)):
+        strings = list(strings)
+    width = MAX_DATETIME_LENGTH + 1
+    try:
+        text = numpy.array(strings, dtype=f"S{width}").reshape(-1)
+        chars = text.view(numpy.uint8).reshape(-1, width)
+    except UnicodeEncodeError:
+        text = numpy.array(strings, dtype=f"U{width}").reshape(-1)
+        codes = text.view(numpy.uint32).reshape(-1, width)
+        chars = numpy.where(codes < 128, codes, ord("?")).astype(numpy.uint8)
+    lengths = numpy.char.str_len(text)
+    count = len(chars)
+    rows = numpy.arange(count)
+    # Fields are read a column at a time, so columns are made contiguous. In digits, anything that is not a digit
+    # wraps around to 10 or more.
+    chars = numpy.asfortranarray(chars)
+    digits = chars - numpy.uint8(ord("0"))
+
+    def column(position, matrix=chars):
+        return matrix[:, position] if isinstance(position, int) else matrix[rows, position]
+
+    def is_char(position, symbols):
+        values = column(position)
+        matches = values == symbols[0]
+        for symbol in symbols[1:]:
+            matches |= values == symbol
+        return matches
+
+    def number(positions):
+        value = numpy.zeros(count, numpy.int32)
+        valid = numpy.ones(count, bool)
+        for position in positions:
+            digit = column(position, digits)
+            valid &= digit < 10
+            value *= 10
+            value += digit
+        return value.astype(numpy.int64), valid
+
+    # DD-MON-YY dates, as typed when creating an event, with month names looked up by their three character codes
+    short = (lengths == 9) & is_char(2, b"-") & is_char(6, b"-")
+    names = chars[:, 3].astype(numpy.int64) << 16 | chars[:, 4].astype(numpy.int64) << 8 | chars[:, 5]
+    codes = numpy.array([ord(name[0]) << 16 | ord(name[1]) << 8 | ord(name[2]) for name in sorted(months)])
+    position = numpy.minimum(numpy.searchsorted(codes, names), len(codes) - 1)
+    short_month = numpy.array([int(months[name]) for name in sorted(months)])[position]
+    short_day, short_valid = number((0, 1))
+    short_year, valid = number((7, 8))
+    short_valid &= valid & (codes[position] == names)
+
+    # RFC 3339 dates and dateTimes
+    year, valid = number((0, 1, 2, 3))
+    month, month_valid = number((5, 6))
+    day, day_valid = number((8, 9))
+    valid &= month_valid & day_valid & is_char(4, b"-") & is_char(7, b"-")
+    date_only = lengths == 10
+    hour, hour_valid = number((11, 12))
+    minute, minute_valid = number((14, 15))
+    second, second_valid = number((17, 18))
+    timed = (lengths >= 19) & is_char(10, b"Tt ") & is_char(13, b":") & is_char(16, b":") & hour_valid & \
+        minute_valid & second_valid & (hour < 24) & (minute < 60) & (second < 60)
+
+    # Columns counted back from the end of each string, where the offset is
+    end = [numpy.maximum(lengths - back, 0) for back in range(7)]
+    zulu = is_char(end[1], b"Zz")
+    numeric = is_char(end[6], b"+-") & is_char(end[3], b":")
+    offset_hours, hours_valid = number((end[5], end[4]))
+    offset_minutes, minutes_valid = number((end[2], end[1]))
+    numeric &= hours_valid & minutes_valid & (offset_hours < 24) & (offset_minutes < 60) & (lengths >= 25)
+    suffix = numpy.where(zulu, lengths - 1, numpy.where(numeric, lengths - 6, lengths))
+    # Anything between the seconds and the offset must be a fraction of a second
+    fractions = numpy.flatnonzero(timed & (suffix != 19))
+    inside = numpy.arange(20, width) < suffix[fractions, None]
+    timed[fractions] &= is_char(19, b".")[fractions] & (suffix[fractions] > 20) & \
+        ~(inside & (digits[fractions, 20:] >= 10)).any(axis=1)
+    valid &= date_only | timed
+
+    year = numpy.where(short, 2000 + short_year, year)
+    month = numpy.where(short, short_month, month)
+    day = numpy.where(short, short_day, day)
+    valid = numpy.where(short, short_valid, valid) & (month >= 1) & (month <= 12) & (day >= 1)
+    valid &= lengths <= MAX_DATETIME_LENGTH
+    year, month, day = numpy.where(valid, year, 1970), numpy.where(valid, month, 1), numpy.where(valid, day, 1)
+
+    month_start = ((year - 1970) * 12 + month - 1).astype("datetime64[M]")
+    days = (month_start + 1).astype("datetime64[D]") - month_start.astype("datetime64[D]")
+    valid &= day <= days.astype(numpy.int64)
+    local = (month_start.astype("datetime64[D]") + (day - 1)).astype("datetime64[s]").astype(numpy.int64)
+    timed &= ~short & ~date_only
+    local += numpy.where(timed, hour * 3600 + minute * 60 + second, 0)
+
+    # Offsets written in the string apply as they are, the rest come from the time zone's transition table
+    written = (offset_hours * 3600 + offset_minutes * 60) * numpy.where(is_char(end[6], b"-"), -1, 1)
+    time_zone = time_zone or get_time_zone()
+    if time_zone.transitions is None:
+        time_zone.build()
+    transitions = numpy.array(time_zone.transitions)
+    offsets = numpy.array(time_zone.offsets)
+    guess = offsets[numpy.searchsorted(transitions, local, side="right") - 1]
+    zoned = offsets[numpy.searchsorted(transitions, local - guess, side="right") - 1]
+    utc = local - numpy.where(timed & zulu, 0, numpy.where(timed & numeric, written, zoned))
+
+    return numpy.where(valid, utc.astype("datetime64[s]"), numpy.datetime64("NaT")), valid
+
+
+class EventStatus(enum.Enum):
+    """
+    Status of a calendar event. Members are singletons, so every event shares the same status objects.
+    """
+    CONFIRMED = "confirmed"
+    TENTATIVE = "tentative"
+    CANCELLED = "cancelled"
+
+
+class Event:
+    """
+    Compact calendar event. The start and end are parsed into timezone-aware datetimes once, and the full API resource
+    is kept as a JSON string so that it round-trips losslessly.
+    """
+    __slots__ = ("id", "summary", "status", "start", "end", "all_day", "resource")
+
+    def __init__(self, event_id, summary, status, start, end, all_day, resource):
+        self.id = event_id
+        self.summary = summary
+        self.status = status
+        self.start = start
+        self.end = end
+        self.all_day = all_day
+        self.resource = resource
+
+    @classmethod
+    def from_api(cls, resource):
+        """
+        Build an Event from an API event resource
+        """
+        start = resource.get("start", {})
+        end = resource.get("end", start)
+        start_time = start.get("dateTime", start.get("date"))
+        end_time = end.get("dateTime", end.get("date"))
+        return cls(resource.get("id"), resource.get("summary", ""),
+                   EventStatus(resource.get("status", "confirmed")),
+                   parse_datetime(start_time) if start_time else None,
+                   parse_datetime(end_time) if end_time else None,
+                   "date" in start, json.dumps(resource, separators=(",", ":")))
+
+    def to_api(self):
+        """
+        Return the API event resource this Event was built from, with its current status
+        """
+        resource = json.loads(self.resource)
+        if "status" in resource or self.status is not EventStatus.CONFIRMED:
+            resource["status"] = self.status.value
+        return resource
+
+    def __repr__(self):
+        return f"Event({self.id!r}, {self.summary!r}, {self.start.isoformat() if self.start else None})"
+
+
+def to_event(event):
+    """
+    Return the event as an Event, converting it if it is still an API resource dict
+    """
+    if isinstance(event, Event):
+        return event
+    return Event.from_api(event)
+
+
+def format_offset(date_time):
+    """
+    Format the UTC offset of a timezone-aware datetime as +HH:MM
+    """
+    minutes = int(date_time.utcoffset().total_seconds()) // 60
+    sign = "+" if minutes >= 0 else "-"
+    return f"{sign}{abs(minutes) // 60:02d}:{abs(minutes) % 60:02d}"
+
+
+def format_start(event):
+    """
+    Return the starting date and time of an Event for display, with all-day events shown as such
+    """
+    return start_columns(event.start, event.all_day)[:2]
+
 
-    return build('calendar', 'v3', credentials=creds)
+def start_columns(start, all_day):
+    """
+    Return the date, time and UTC offset a start is displayed with
+    """
+    date = f"{start.year:04d}-{start.month:02d}-{start.day:02d}"
+    return date, "All day" if all_day else f"{start.hour:02d}:{start.minute:02d}", format_offset(start)
+
+
+def event_start_key(event):
+    """
+    Sort key ordering events by their starting time
+    """
+    return to_utc_string(event["start"].get("dateTime", event["start"].get("date")))
+
+
+def add_item_fields(fields, extra):
+    """
+    Add item fields to a partial response projection of the form "...,items(a,b)". None, which asks for full event
+    bodies, is returned unchanged.
+    """
+    if fields is None or "items(" not in fields:
+        return fields
+    prefix, items = fields.split("items(", 1)
+    items = items[:-1].split(",")
+    items.extend(field for field in extra if field not in items)
+    return f"{prefix}items({','.join(items)})"
+
+
+def normalize_recurrence(recurrence):
+    """
+    Return recurrence rules as the list of RRULE, EXRULE, RDATE and EXDATE lines the API expects, accepting a single
+    line and a bare rule such as "FREQ=WEEKLY;COUNT=10"
+    """
+    lines = [recurrence] if isinstance(recurrence, str) else list(recurrence)
+    return [line if ":" in line else f"RRULE:{line}" for line in lines]
+
+
+def instance_id(master_id, start, all_day):
+    """
+    Return the id the API gives the instance of a recurring event starting at start
+    """
+    if all_day:
+        return f"{master_id}_{start:%Y%m%d}"
+    return f"{master_id}_{start.astimezone(datetime.timezone.utc):%Y%m%dT%H%M%SZ}"
+
+
+def expand_recurring_event(master, time_min, time_max=None, overrides=()):
+    """
+    Lazily yield the instances of a recurring event overlapping [time_min, time_max), or ending after time_min when
+    time_max is None, in order of their start. Instances are built as the API returns them with singleEvents=True,
+    repeating in the event's time zone, and those whose id is in overrides are left out.
+    """
+    all_day = "date" in master["start"]
+    start, end = event_times(master)
+    window_start = parse_datetime(time_min)
+    window_end = parse_datetime(time_max) if time_max is not None else None
+    if all_day:
+        # All-day events repeat on dates, so the window is compared in the local time of the dates
+        local = parse_datetime(start).tzinfo
+        dtstart = datetime.datetime.fromisoformat(start)
+        window_start = window_start.astimezone(local).replace(tzinfo=None)
+        if window_end is not None:
+            window_end = window_end.astimezone(local).replace(tzinfo=None)
+    else:
+        dtstart = parse_datetime(start)
+        if master["start"].get("timeZone"):
+            dtstart = dtstart.astimezone(get_time_zone(master["start"]["timeZone"]).zone)
+    length = (datetime.datetime.fromisoformat(end) if all_day else parse_datetime(end)) - dtstart
+
+    rules = rrulestr("\n".join(master["recurrence"]), dtstart=dtstart, forceset=True)
+    for occurrence in rules.xafter(window_start - length):
+        if window_end is not None and occurrence >= window_end:
+            break
+        if occurrence + length <= window_start:
+            continue
+        event_id = instance_id(master["id"], occurrence, all_day)
+        if event_id in overrides:
+            continue
+        instance = {key: value for key, value in master.items() if key != "recurrence"}
+        instance["id"] = event_id
+        instance["recurringEventId"] = master["id"]
+        if all_day:
+            instance["start"] = {"date": occurrence.date().isoformat()}
+            instance["end"] = {"date": (occurrence + length).date().isoformat()}
+        else:
+            instance["start"] = dict(master["start"], dateTime=occurrence.isoformat())
+            instance["end"] = dict(master.get("end", master["start"]), dateTime=(occurrence + length).isoformat())
+        instance["originalStartTime"] = instance["start"]
+        yield instance
+
+
+def expand_events(events, time_min, time_max=None, show_deleted=False):
+    """
+    Lazily yield, in order of their start, the events of a listing made with singleEvents=False, with every master
+    recurring event expanded into its instances in [time_min, time_max). Modified instances replace the instances
+    they were made from, and cancelled instances are dropped. Only the events which do not repeat are held in
+    memory.
+    """
+    singles = []
+    masters = []
+    overrides = set()
+    for event in events:
+        if "recurrence" in event:
+            if event.get("status") != "cancelled":
+                masters.append(event)
+            continue
+        if "recurringEventId" in event:
+            overrides.add(event["id"])
+            if event.get("status") == "cancelled":
+                continue
+        if show_deleted or event.get("status") != "cancelled":
+            singles.append(event)
+    singles.sort(key=event_start_key)
+    yield from heapq.merge(singles, *(expand_recurring_event(master, time_min, time_max, overrides)
+                                      for master in masters), key=event_start_key)
+
+
+def stream_concurrently(sources, max_parallel, key=None, queue_size=STREAM_QUEUE_SIZE):
+    """
+    Iterate source() for every source on a thread of its own, with at most max_parallel of them fetching at once,
+    and yield their items merged by key, or one source after another without a key. Each source runs at most
+    queue_size items ahead of the caller, so memory stays bounded however many items there are. An error raised by
+    a source is raised to the caller, and the sources stop once the caller stops iterating.
+    """
+    slots = threading.Semaphore(max_parallel)
+    stop = threading.Event()
+    queues = [queue.Queue(queue_size) for _ in sources]
+
+    def put(items, entry):
+        while not stop.is_set():
+            try:
+                items.put(entry, timeout=STREAM_POLL_INTERVAL)
+                return True
+            except queue.Full:
+                pass
+        return False
+
+    def produce(source, items):
+        try:
+            iterator = iter(source())
+            while True:
+                with slots:
+                    try:
+                        item = next(iterator)
+                    except StopIteration:
+                        break
+                if not put(items, (True, item)):
+                    return
+        except Exception as error:
+            put(items, (False, error))
+            return
+        put(items, (False, None))
+
+    def consume(items):
+        while True:
+            is_item, value = items.get()
+            if is_item:
+                yield value
+            elif value is None:
+                return
+            else:
+                raise value
+
+    for source, items in zip(sources, queues):
+        threading.Thread(target=produce, args=(source, items), daemon=True).start()
+    readers = [consume(items) for items in queues]
+    try:
+        yield from heapq.merge(*readers, key=key) if key is not None else itertools.chain(*readers)
+    finally:
+        stop.set()
+
+
+def split_time_range(time_min, time_max, shard="year"):
+    """
+    Split [time_min, time_max) into consecutive shards aligned to calendar years, quarters or months
+    """
+    if shard not in SHARD_MONTHS:
+        raise ValueError(f"Shard must be one of: {', '.join(SHARD_MONTHS)}.")
+
+    start = parse_datetime(time_min)
+    end = parse_datetime(time_max)
+    months_per_shard = SHARD_MONTHS[shard]
+    month = (start.month - 1) // months_per_shard * months_per_shard + months_per_shard
+    boundary = start.replace(year=start.year + month // 12, month=month % 12 + 1, day=1, hour=0, minute=0,
+                             second=0, microsecond=0)
+    shards = []
+    while boundary < end:
+        shards.append((start.isoformat(), boundary.isoformat()))
+        start = boundary
+        month = boundary.month - 1 + months_per_shard
+        boundary = boundary.replace(year=boundary.year + month // 12, month=month % 12 + 1)
+    shards.append((start.isoformat(), end.isoformat()))
+    return shards
+
+
+def split_span(time_min, time_max, span):
+    """
+    Split [time_min, time_max) into consecutive chunks of at most span, the first starting at time_min. A window no
+    longer than span is returned whole.
+    """
+    start = parse_datetime(time_min)
+    end = parse_datetime(time_max)
+    if end - start <= span:
+        return [(time_min, time_max)]
+    chunks = []
+    while end - start > span:
+        chunks.append((start.isoformat(), (start + span).isoformat()))
+        start += span
+    chunks.append((start.isoformat(), end.isoformat()))
+    return chunks
+
+
+def tokenize(text):
+    """
+    Split text into lowercase alphanumeric tokens
+    """
+    return TOKEN_PATTERN.findall(text.lower())
+
+
+def event_times(event):
+    """
+    Return the start and end strings of an event resource, using the start as the end if there is none
+    """
+    start = event["start"].get("dateTime", event["start"].get("date"))
+    end = event.get("end", event["start"])
+    return start, end.get("dateTime", end.get("date"))
+
+
+def to_timestamp(date_time):
+    """
+    Convert an RFC 3339 dateTime or all-day date string into seconds since the epoch
+    """
+    return parse_datetime(date_time).timestamp()
+
+
+def merge_intervals(intervals):
+    """
+    Merge (start, end) intervals into the disjoint intervals covering the same time, in order, by sweeping over them
+    sorted by start
+    """
+    merged = []
+    for start, end in sorted(intervals):
+        if merged and start <= merged[-1][1]:
+            merged[-1][1] = max(merged[-1][1], end)
+        else:
+            merged.append([start, end])
+    return [(start, end) for start, end in merged]
+
+
+def working_periods(time_min, time_max, working_hours=DEFAULT_WORKING_HOURS, time_zone=None):
+    """
+    Return the (start, end) timestamps of the working hours of every day between time_min and time_max, taking
+    working hours in the given TimeZone, or DEFAULT_TIME_ZONE
+    """
+    zone = (time_zone or get_time_zone()).zone
+    window_start = parse_datetime(time_min).astimezone(zone)
+    window_end = parse_datetime(time_max).astimezone(zone)
+    periods = []
+    day = window_start.date()
+    while day <= window_end.date():
+        start = max(datetime.datetime.combine(day, working_hours[0], zone), window_start)
+        end = min(datetime.datetime.combine(day, working_hours[1], zone), window_end)
+        if start < end:
+            periods.append((start.timestamp(), end.timestamp()))
+        day += datetime.timedelta(days=1)
+    return periods
+
+
+def rank_free_slots(busy, periods, duration, step):
+    """
+    Sweep the periods and the merged busy intervals together, both in order, and return the (start, end) timestamps
+    of every slot of duration seconds fitting in the gaps between them, starting at either end of a gap or on a
+    multiple of step. Slots flush against either end of a gap leave the rest of the gap in one piece, so they are
+    ranked first, then earlier slots before later ones.
+    """
+    candidates = []
+    position = 0
+    for period_start, period_end in periods:
+        while position < len(busy) and busy[position][1] <= period_start:
+            position += 1
+        gap_start = period_start
+        i = position
+        while gap_start < period_end:
+            gap_end = min(busy[i][0], period_end) if i < len(busy) else period_end
+            if gap_end - gap_start >= duration:
+                last = gap_end - duration
+                candidates.append((0, gap_start))
+                slot = (gap_start // step + 1) * step
+                while slot < last:
+                    candidates.append((1, slot))
+                    slot += step
+                if last > gap_start:
+                    candidates.append((0, last))
+            if i >= len(busy) or busy[i][0] >= period_end:
+                break
+            gap_start = max(gap_start, busy[i][1])
+            i += 1
+    candidates.sort()
+    return [(start, start + duration) for rank, start in candidates]
+
+
+class IntervalIndex:
+    """
+    Index of [start, end) intervals, given as timestamps, answering overlap queries in O(log n) plus the blocks holding
+    matches. Intervals are kept sorted by start in blocks of up to 2 * INTERVAL_BLOCK_SIZE, over which a max-end
+    segment tree lets whole runs of blocks that end too early be skipped. Adding or removing an interval updates its
+    block's leaf and the leaf's ancestors; the tree is only rebuilt when a block is split or emptied.
+    """
+
+    def __init__(self):
+        self.intervals = {}
+        # Per block: the starts, ends and keys of its intervals, sorted by start
+        self.starts = []
+        self.ends = []
+        self.keys = []
+        # The first start of every block, to find the block an interval belongs in
+        self.firsts = []
+        self.tree = [float("-inf")] * 2
+        self.size = 1
+
+    def __len__(self):
+        return len(self.intervals)
+
+    def add(self, key, start, end):
+        """
+        Add an interval, replacing the interval previously added under the same key
+        """
+        self.remove(key)
+        self.intervals[key] = (start, end)
+        if not self.starts:
+            self.starts.append([start])
+            self.ends.append([end])
+            self.keys.append([key])
+            self.firsts.append(start)
+            self.build()
+            return
+        block = max(bisect.bisect_right(self.firsts, start) - 1, 0)
+        starts = self.starts[block]
+        position = bisect.bisect_right(starts, start)
+        starts.insert(position, start)
+        self.ends[block].insert(position, end)
+        self.keys[block].insert(position, key)
+        self.firsts[block] = starts[0]
+        if len(starts) > 2 * INTERVAL_BLOCK_SIZE:
+            for blocks in (self.starts, self.ends, self.keys):
+                blocks[block + 1:block + 1] = [blocks[block][INTERVAL_BLOCK_SIZE:]]
+                del blocks[block][INTERVAL_BLOCK_SIZE:]
+            self.firsts.insert(block + 1, self.starts[block + 1][0])
+            self.build()
+        elif end > self.tree[self.size + block]:
+            self.update(block, end)
+
+    def remove(self, key):
+        """
+        Remove the interval added under a key, if there is one
+        """
+        interval = self.intervals.pop(key, None)
+        if interval is None:
+            return
+        # Intervals starting together may be spread over several blocks, the first of which may start earlier
+        block = max(bisect.bisect_left(self.firsts, interval[0]) - 1, 0)
+        while True:
+            starts = self.starts[block]
+            position = bisect.bisect_left(starts, interval[0])
+            while position < len(starts) and starts[position] == interval[0] and self.keys[block][position] != key:
+                position += 1
+            if position < len(starts) and self.keys[block][position] == key:
+                break
+            block += 1
+        del starts[position]
+        end = self.ends[block].pop(position)
+        del self.keys[block][position]
+        if not starts:
+            for blocks in (self.starts, self.ends, self.keys, self.firsts):
+                del blocks[block]
+            self.build()
+            return
+        self.firsts[block] = starts[0]
+        if end >= self.tree[self.size + block]:
+            self.update(block, max(self.ends[block]))
+
+    def update(self, block, end):
+        """
+        Set the latest end of a block and recompute its ancestors in the tree
+        """
+        node = self.size + block
+        self.tree[node] = end
+        node //= 2
+        while node:
+            self.tree[node] = max(self.tree[2 * node], self.tree[2 * node + 1])
+            node //= 2
+
+    def build(self):
+        """
+        Build the segment tree holding the latest end of every run of blocks
+        """
+        size = 1
+        while size < len(self.ends):
+            size *= 2
+        tree = [float("-inf")] * (2 * size)
+        tree[size:size + len(self.ends)] = [max(ends) for ends in self.ends]
+        for node in range(size - 1, 0, -1):
+            tree[node] = max(tree[2 * node], tree[2 * node + 1])
+        self.tree = tree
+        self.size = size
+
+    def overlapping(self, start, end):
+        """
+        Yield the keys of the intervals overlapping [start, end), in order of their start
+        """
+        limit = bisect.bisect_left(self.firsts, end)
+        stack = [(1, 0, self.size)]
+        while stack:
+            node, low, high = stack.pop()
+            if low >= limit or self.tree[node] <= start:
+                continue
+            if node >= self.size:
+                starts, ends, keys = self.starts[low], self.ends[low], self.keys[low]
+                for position in range(bisect.bisect_left(starts, end)):
+                    if ends[position] > start:
+                        yield keys[position]
+            else:
+                middle = (low + high) // 2
+                stack.append((2 * node + 1, middle, high))
+                stack.append((2 * node, low, middle))
+
+
+class KeywordIndex:
+    """
+    In-memory inverted index from keyword tokens to the ids of the events containing them.
+    Covers the summary, location, description and attendee emails of each event.
+    """
+
+    def __init__(self):
+        self.postings = {}
+        self.documents = {}
+        self.tokens = []
+
+    def add(self, event):
+        """
+        Index an event, replacing whatever was previously indexed under the same id
+        """
+        self.remove(event["id"])
+        fields = {
+            "summary": event.get("summary", ""),
+            "location": event.get("location", ""),
+            "description": event.get("description", ""),
+            "attendees": " ".join(attendee.get("email", "") for attendee in event.get("attendees", []))
+        }
+        weights = {}
+        for field, text in fields.items():
+            for token in tokenize(text):
+                weights[token] = weights.get(token, 0) + FIELD_WEIGHTS[field]
+
+        for token, weight in weights.items():
+            if token not in self.postings:
+                self.postings[token] = {}
+                bisect.insort(self.tokens, token)
+            self.postings[token][event["id"]] = weight
+        self.documents[event["id"]] = list(weights)
+
+    def remove(self, event_id):
+        """
+        Drop an event from the index if it has been indexed
+        """
+        for token in self.documents.pop(event_id, []):
+            posting = self.postings[token]
+            del posting[event_id]
+            if not posting:
+                del self.postings[token]
+                del self.tokens[bisect.bisect_left(self.tokens, token)]
+
+    def matching_tokens(self, term, prefix=True):
+        """
+        Return the indexed tokens equal to the term, or starting with it when prefix is True
+        """
+        if not prefix:
+            return [term] if term in self.postings else []
+        start = bisect.bisect_left(self.tokens, term)
+        end = bisect.bisect_left(self.tokens, term + "\uffff")
+        return self.tokens[start:end]
+
+    def search(self, query, prefix=True):
+        """
+        Return the ids of the events matching every term of the query, highest ranked first
+        """
+        terms = tokenize(query)
+        if not terms:
+            return []
+
+        scores = None
+        for term in terms:
+            term_scores = {}
+            for token in self.matching_tokens(term, prefix):
+                for event_id, weight in self.postings[token].items():
+                    term_scores[event_id] = max(term_scores.get(event_id, 0), weight)
+            if scores is None:
+                scores = term_scores
+            else:
+                scores = {event_id: score + term_scores[event_id] for event_id, score in scores.items()
+                          if event_id in term_scores}
+            if not scores:
+                return []
+
+        return sorted(scores, key=lambda event_id: -scores[event_id])
+
+
+class EventCache:
+    """
+    On-disk SQLite store of calendar events along with the sync token of the last sync.
+    Non-cancelled events are also kept in memory in a timeline interval index, so time window queries are answered
+    without scanning the table.
+    """
+
+    def __init__(self, path=CACHE_FILE):
+        self.path = path
+        self.lock = threading.Lock()
+        self.connection = sqlite3.connect(path, check_same_thread=False)
+        self.index = KeywordIndex()
+        self.intervals = IntervalIndex()
+        self.timeline = IntervalIndex()
+        with self.lock, self.connection:
+            self.connection.execute("CREATE TABLE IF NOT EXISTS events (id TEXT PRIMARY KEY, start TEXT, "
+                                    "end TEXT, status TEXT, body TEXT)")
+            self.connection.execute("CREATE INDEX IF NOT EXISTS events_start ON events (start)")
+            self.connection.execute("CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT)")
+            for row in self.connection.execute("SELECT body FROM events WHERE status != 'cancelled'"):
+                self.index_event(json.loads(row[0]))
+
+    def index_event(self, event):
+        """
+        Add an event to the keyword index and the timeline, and to the busy interval index unless it is marked as
+        free time
+        """
+        self.index.add(event)
+        start, end = event_times(event)
+        start, end = to_timestamp(start), to_timestamp(end)
+        self.timeline.add(event["id"], start, end)
+        if event.get("transparency") == "transparent":
+            self.intervals.remove(event["id"])
+        else:
+            self.intervals.add(event["id"], start, end)
+
+    def get_sync_token(self):
+        """
+        Return the sync token saved by the last sync, or None if a full sync is still required
+        """
+        with self.lock:
+            row = self.connection.execute("SELECT value FROM meta WHERE key = 'sync_token'").fetchone()
+        return row[0] if row else None
+
+    def set_sync_token(self, sync_token):
+        """
+        Save the sync token to be used for the next incremental sync
+        """
+        with self.lock, self.connection:
+            self.connection.execute("INSERT OR REPLACE INTO meta (key, value) VALUES ('sync_token', ?)",
+                                    (sync_token,))
+
+    def store(self, event):
+        """
+        Insert or update an event. Deleted events only come back from the API as tombstones with an id and a
+        cancelled status, in which case the stored copy is marked as cancelled.
+        """
+        with self.lock, self.connection:
+            if "start" not in event:
+                row = self.connection.execute("SELECT body FROM events WHERE id = ?", (event["id"],)).fetchone()
+                if row is None:
+                    return
+                stored = json.loads(row[0])
+                stored.update(event)
+                event = stored
+
+            start, end = event_times(event)
+            self.connection.execute("INSERT OR REPLACE INTO events (id, start, end, status, body) "
+                                    "VALUES (?, ?, ?, ?, ?)",
+                                    (event["id"], to_utc_string(start), to_utc_string(end),
+                                     event.get("status", "confirmed"), json.dumps(event)))
+            if event.get("status") == "cancelled":
+                self.index.remove(event["id"])
+                self.intervals.remove(event["id"])
+                self.timeline.remove(event["id"])
+            else:
+                self.index_event(event)
+
+    def clear(self):
+        """
+        Remove every cached event and the sync token, forcing a full sync
+        """
+        with self.lock, self.connection:
+            self.connection.execute("DELETE FROM events")
+            self.connection.execute("DELETE FROM meta")
+            self.index = KeywordIndex()
+            self.intervals = IntervalIndex()
+            self.timeline = IntervalIndex()
+
+    def query(self, time_min, time_max, show_deleted=False):
+        """
+        Yield the cached events overlapping [time_min, time_max) in order of their starting time. Cancelled events
+        are not in the timeline, so only queries showing them fall back to the table.
+        """
+        if not show_deleted:
+            with self.lock:
+                event_ids = list(self.timeline.overlapping(to_timestamp(time_min), to_timestamp(time_max)))
+            yield from self.load(event_ids)
+            return
+
+        with self.lock:
+            rows = self.connection.execute("SELECT body FROM events WHERE end > ? AND start < ? ORDER BY start",
+                                           (to_utc_string(time_min), to_utc_string(time_max))).fetchall()
+        for row in rows:
+            yield json.loads(row[0])
+
+    def upcoming(self, time_min, count):
+        """
+        Return the first count cached, non-cancelled events ending after time_min, in order of their starting time
+        """
+        with self.lock:
+            event_ids = list(itertools.islice(self.timeline.overlapping(to_timestamp(time_min), float("inf")),
+                                              count))
+        return self.load(event_ids)
+
+    def search(self, query, prefix=True):
+        """
+        Return the cached, non-cancelled events matching every term of the query, highest ranked first
+        """
+        with self.lock:
+            event_ids = self.index.search(query, prefix)
+        return self.load(event_ids)
+
+    def overlapping(self, time_min, time_max):
+        """
+        Return the cached, non-cancelled and busy events overlapping [time_min, time_max), in order of their start
+        """
+        with self.lock:
+            event_ids = list(self.intervals.overlapping(to_timestamp(time_min), to_timestamp(time_max)))
+        return self.load(event_ids)
+
+    def load(self, event_ids):
+        """
+        Return the cached bodies of the events with the given ids, in the same order
+        """
+        bodies = {}
+        with self.lock:
+            for i in range(0, len(event_ids), 500):
+                chunk = event_ids[i:i + 500]
+                rows = self.connection.execute(f"SELECT id, body FROM events WHERE id IN "
+                                               f"({', '.join('?' * len(chunk))})", chunk)
+                bodies.update(rows)
+        return [json.loads(bodies[event_id]) for event_id in event_ids]
+
+
+class TokenBucket:
+    """
+    Token bucket allowing rate requests per second on average, with bursts of up to capacity requests
+    """
+
+    def __init__(self, rate, capacity, clock=time.monotonic):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.clock = clock
+        self.updated = clock()
+        self.lock = threading.Lock()
+
+    def reserve(self, cost=1):
+        """
+        Take cost tokens, returning how long the caller must wait before they are available
+        """
+        with self.lock:
+            now = self.clock()
+            self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+            self.tokens -= cost
+            if self.tokens >= 0:
+                return 0
+            return -self.tokens / self.rate
+
+
+class RequestScheduler:
+    """
+    Sends every API request, enforcing a token bucket rate limit for the project and for each user, and retrying
+    throttled or failed requests with jittered exponential backoff, honouring any Retry-After header
+    """
+
+    def __init__(self, project_rate=PROJECT_RATE, user_rate=USER_RATE, burst=RATE_BURST, max_retries=MAX_RETRIES,
+                 base_delay=BACKOFF_BASE_DELAY, max_delay=BACKOFF_MAX_DELAY, clock=time.monotonic, sleep=time.sleep,
+                 metrics=None):
+        self.project_bucket = TokenBucket(project_rate, burst, clock)
+        self.user_buckets = {}
+        self.user_rate = user_rate
+        self.burst = burst
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.clock = clock
+        self.sleep = sleep
+        self.lock = threading.Lock()
+        self.queue_depth = 0
+        self.retries = 0
+        self.throttled = 0
+        self.metrics = metrics
+
+    def user_bucket(self, user):
+        """
+        Return the token bucket of a user, creating it on first use
+        """
+        with self.lock:
+            if user not in self.user_buckets:
+                self.user_buckets[user] = TokenBucket(self.user_rate, self.burst, self.clock)
+            return self.user_buckets[user]
+
+    def acquire(self, user, cost=1):
+        """
+        Wait until both the project and the user have cost requests of quota available
+        """
+        cost = min(cost, self.burst)
+        wait = max(self.project_bucket.reserve(cost), self.user_bucket(user).reserve(cost))
+        if wait > 0:
+            self.sleep(wait)
+
+    def backoff(self, attempt):
+        """
+        Return a jittered exponential delay before the given retry attempt
+        """
+        return random.uniform(0, min(self.max_delay, self.base_delay * 2 ** attempt))
+
+    def retry_delay(self, errors, attempt):
+        """
+        Return how long to wait before retrying after the given errors: the longest Retry-After any of them asks for,
+        otherwise the jittered backoff of the attempt
+        """
+        delays = [delay for delay in map(retry_after, errors) if delay is not None]
+        return max(delays) if delays else self.backoff(attempt)
+
+    def execute(self, request, user=None, cost=1):
+        """
+        Execute a request once quota allows, retrying it while it fails with a retryable error
+        """
+        with self.lock:
+            self.queue_depth += 1
+        try:
+            attempt = 0
+            while True:
+                self.acquire(user, cost)
+                try:
+                    return request.execute()
+                except HttpError as error:
+                    if not is_retryable(error) or attempt == self.max_retries:
+                        raise
+                    self.record_retries([error])
+                    self.sleep(self.retry_delay([error], attempt))
+                    attempt += 1
+        finally:
+            with self.lock:
+                self.queue_depth -= 1
+
+    def record_retries(self, errors):
+        """
+        Count the retries made because of the given errors, including retried sub-requests of batches
+        """
+        with self.lock:
+            self.retries += len(errors)
+            self.throttled += sum(1 for error in errors if error.resp.status in (403, 429))
+        if self.metrics is not None:
+            for error in errors:
+                self.metrics.increment("api_retries_total", 1, (("status", str(error.resp.status)),))
+
+    def stats(self):
+        """
+        Return the number of requests waiting or in flight, and the number of retries and throttled responses
+        """
+        with self.lock:
+            return {"queue_depth": self.queue_depth, "retries": self.retries, "throttled": self.throttled}
+
+
+class ReadCoalescer:
+    """
+    Single-flight layer with a short-lived result cache for read requests. Identical requests made while one is in
+    flight wait for and share its response, and responses answer identical requests for ttl seconds afterwards.
+    The cache holds at most max_entries responses and max_bytes of them, evicting the least recently used first.
+    Responses are kept as JSON text, so every caller gets its own copy to modify.
+    """
+
+    def __init__(self, ttl=READ_CACHE_TTL, max_entries=READ_CACHE_ENTRIES, max_bytes=READ_CACHE_BYTES,
+                 clock=time.monotonic, metrics=None):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.clock = clock
+        self.metrics = metrics
+        self.lock = threading.Lock()
+        # Keys map to (expiry, JSON text) in least recently used order
+        self.entries = collections.OrderedDict()
+        self.size = 0
+        self.in_flight = {}
+        # Bumped by invalidate() so that fetches started before it do not fill the cache
+        self.generation = 0
+        self.hits = 0
+        self.misses = 0
+        self.shared = 0
+
+    def fetch(self, key, fetch):
+        """
+        Return the response to the request identified by key, calling fetch() only if no identical request is in
+        flight and no recent response is cached
+        """
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is not None and entry[0] > self.clock():
+                self.entries.move_to_end(key)
+                self.count("hit")
+                return json.loads(entry[1])
+            if entry is not None:
+                self.evict(key)
+            flight = self.in_flight.get(key)
+            leader = flight is None
+            if leader:
+                flight = self.in_flight[key] = {"done": threading.Event(), "generation": self.generation}
+            self.count("miss" if leader else "shared")
+
+        if not leader:
+            flight["done"].wait()
+            if "error" in flight:
+                raise flight["error"]
+            return json.loads(flight["text"]) if "text" in flight else flight["response"]
+
+        try:
+            response = fetch()
+            try:
+                flight["text"] = json.dumps(response)
+            except TypeError:
+                flight["response"] = response
+            return response
+        except Exception as error:
+            flight["error"] = error
+            raise
+        finally:
+            with self.lock:
+                del self.in_flight[key]
+                if "text" in flight and flight["generation"] == self.generation:
+                    self.store(key, flight["text"])
+            flight["done"].set()
+
+    def store(self, key, text):
+        """
+        Cache a response, evicting the least recently used ones to stay within the bounds
+        """
+        if len(text) > self.max_bytes:
+            return
+        if key in self.entries:
+            self.evict(key)
+        self.entries[key] = (self.clock() + self.ttl, text)
+        self.size += len(text)
+        while len(self.entries) > self.max_entries or self.size > self.max_bytes:
+            self.evict(next(iter(self.entries)))
+
+    def evict(self, key):
+        self.size -= len(self.entries.pop(key)[1])
+
+    def invalidate(self):
+        """
+        Forget every cached response, after a write may have changed what they would be
+        """
+        with self.lock:
+            self.entries.clear()
+            self.size = 0
+            self.generation += 1
+
+    def count(self, result):
+        if result == "hit":
+            self.hits += 1
+        elif result == "miss":
+            self.misses += 1
+        else:
+            self.shared += 1
+        if self.metrics is not None:
+            self.metrics.increment("read_cache_requests_total", 1, (("result", result),))
+
+    def stats(self):
+        """
+        Return the number of requests answered from the cache, by the API, and by sharing an identical request
+        """
+        with self.lock:
+            return {"hits": self.hits, "misses": self.misses, "shared": self.shared, "entries": len(self.entries),
+                    "bytes": self.size}
+
+
+class MetricsSink:
+    """
+    Receives the measurements of an EventManager: observations of timing histograms, counter increments and spans
+    around API requests. This sink discards everything, and subclasses record what they need. Metric names are
+    given without a namespace, and labels as a tuple of (name, value) pairs.
+    """
+
+    def observe(self, name, value, labels=()):
+        pass
+
+    def increment(self, name, amount=1, labels=()):
+        pass
+
+    def span(self, name, attributes=None):
+        return contextlib.nullcontext()
+
+
+class PrometheusSink(MetricsSink):
+    """
+    Aggregates measurements into counters and histograms, rendered in the Prometheus text exposition format
+    """
+
+    def __init__(self, namespace=METRICS_NAMESPACE, buckets=HISTOGRAM_BUCKETS):
+        self.namespace = namespace
+        self.buckets = tuple(buckets)
+        self.lock = threading.Lock()
+        self.counters = {}
+        # Histograms map labels to a count for every bucket and for +Inf, followed by the sum of the observations
+        self.histograms = {}
+
+    def observe(self, name, value, labels=()):
+        with self.lock:
+            series = self.histograms.setdefault(name, {})
+            values = series.get(labels)
+            if values is None:
+                values = series[labels] = [0] * (len(self.buckets) + 2)
+            values[bisect.bisect_left(self.buckets, value)] += 1
+            values[-1] += value
+
+    def increment(self, name, amount=1, labels=()):
+        with self.lock:
+            series = self.counters.setdefault(name, {})
+            series[labels] = series.get(labels, 0) + amount
+
+    def render(self):
+        """
+        Return every metric in the Prometheus text exposition format
+        """
+        lines = []
+        with self.lock:
+            for name, series in sorted(self.counters.items()):
+                self.render_header(lines, name, "counter")
+                for labels, value in sorted(series.items()):
+                    lines.append(f"{self.namespace}_{name}{format_labels(labels)} {value}")
+            for name, series in sorted(self.histograms.items()):
+                self.render_header(lines, name, "histogram")
+                for labels, values in sorted(series.items()):
+                    count = 0
+                    for bound, bucket in zip(self.buckets + (float("inf"),), values):
+                        count += bucket
+                        le = "+Inf" if bound == float("inf") else f"{bound:g}"
+                        lines.append(f"{self.namespace}_{name}_bucket{format_labels(labels + (('le', le),))} {count}")
+                    lines.append(f"{self.namespace}_{name}_sum{format_labels(labels)} {values[-1]!r}")
+                    lines.append(f"{self.namespace}_{name}_count{format_labels(labels)} {count}")
+        return "".join(line + "\n" for line in lines)
+
+    def render_header(self, lines, name, metric_type):
+        if name in METRIC_HELP:
+            lines.append(f"# HELP {self.namespace}_{name} {METRIC_HELP[name]}")
+        lines.append(f"# TYPE {self.namespace}_{name} {metric_type}")
+
+    def write(self, filename):
+        """
+        Write the metrics to a file, replacing it atomically so that a collector never reads it half written
+        """
+        with open(filename + ".tmp", "w") as metrics_file:
+            metrics_file.write(self.render())
+        os.replace(filename + ".tmp", filename)
+
+
+class OpenTelemetrySink(MetricsSink):
+    """
+    Opens an OpenTelemetry span around every API request, named after the API method. Needs the opentelemetry-api
+    package unless a tracer is given.
+    """
+
+    def __init__(self, tracer=None):
+        if tracer is None:
+            from opentelemetry import trace
+            tracer = trace.get_tracer(METRICS_NAMESPACE)
+        self.tracer = tracer
+
+    def span(self, name, attributes=None):
+        return self.tracer.start_as_current_span(name, attributes=attributes)
+
+
+class CombinedSink(MetricsSink):
+    """
+    Passes every measurement on to several sinks, such as a PrometheusSink and an OpenTelemetrySink
+    """
+
+    def __init__(self, *sinks):
+        self.sinks = sinks
+
+    def observe(self, name, value, labels=()):
+        for sink in self.sinks:
+            sink.observe(name, value, labels)
+
+    def increment(self, name, amount=1, labels=()):
+        for sink in self.sinks:
+            sink.increment(name, amount, labels)
+
+    def span(self, name, attributes=None):
+        stack = contextlib.ExitStack()
+        for sink in self.sinks:
+            stack.enter_context(sink.span(name, attributes))
+        return stack
+
+
+def format_labels(labels):
+    """
+    Format labels as a Prometheus label set, escaping their values
+    """
+    if not labels:
+        return ""
+    pairs = []
+    for name, value in labels:
+        value = str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+        pairs.append(f'{name}="{value}"')
+    return "{" + ",".join(pairs) + "}"
+
+
+def timed(metrics, name, method):
+    """
+    Wrap a bound method so that the duration of every call is observed in the method_seconds histogram. Generator
+    methods are timed from when they are first advanced until they are exhausted or closed.
+    """
+    labels = (("method", name),)
+    if inspect.isgeneratorfunction(method):
+        @functools.wraps(method)
+        def timed_generator(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                yield from method(*args, **kwargs)
+            finally:
+                metrics.observe("method_seconds", time.perf_counter() - start, labels)
+        return timed_generator
+
+    @functools.wraps(method)
+    def timed_method(*args, **kwargs):
+        start = time.perf_counter()
+        try:
+            return method(*args, **kwargs)
+        finally:
+            metrics.observe("method_seconds", time.perf_counter() - start, labels)
+    return timed_method
 
 
 class EventManager:
-    def __init__(self, api):
+    def __init__(self, api, cache=None, workers=1, shard="year", scheduler=None, user=None,
+                 sync_interval=SYNC_INTERVAL, calendar_ids=("primary",), max_parallel=DEFAULT_MAX_PARALLEL,
+                 expand_recurring=False, time_zone=DEFAULT_TIME_ZONE, metrics=None, reads=None):
+        if workers <= 0:
+            raise ValueError("Number of workers must be at least 1.")
+        if max_parallel <= 0:
+            raise ValueError("Maximum parallel calendars must be at least 1.")
+        self.calendar_ids = list(dict.fromkeys(calendar_ids))
+        if not self.calendar_ids:
+            raise ValueError("At least one calendar ID is required.")
         self.api = api
+        # A single cache belongs to the first calendar, otherwise cache maps calendar IDs to their own caches
+        if isinstance(cache, dict):
+            self.caches = dict(cache)
+        else:
+            self.caches = {} if cache is None else {self.calendar_ids[0]: cache}
+        self.cache = self.caches.get(self.calendar_ids[0])
+        self.workers = workers
+        self.shard = shard
+        self.scheduler = scheduler if scheduler is not None else RequestScheduler(metrics=metrics)
+        self.user = user
+        self.sync_interval = sync_interval
+        self.synced_at = {}
+        # One lock per calendar, held while its cache syncs so that concurrent stale reads wait for a single sync
+        self.sync_locks = {}
+        # Counts writes, so that a sync which overlapped a write does not mark the cache as fresh
+        self.writes = 0
+        self.max_parallel = max_parallel
+        # Fetch master recurring events and expand their instances locally, rather than having the API expand them
+        self.expand_recurring = expand_recurring
+        # The user's time zone, used for new events, year and past/future windows and working hours
+        self.time_zone = get_time_zone(time_zone)
+        # A MetricsSink receiving timings and counts, or None to measure nothing. Methods are only wrapped with
+        # timers when it is set, so a manager without metrics runs exactly the uninstrumented code.
+        self.metrics = metrics
+        # A ReadCoalescer, which may be shared between managers, answering identical list requests with one fetch
+        self.reads = reads
+        if metrics is not None:
+            for name in INSTRUMENTED_METHODS:
+                setattr(self, name, timed(metrics, name, getattr(self, name)))
+
+    def execute(self, request, cost=1, read_only=None):
+        """
+        Send a request, or a batch of cost requests, through the rate-limiting scheduler. Any method not in
+        READ_ONLY_METHODS may change the calendar, so the cache has to be synced again before it is next read.
+        A batch is only read-only if read_only says so.
+        """
+        if read_only is None:
+            read_only = getattr(request, "methodId", None) in READ_ONLY_METHODS
+        if not read_only:
+            self.writes += 1
+            self.synced_at.clear()
+            if self.reads is not None:
+                self.reads.invalidate()
+        if self.metrics is None:
+            return self.scheduler.execute(request, self.user, cost)
+
+        method_id = self.instrument_request(request)
+        status = "ok"
+        start = time.perf_counter()
+        try:
+            with self.metrics.span(method_id, {"http.method": getattr(request, "method", ""), "requests": cost}):
+                return self.scheduler.execute(request, self.user, cost)
+        except Exception as error:
+            status = error_status(error)
+            raise
+        finally:
+            labels = (("method", method_id),)
+            self.metrics.observe("api_request_seconds", time.perf_counter() - start, labels)
+            if method_id != "batch":
+                self.metrics.increment("api_calls_total", 1, labels + (("status", status),))
+
+    def instrument_request(self, request):
+        """
+        Count the bytes a request sends, and wrap the decoding of its response to time it and count the bytes
+        received. Returns the API method the request calls, or "batch" for a batch request.
+        """
+        method_id = getattr(request, "methodId", None) or "batch"
+        labels = (("method", method_id),)
+        body = getattr(request, "body", None)
+        if body:
+            self.metrics.increment("api_request_bytes_total", len(body), labels)
+        postproc = getattr(request, "postproc", None)
+        if postproc is not None:
+            metrics = self.metrics
+
+            def decode(resp, content):
+                start = time.perf_counter()
+                try:
+                    return postproc(resp, content)
+                finally:
+                    metrics.observe("api_decode_seconds", time.perf_counter() - start, labels)
+                    metrics.increment("api_response_bytes_total", len(content or b""), labels)
+
+            request.postproc = decode
+        return method_id
+
+    def fetch_list(self, **parameters):
+        """
+        Execute an events list request, through the ReadCoalescer if the manager has one. Requests are identified by
+        the API client and user they are sent with, since "primary" is a different calendar for every account, and
+        their parameters, with times normalised to UTC.
+        """
+        def fetch():
+            return self.execute(self.api.events().list(**parameters), read_only=True)
+
+        if self.reads is None:
+            return fetch()
+        key = tuple(sorted((name, to_utc_string(value) if name in ("timeMin", "timeMax") else value)
+                           for name, value in parameters.items() if value is not None))
+        return self.reads.fetch((self.api, self.user, key), fetch)
+
+    def refresh(self, page_size=DEFAULT_PAGE_SIZE, calendar_id=None):
+        """
+        Sync the cache of a calendar, the first one by default, unless it was synced less than sync_interval seconds
+        ago and nothing has been written since. Concurrent reads of a stale cache wait for one sync, which counts as
+        a miss for the read that ran it and a hit for the others.
+        """
+        calendar_id = calendar_id or self.calendar_ids[0]
+        stale = self.is_stale(calendar_id)
+        if stale:
+            with self.sync_locks.setdefault(calendar_id, threading.Lock()):
+                stale = self.is_stale(calendar_id)
+                if stale:
+                    writes = self.writes
+                    self.sync(page_size, calendar_id)
+                    if writes == self.writes:
+                        self.synced_at[calendar_id] = time.monotonic()
+        if self.metrics is not None:
+            self.metrics.increment("cache_requests_total", 1, (("result", "miss" if stale else "hit"),))
+
+    def is_stale(self, calendar_id):
+        """
+        Return whether the cache of a calendar has to be synced before it is read
+        """
+        synced_at = self.synced_at.get(calendar_id)
+        return synced_at is None or time.monotonic() - synced_at >= self.sync_interval
+
+    def fan_out(self, function, calendar_ids=None):
+        """
+        Call function(calendar_id) for every calendar, or the given ones, concurrently on at most max_parallel
+        threads, and return the lists of events it returns in calendar order. When the manager covers several
+        calendars each event is tagged with the calendar it came from under SOURCE_FIELD.
+        """
+        calendar_ids = self.calendar_ids if calendar_ids is None else calendar_ids
+        tag = len(self.calendar_ids) > 1
+
+        def collect(calendar_id):
+            events = list(function(calendar_id))
+            if tag:
+                for event in events:
+                    event[SOURCE_FIELD] = calendar_id
+            return events
+
+        if len(calendar_ids) <= 1:
+            return [collect(calendar_id) for calendar_id in calendar_ids]
+        with ThreadPoolExecutor(max_workers=min(self.max_parallel, len(calendar_ids))) as executor:
+            return list(executor.map(collect, calendar_ids))
+
+    def source_calendar(self, event):
+        """
+        Return the ID of the calendar an event was read from
+        """
+        return event.get(SOURCE_FIELD, self.calendar_ids[0])
 
-    def get_upcoming_events(self, starting_time, number_of_events):
+    def get_upcoming_events(self, starting_time, number_of_events, fields=LIST_FIELDS):
         """
         Shows basic usage of the Google Calendar API.
         Prints the start and name of the next n events on the user's calendar.
@@ -84,117 +1809,500 @@ class EventManager:
         if number_of_events <= 0:
             raise ValueError("Number of events must be at least 1.")
 
-        events_result = self.api.events().list(calendarId='primary', timeMin=starting_time,
-                                               maxResults=number_of_events, singleEvents=True,
-                                               orderBy='startTime').execute()
+        results = self.fan_out(lambda calendar_id: self.get_calendar_upcoming_events(
+            calendar_id, starting_time, number_of_events, fields))
+        return list(itertools.islice(heapq.merge(*results, key=event_start_key), number_of_events))
+
+    def get_calendar_upcoming_events(self, calendar_id, starting_time, number_of_events, fields=LIST_FIELDS):
+        """
+        Return the next n events of a single calendar, from its cache if it has one
+        """
+        cache = self.caches.get(calendar_id)
+        if cache is not None:
+            self.refresh(calendar_id=calendar_id)
+            return cache.upcoming(starting_time, number_of_events)
+
+        if self.expand_recurring:
+            events = expand_events(self.iter_api_events(starting_time, None, fields=fields, calendar_id=calendar_id),
+                                   starting_time)
+            return list(itertools.islice(events, number_of_events))
+
+        events_result = self.fetch_list(calendarId=calendar_id, timeMin=starting_time, maxResults=number_of_events,
+                                        singleEvents=True, orderBy='startTime', fields=fields)
 
         return events_result.get('items', [])
 
-    def add_new_events(self, name, location, attendees, date, time):
+    def add_new_events(self, name, location, attendees, date, time, recurrence=None):
         """
         Takes in VALIDATED user inputs and create an event to inserted into the calendar.
+        Given recurrence rules, such as "RRULE:FREQ=WEEKLY;COUNT=10", a recurring series is created instead.
         """
-        date[0] = convert_date_string(date[0])
-        date[1] = convert_date_string(date[1])
-
-        start_datetime = format_dateTime(date[0], time[0])
-        end_datetime = format_dateTime(date[1], time[1])
-
-        event = {
-            'summary': name,
-            'location': location,
-            'start': {
-                'dateTime': start_datetime,
-                'timeZone': 'Australia/Melbourne',
-            },
-            'end': {
-                'dateTime': end_datetime,
-                'timeZone': 'Australia/Melbourne',
-            },
-            'attendees': attendees,
-            'reminders': {
-                'useDefault': False,
-                'overrides': [
-                    {'method': 'email', 'minutes': 24 * 60},
-                    {'method': 'popup', 'minutes': 10},
-                ],
-            }
-        }
+        event = build_event(name, location, attendees, date, time, recurrence, self.time_zone.name)
 
-        event = self.api.events().insert(calendarId='primary', body=event, maxAttendees=20).execute()
+        event = self.execute(self.api.events().insert(calendarId=self.calendar_ids[0], body=event, maxAttendees=20))
         print('Event created: %s' % (event.get('summary')))
 
         return event
 
-    def get_events_from_year(self, year):
+    def iter_events(self, time_min, time_max, show_deleted=False, page_size=DEFAULT_PAGE_SIZE, fields=None):
         """
-        Return a list of all the events from a specified year
+        Lazily yield every event between time_min and time_max, following nextPageToken so that
+        only one page of results is held in memory at a time. fields is a partial response projection such as
+        LIST_FIELDS, or None for full event bodies. Several calendars are read concurrently and their events merged
+        into starting time order.
         """
-        time_min = f"{year}-01-01T00:00:00{HOUR_ADJUSTMENT}"
-        time_max = f"{year}-12-31T23:59:59{HOUR_ADJUSTMENT}"
-        events_response = self.api.events().list(calendarId="primary", singleEvents=True,
-                                                 orderBy="startTime", timeMin=time_min,
-                                                 timeMax=time_max).execute()
-        return events_response.get("items", [])
+        if page_size <= 0:
+            raise ValueError("Page size must be at least 1.")
+
+        if len(self.calendar_ids) == 1:
+            yield from self.iter_calendar_events(self.calendar_ids[0], time_min, time_max, show_deleted, page_size,
+                                                 fields)
+            return
+
+        def source(calendar_id):
+            for event in self.iter_calendar_events(calendar_id, time_min, time_max, show_deleted, page_size, fields):
+                event[SOURCE_FIELD] = calendar_id
+                yield event
 
-    def get_past_events(self):
+        yield from stream_concurrently([functools.partial(source, calendar_id) for calendar_id in self.calendar_ids],
+                                       self.max_parallel, key=event_start_key)
+
+    def iter_calendar_events(self, calendar_id, time_min, time_max, show_deleted=False, page_size=DEFAULT_PAGE_SIZE,
+                             fields=None):
         """
-        Get events up to 5 years in the past
+        Yield every event of a single calendar between time_min and time_max, from its cache if it has one
         """
-        time_max = datetime.datetime.utcnow().isoformat() + HOUR_ADJUSTMENT
-        time_min = f"{str(int(time_max[:4]) - 5)}{time_max[4:]}"
-        events_response = self.api.events().list(calendarId="primary", singleEvents=True,
-                                                 orderBy="startTime", timeMin=time_min,
-                                                 timeMax=time_max).execute()
-        return events_response
+        cache = self.caches.get(calendar_id)
+        if cache is not None:
+            self.refresh(page_size, calendar_id)
+            yield from cache.query(time_min, time_max, show_deleted)
+            return
+
+        if self.expand_recurring:
+            # Shards would each return the same master events, so the whole window is listed at once
+            yield from expand_events(self.iter_api_events(time_min, time_max, show_deleted, page_size, fields,
+                                                          calendar_id),
+                                     time_min, time_max, show_deleted)
+        elif self.workers > 1:
+            yield from self.iter_events_sharded(time_min, time_max, show_deleted, page_size, fields, calendar_id)
+        else:
+            yield from self.iter_api_events(time_min, time_max, show_deleted, page_size, fields, calendar_id)
 
-    def get_cancelled_past_events(self):
+    def iter_api_events(self, time_min, time_max, show_deleted=False, page_size=DEFAULT_PAGE_SIZE, fields=None,
+                        calendar_id=None):
         """
-        Get all events, including cancelled events up to 5 years in the past.
+        Request every page of events between time_min and time_max from the API in turn. When recurring events are
+        expanded locally the API returns master events unexpanded, in no particular order.
+        """
+        single_events = not self.expand_recurring
+        if self.expand_recurring:
+            fields = add_item_fields(fields, RECURRENCE_FIELDS)
+        page_token = None
+        while True:
+            events_response = self.fetch_list(calendarId=calendar_id or self.calendar_ids[0],
+                                              singleEvents=single_events,
+                                              orderBy="startTime" if single_events else None, timeMin=time_min,
+                                              timeMax=time_max, showDeleted=show_deleted,
+                                              maxResults=page_size, pageToken=page_token,
+                                              fields=fields)
+            for event in events_response.get("items", []):
+                yield event
+
+            page_token = events_response.get("nextPageToken")
+            if not page_token:
+                break
+
+    def iter_events_sharded(self, time_min, time_max, show_deleted=False, page_size=DEFAULT_PAGE_SIZE,
+                            fields=None, calendar_id=None):
+        """
+        Fetch [time_min, time_max) as one shard per year, quarter or month, with up to workers shards fetching at
+        once, and yield the events of every shard in turn, which is starting time order. Shards are streamed, so only
+        a bounded number of events per shard is held however large the window. The api must be safe to share between
+        threads.
+        """
+        shards = split_time_range(time_min, time_max, self.shard)
+        yield from stream_concurrently([functools.partial(self.fetch_shard, shard_min, shard_max, show_deleted,
+                                                          page_size, fields, i == 0, calendar_id)
+                                        for i, (shard_min, shard_max) in enumerate(shards)], self.workers)
+
+    def fetch_shard(self, time_min, time_max, show_deleted, page_size, fields, first, calendar_id=None):
+        """
+        Yield every event of a single shard. Events overlapping the start of a shard are only kept by the shard they
+        start in, unless it is the first shard.
+        """
+        shard_start = to_utc_string(time_min)
+        for event in self.iter_api_events(time_min, time_max, show_deleted, page_size, fields, calendar_id):
+            if first or event_start_key(event) >= shard_start:
+                yield event
+
+    def sync(self, page_size=DEFAULT_PAGE_SIZE, calendar_id=None):
+        """
+        Bring the local cache of a calendar, the first one by default, up to date. The first sync downloads every
+        event, after which only the changes since the saved sync token are requested, including cancelled and
+        deleted events, so a calendar that has not changed costs a single empty page.
+        """
+        calendar_id = calendar_id or self.calendar_ids[0]
+        cache = self.caches[calendar_id]
+        sync_token = cache.get_sync_token()
+        page_token = None
+        try:
+            while True:
+                if sync_token:
+                    request = self.api.events().list(calendarId=calendar_id, singleEvents=True,
+                                                     showDeleted=True, syncToken=sync_token,
+                                                     maxResults=page_size, pageToken=page_token)
+                else:
+                    request = self.api.events().list(calendarId=calendar_id, singleEvents=True,
+                                                     showDeleted=True, maxResults=page_size,
+                                                     pageToken=page_token)
+                events_response = self.execute(request, read_only=True)
+                for event in events_response.get("items", []):
+                    cache.store(event)
+
+                page_token = events_response.get("nextPageToken")
+                if not page_token:
+                    break
+        except HttpError as error:
+            # The sync token has expired, so the cache must be rebuilt from scratch
+            if error.resp.status != 410:
+                raise
+            cache.clear()
+            return self.sync(page_size, calendar_id)
+
+        cache.set_sync_token(events_response.get("nextSyncToken"))
+
+    def list_events(self, time_min, time_max, show_deleted=False, page_size=DEFAULT_PAGE_SIZE, fields=None):
+        """
+        Eagerly collect every page between time_min and time_max into the legacy {"items": [...]} response shape
+        """
+        return {"items": list(self.iter_events(time_min, time_max, show_deleted, page_size, fields))}
+
+    def add_events_bulk(self, specs, batch_size=BATCH_LIMIT, retries=BATCH_RETRIES):
+        """
+        Insert many events through batch requests of up to batch_size inserts each. Every spec holds the same
+        VALIDATED [name, location, attendees, date, time] inputs taken by add_new_events.
+        Returns the created event, or the error that made it fail, for every spec in order.
+        """
+        if not 1 <= batch_size <= BATCH_LIMIT:
+            raise ValueError(f"Batch size must be between 1 and {BATCH_LIMIT}.")
+
+        results = []
+        bodies = []
+        for spec in specs:
+            bodies.append(build_event(*spec, time_zone=self.time_zone.name))
+            if len(bodies) == batch_size:
+                results.extend(self.insert_batch(bodies, retries))
+                bodies = []
+        if bodies:
+            results.extend(self.insert_batch(bodies, retries))
+
+        created = sum(1 for result in results if not isinstance(result, Exception))
+        print(f"Events created: {created}/{len(results)}")
+        return results
+
+    def insert_batch(self, bodies, retries=BATCH_RETRIES):
+        """
+        Insert the event bodies in a single batch request
+        """
+        return self.execute_batch(lambda body: self.api.events().insert(calendarId=self.calendar_ids[0], body=body,
+                                                                         maxAttendees=20), bodies, retries)
+
+    def execute_batch(self, make_request, items, retries=BATCH_RETRIES):
+        """
+        Send make_request(item) for every item in a single batch request, resending only the sub-requests that
+        failed with a retryable error after the scheduler's Retry-After or jittered backoff delay.
+        Returns the response, or the error that made it fail, for every item in order.
+        """
+        results = [None] * len(items)
+        pending = list(range(len(items)))
+        method_ids = {}
+        for attempt in range(retries + 1):
+            failed = []
+
+            def callback(request_id, response, exception):
+                index = int(request_id)
+                if exception is None:
+                    results[index] = response
+                else:
+                    results[index] = exception
+                    if is_retryable(exception):
+                        failed.append(index)
+                if self.metrics is not None:
+                    status = "ok" if exception is None else error_status(exception)
+                    self.metrics.increment("api_calls_total", 1, (("method", method_ids[index]), ("status", status)))
+
+            batch = self.api.new_batch_http_request(callback=callback)
+            read_only = True
+            for index in pending:
+                request = make_request(items[index])
+                read_only = read_only and getattr(request, "methodId", None) in READ_ONLY_METHODS
+                if self.metrics is not None:
+                    method_ids[index] = self.instrument_request(request)
+                batch.add(request, request_id=str(index))
+            self.execute(batch, cost=len(pending), read_only=read_only)
+
+            if not failed or attempt == retries:
+                break
+            errors = [results[index] for index in failed]
+            self.scheduler.record_retries(errors)
+            pending = sorted(failed)
+            self.scheduler.sleep(self.scheduler.retry_delay(errors, attempt))
+
+        return results
+
+    def bulk_update(self, action, time_min, time_max, keyword=None, status=None, dry_run=False,
+                    batch_size=BATCH_LIMIT, retries=BATCH_RETRIES):
+        """
+        Delete, cancel or restore every event between time_min and time_max whose summary contains the keyword and
+        whose status matches, in batches of up to batch_size. The rules of delete_event, cancel_event and
+        restore_event still apply, so events breaking them are skipped. With dry_run the matching events are only
+        listed. Returns the number of events that succeeded, failed and were skipped.
+        """
+        if action not in BULK_ACTIONS:
+            raise ValueError(f"Action must be one of: {', '.join(BULK_ACTIONS)}.")
+        if not 1 <= batch_size <= BATCH_LIMIT:
+            raise ValueError(f"Batch size must be between 1 and {BATCH_LIMIT}.")
+
+        report = {"succeeded": 0, "failed": 0, "skipped": 0}
+        pending = []
+
+        def flush():
+            results = self.execute_batch(lambda event: self.action_request(action, event), pending, retries)
+            for event, result in zip(pending, results):
+                if isinstance(result, Exception):
+                    report["failed"] += 1
+                    print(f"Failed to {action} event `{event['summary']}`: {result}")
+                else:
+                    report["succeeded"] += 1
+            pending.clear()
+            print(f"Progress: {report['succeeded']} succeeded, {report['failed']} failed, "
+                  f"{report['skipped']} skipped")
+
+        for event in self.iter_events(time_min, time_max, show_deleted=action == "restore", fields=LIST_FIELDS):
+            model = to_event(event)
+            if keyword is not None and keyword.lower() not in model.summary.lower():
+                continue
+            if status is not None and model.status.value != status:
+                continue
+
+            reason = bulk_action_error(action, model)
+            if reason is not None:
+                report["skipped"] += 1
+            elif dry_run:
+                report["succeeded"] += 1
+                print(f"Would {action} event `{model.summary}`")
+            else:
+                pending.append(event)
+                if len(pending) == batch_size:
+                    flush()
+
+        if pending:
+            flush()
+        return report
+
+    def action_request(self, action, event):
+        """
+        Build the API request applying a bulk action to an event. Only the status is patched, so partial events
+        from LIST_FIELDS never need their full bodies fetched.
+        """
+        calendar_id = self.source_calendar(event)
+        if action == "delete":
+            return self.api.events().delete(calendarId=calendar_id, eventId=event["id"])
+        status = "cancelled" if action == "cancel" else "confirmed"
+        return self.api.events().patch(calendarId=calendar_id, eventId=event["id"], body={"status": status})
+
+    def query_busy(self, calendar_ids, time_min, time_max):
+        """
+        Fetch the busy intervals of every calendar between time_min and time_max with as few free/busy queries as
+        possible, returning an IntervalIndex of (start, end) busy intervals for each calendar. Raises ValueError
+        naming the calendars whose busy times could not be read, rather than treating them as free.
         """
-        time_max = datetime.datetime.utcnow().isoformat() + HOUR_ADJUSTMENT
-        time_min = f"{str(int(time_max[:4]) - 5)}{time_max[4:]}"
-        events_response = self.api.events().list(calendarId="primary", singleEvents=True,
-                                                 orderBy="startTime", timeMin=time_min,
-                                                 timeMax=time_max, showDeleted=True).execute()
-        return events_response
+        busy = {calendar_id: IntervalIndex() for calendar_id in calendar_ids}
+        errors = {}
+        calendar_ids = list(busy)
+        # Only windows longer than the free/busy endpoint allows are split, into chunks of FREEBUSY_MAX_SPAN
+        for shard_min, shard_max in split_span(time_min, time_max, FREEBUSY_MAX_SPAN):
+            for i in range(0, len(calendar_ids), FREEBUSY_CALENDAR_LIMIT):
+                body = {"timeMin": shard_min, "timeMax": shard_max,
+                        "items": [{"id": calendar_id} for calendar_id in calendar_ids[i:i + FREEBUSY_CALENDAR_LIMIT]]}
+                response = self.execute(self.api.freebusy().query(body=body))
+                for calendar_id, calendar in response.get("calendars", {}).items():
+                    if calendar.get("errors"):
+                        errors[calendar_id] = calendar["errors"][0].get("reason", "unknown")
+                    for interval in calendar.get("busy", []):
+                        busy[calendar_id].add((interval["start"], interval["end"]), to_timestamp(interval["start"]),
+                                              to_timestamp(interval["end"]))
+        if errors:
+            raise ValueError("Could not read the busy times of: "
+                             + ", ".join(f"{calendar_id} ({reason})" for calendar_id, reason in errors.items()) + ".")
+        return busy
+
+    def find_conflicts(self, bookings):
+        """
+        Check a list of (start, end, attendees) bookings for clashes with the organizer's and attendees' existing
+        events, using one round of free/busy queries for the whole list. The organizer's calendar is the first
+        calendar of the manager. Attendees are given as email addresses or {"email": ...} dicts. Returns, for every
+        booking, a dict from each clashing calendar to its busy (start, end) intervals overlapping the booking.
+        """
+        bookings = [(start, end, [attendee["email"] if isinstance(attendee, dict) else attendee
+                                  for attendee in attendees])
+                    for start, end, attendees in bookings]
+        if not bookings:
+            return []
+
+        organizer = self.calendar_ids[0]
+        calendar_ids = sorted({attendee for start, end, attendees in bookings for attendee in attendees})
+        if self.cache is None:
+            calendar_ids.insert(0, organizer)
+        else:
+            self.sync()
+        time_min = min((start for start, end, attendees in bookings), key=to_timestamp)
+        time_max = max((end for start, end, attendees in bookings), key=to_timestamp)
+        busy = self.query_busy(calendar_ids, time_min, time_max)
+
+        results = []
+        for start, end, attendees in bookings:
+            start_time = to_timestamp(start)
+            end_time = to_timestamp(end)
+            conflicts = {}
+            if self.cache is not None:
+                events = self.cache.overlapping(start, end)
+                if events:
+                    conflicts[organizer] = [event_times(event) for event in events]
+            for calendar_id in ([organizer] if self.cache is None else []) + attendees:
+                intervals = list(busy[calendar_id].overlapping(start_time, end_time))
+                if intervals:
+                    conflicts[calendar_id] = intervals
+            results.append(conflicts)
+        return results
+
+    def check_conflicts(self, start, end, attendees):
+        """
+        Check a single booking for clashes, as find_conflicts does for many
+        """
+        return self.find_conflicts([(start, end, attendees)])[0]
+
+    def find_free_slots(self, attendees, duration, window, working_hours=DEFAULT_WORKING_HOURS, step=SLOT_STEP,
+                        limit=DEFAULT_SLOT_LIMIT):
+        """
+        Find when the organizer and up to 20 attendees are all free for duration, a timedelta, within the
+        (time_min, time_max) window and the (start, end) working hours of each day in the user's time zone. Busy
+        times come from a single free/busy query, or one per FREEBUSY_MAX_SPAN of a longer window, or the organizer's
+        cache, and are merged with a sweep line. Returns at most limit (start, end) slots in local time, best ranked
+        first.
+        """
+        attendees = [attendee["email"] if isinstance(attendee, dict) else attendee for attendee in attendees]
+        if len(attendees) > MAX_ATTENDEES:
+            raise ValueError(f"At most {MAX_ATTENDEES} attendees can be checked.")
+        if duration <= datetime.timedelta(0):
+            raise ValueError("Duration must be positive.")
+        time_min, time_max = window
+
+        organizer = self.calendar_ids[0]
+        calendar_ids = list(attendees)
+        intervals = []
+        if self.cache is None:
+            calendar_ids.insert(0, organizer)
+        else:
+            self.sync()
+            for event in self.cache.overlapping(time_min, time_max):
+                start, end = event_times(event)
+                intervals.append((to_timestamp(start), to_timestamp(end)))
+        for busy in self.query_busy(calendar_ids, time_min, time_max).values():
+            intervals.extend(busy.intervals.values())
+
+        slots = rank_free_slots(merge_intervals(intervals),
+                                working_periods(time_min, time_max, working_hours, self.time_zone),
+                                duration.total_seconds(), step.total_seconds())[:limit]
+        starts = self.time_zone.convert(start for start, end in slots)
+        ends = self.time_zone.convert(end for start, end in slots)
+        return [(start.isoformat(), end.isoformat()) for start, end in zip(starts, ends)]
+
+    def get_events_from_year(self, year, eager=True, fields=LIST_FIELDS):
+        """
+        Return a list of all the events from a specified year in the user's time zone, or a lazy iterator over them if
+        eager is False
+        """
+        time_min = self.time_zone.localize(datetime.datetime(int(year), 1, 1)).isoformat()
+        time_max = self.time_zone.localize(datetime.datetime(int(year), 12, 31, 23, 59, 59)).isoformat()
+        events = self.iter_events(time_min, time_max, fields=fields)
+        if eager:
+            return list(events)
+        return events
+
+    def now(self):
+        """
+        Return the current time in the user's time zone to the minute, the precision events are shown with, so that
+        the past and future windows asked for within the same minute are identical and share reads
+        """
+        return self.time_zone.now().replace(second=0, microsecond=0)
 
-    def get_future_events(self):
+    def get_past_events(self, eager=True, fields=LIST_FIELDS):
+        """
+        Get events up to 5 years in the past
+        """
+        now = self.now()
+        time_min = shift_years(now, -5).isoformat()
+        time_max = now.isoformat()
+        if eager:
+            return self.list_events(time_min, time_max, fields=fields)
+        return self.iter_events(time_min, time_max, fields=fields)
+
+    def get_cancelled_past_events(self, eager=True, fields=LIST_FIELDS):
+        """
+        Get all events, including cancelled events up to 5 years in the past.
+        """
+        now = self.now()
+        time_min = shift_years(now, -5).isoformat()
+        time_max = now.isoformat()
+        if eager:
+            return self.list_events(time_min, time_max, show_deleted=True, fields=fields)
+        return self.iter_events(time_min, time_max, show_deleted=True, fields=fields)
+
+    def get_future_events(self, eager=True, fields=LIST_FIELDS):
         """
         Get all events up to 5 years in the future
         """
-        time_min = datetime.datetime.utcnow().isoformat() + HOUR_ADJUSTMENT
-        time_max = f"{str(int(time_min[:4]) + 5)}{time_min[4:]}"
-        events_response = self.api.events().list(calendarId="primary", singleEvents=True,
-                                                 orderBy="startTime", timeMin=time_min,
-                                                 timeMax=time_max).execute()
-        return events_response
+        now = self.now()
+        time_min = now.isoformat()
+        time_max = shift_years(now, 5).isoformat()
+        if eager:
+            return self.list_events(time_min, time_max, fields=fields)
+        return self.iter_events(time_min, time_max, fields=fields)
 
     def delete_event(self, event):
         """
         Deletes an event from the calendar
         """
         if event is not None:
-            time_now = datetime.datetime.now().isoformat()
-            time_now = datetime.datetime.fromisoformat(time_now)
-            event_time = datetime.datetime.fromisoformat(event["start"]["dateTime"].split("+")[0])
-            time_diff = time_now - event_time
-            if time_diff.days > 0:
+            if is_past_event(event):
                 event_id = event["id"]
-                self.api.events().delete(calendarId="primary", eventId=event_id).execute()
+                self.execute(self.api.events().delete(calendarId=self.source_calendar(event), eventId=event_id))
                 print("Event: ", event["summary"], " - Successfully Deleted")
             else:
                 return "Cannot delete a present or future event."
         else:
             return "There are no events to delete."
 
+    def get_full_event(self, event):
+        """
+        Return the full body of an event, fetching it from the API if the event came from a partial response.
+        Full event resources always carry an etag, which LIST_FIELDS leaves out.
+        """
+        if "etag" in event:
+            return event
+        return self.execute(self.api.events().get(calendarId=self.source_calendar(event), eventId=event["id"]))
+
     def cancel_event(self, event):
         """
         Cancel an event, can be restored
         """
+        calendar_id = self.source_calendar(event)
+        event = self.get_full_event(event)
+        event.pop(SOURCE_FIELD, None)
         event_id = event["id"]
         event["status"] = "cancelled"
-        cancelled = self.api.events().update(calendarId="primary", eventId=event_id, body=event).execute()
+        cancelled = self.execute(self.api.events().update(calendarId=calendar_id, eventId=event_id, body=event))
         print(f"Successfully cancelled event `{event['summary']}`")
         return cancelled
 
@@ -202,9 +2310,12 @@ class EventManager:
         """
         Restore a cancelled event
         """
+        calendar_id = self.source_calendar(event)
+        event = self.get_full_event(event)
+        event.pop(SOURCE_FIELD, None)
         event_id = event["id"]
         event["status"] = "confirmed"
-        restored = self.api.events().update(calendarId="primary", eventId=event_id, body=event).execute()
+        restored = self.execute(self.api.events().update(calendarId=calendar_id, eventId=event_id, body=event))
         print(f"Successfully restored event `{event['summary']}`")
         return restored
 
@@ -226,80 +2337,572 @@ class EventManager:
             assignee = input("Please enter the email address of the new organizer: ")
 
             # First retrieve the event from the API.
-            event = self.api.events().move(
-                calendarId='primary', eventId=event_id,
-                destination=assignee).execute()
+            event = self.execute(self.api.events().move(
+                calendarId=self.source_calendar(event), eventId=event_id,
+                destination=assignee))
 
             print("New Organizer: ", event["organizer"]["email"])
 
     def search_by_keyword(self, keyword):
         """
-        Search through events past and future that contain the keyword searched
-        """
-        events_response1 = self.get_past_events()
-        past_events = events_response1.get("items", [])
-        events_response2 = self.get_future_events()
-        future_events = events_response2.get("items", [])
-        if past_events:
-            for event in past_events:
-                if keyword in event["summary"]:
-                    start = event['start'].get('dateTime', event['start'].get('date'))
-                    date_time = start.split("T", 1)
-                    print(date_time[0], date_time[1][:5], event['summary'])
-
-        if future_events:
-            for event in future_events:
-                if keyword in event["summary"]:
-                    start = event['start'].get('dateTime', event['start'].get('date'))
-                    date_time = start.split("T", 1)
-                    print(date_time[0], date_time[1][:5], event['summary'])
-
-        if not past_events and not future_events:
+        Search through events past and future that contain the keyword searched.
+        Calendars with a cache are searched through its keyword index, and the rest through a temporary index over
+        their past and future events, so that both match and rank the keyword the same way.
+        """
+        cached = [calendar_id for calendar_id in self.calendar_ids if calendar_id in self.caches]
+        events = []
+        for calendar_events in self.fan_out(lambda calendar_id: self.search_cache(calendar_id, keyword), cached):
+            events.extend(calendar_events)
+
+        if len(cached) < len(self.calendar_ids):
+            events_response1 = self.get_past_events(fields=SEARCH_FIELDS)
+            past_events = events_response1.get("items", [])
+            events_response2 = self.get_future_events(fields=SEARCH_FIELDS)
+            future_events = events_response2.get("items", [])
+            candidates = [event for event in past_events + future_events
+                          if self.source_calendar(event) not in self.caches]
+            # Indexed by position, since the same event id can come from several calendars
+            index = KeywordIndex()
+            for position, event in enumerate(candidates):
+                index.add(dict(event, id=position))
+            events.extend(candidates[position] for position in index.search(keyword))
+
+        for event in events:
+            event = to_event(event)
+            print(*format_start(event), event.summary)
+        if not events:
             print("No events found.")
 
+    def search_cache(self, calendar_id, keyword):
+        """
+        Return the cached events of a calendar matching the keyword, highest ranked first
+        """
+        self.refresh(calendar_id=calendar_id)
+        return self.caches[calendar_id].search(keyword)
+
     def import_event(self):
         """
         Import a JSON file containing event details
         """
-        file_name = open(input("Enter the JSON file name containing the event details: "))
-        json_data = json.load(file_name)
-        event_id = json_data["id"]
-        name = json_data["summary"]
-        location = json_data["location"]
-        start_dateTime = json_data["start"]["dateTime"]
-        end_dateTime = json_data["end"]["dateTime"]
-        organizer_email = json_data["organizer"]["email"]
-        attendees = json_data["attendees"]
-        event = {
-            'summary': name,
-            'location': location,
-            'organizer': {
-                'email': organizer_email,
-            },
-            'start': {
-                'dateTime': start_dateTime
-            },
-            'end': {
-                'dateTime': end_dateTime
-            },
-            'attendees': attendees,
-            'reminders': {'useDefault': True},
-            'iCalUID': event_id
-        }
+        with open(input("Enter the JSON file name containing the event details: ")) as json_file:
+            json_data = json.load(json_file)
+        event = build_import_event(json_data)
 
-        imported_event = self.api.events().import_(calendarId='primary', body=event).execute()
-        file_name.close()
+        imported_event = self.execute(self.api.events().import_(calendarId=self.calendar_ids[0], body=event))
 
         print(f"Successfully imported event `{imported_event['summary']}`")
 
+    def import_events(self, json_filename, batch_size=BATCH_LIMIT, retries=BATCH_RETRIES, checkpoint_filename=None):
+        """
+        Import every event in an NDJSON file or JSON array file, reading it incrementally and sending the imports in
+        batches. Progress is saved to a checkpoint file after every batch, so that an interrupted import resumes
+        after the last completed batch. Returns the number of events imported, failed, invalid and skipped, where a
+        resumed import counts the records before its checkpoint only as skipped.
+        """
+        if not 1 <= batch_size <= BATCH_LIMIT:
+            raise ValueError(f"Batch size must be between 1 and {BATCH_LIMIT}.")
+        if checkpoint_filename is None:
+            checkpoint_filename = json_filename + CHECKPOINT_SUFFIX
+
+        report = {"imported": 0, "failed": 0, "invalid": 0, "skipped": 0}
+        processed = 0
+        if os.path.exists(checkpoint_filename):
+            with open(checkpoint_filename) as checkpoint:
+                saved = json.load(checkpoint)
+            processed = saved["processed"]
+            report["skipped"] = processed
+            print(f"Resuming import after record {processed}")
+        pending = []
+
+        def flush(position):
+            calendar_id = self.calendar_ids[0]
+            results = self.execute_batch(lambda body: self.api.events().import_(calendarId=calendar_id, body=body),
+                                         pending, retries)
+            for body, result in zip(pending, results):
+                if isinstance(result, Exception):
+                    report["failed"] += 1
+                    print(f"Failed to import event `{body['summary']}`: {result}")
+                else:
+                    report["imported"] += 1
+            pending.clear()
+            save_checkpoint(checkpoint_filename, position, report)
+            print(f"Progress: {position} records read, {report['imported']} imported, {report['failed']} failed, "
+                  f"{report['invalid']} invalid")
+
+        with open(json_filename) as json_file:
+            position = 0
+            for position, record in enumerate(iter_json_records(json_file), 1):
+                if position <= processed:
+                    continue
+                try:
+                    pending.append(build_import_event(record))
+                except (KeyError, TypeError, AttributeError):
+                    report["invalid"] += 1
+                    print(f"Skipping invalid record {position}")
+                    continue
+                if len(pending) == batch_size:
+                    flush(position)
+
+        if pending:
+            flush(position)
+        if os.path.exists(checkpoint_filename):
+            os.remove(checkpoint_filename)
+        return report
+
     def export_event(self, event, json_filename):
         """
         Exporting an event as a JSON file
         """
+        event = self.get_full_event(event)
         with open(json_filename, "w") as outfile:
             json.dump(event, outfile)
             print(f"Successfully export event `{event['summary']}`")
 
+    def export_events(self, time_min, time_max, filename, export_format=None, show_deleted=False):
+        """
+        Stream every event between time_min and time_max to a file as NDJSON, gzip-compressed NDJSON or iCalendar,
+        without holding the events in memory. The format is taken from the file extension unless given.
+        Returns the number of events exported.
+        """
+        if export_format is None:
+            export_format = export_format_from_filename(filename)
+        if export_format not in EXPORT_FORMATS:
+            raise ValueError(f"Export format must be one of: {', '.join(EXPORT_FORMATS)}.")
+
+        events = self.iter_events(time_min, time_max, show_deleted)
+        if export_format == "ndjson.gz":
+            outfile = gzip.open(filename, "wt", encoding="utf-8", newline="")
+        else:
+            outfile = open(filename, "w", encoding="utf-8", newline="", buffering=EXPORT_BUFFER_SIZE)
+
+        count = 0
+        with outfile:
+            if export_format == "ics":
+                outfile.write(ICS_HEADER)
+                for event in events:
+                    outfile.write(event_to_ics(event))
+                    count += 1
+                outfile.write(ICS_FOOTER)
+            else:
+                encoder = json.JSONEncoder(separators=(",", ":"))
+                for event in events:
+                    outfile.write(encoder.encode(event))
+                    outfile.write("\n")
+                    count += 1
+
+        print(f"Successfully exported {count} events to {filename}")
+        return count
+
+
+def build_event(name, location, attendees, date, time, recurrence=None, time_zone=DEFAULT_TIME_ZONE):
+    """
+    Build the API request body of an event from VALIDATED user inputs, given in local time in the time zone, repeating
+    by the recurrence rules if given
+    """
+    start_datetime = format_dateTime(convert_date_string(date[0]), time[0], time_zone)
+    end_datetime = format_dateTime(convert_date_string(date[1]), time[1], time_zone)
+
+    event = {
+        'summary': name,
+        'location': location,
+        'start': {
+            'dateTime': start_datetime,
+            'timeZone': time_zone,
+        },
+        'end': {
+            'dateTime': end_datetime,
+            'timeZone': time_zone,
+        },
+        'attendees': attendees,
+        'reminders': {
+            'useDefault': False,
+            'overrides': [
+                {'method': 'email', 'minutes': 24 * 60},
+                {'method': 'popup', 'minutes': 10},
+            ],
+        }
+    }
+    if recurrence:
+        event['recurrence'] = normalize_recurrence(recurrence)
+        # Reject rules the API would refuse before sending them
+        rrulestr("\n".join(event['recurrence']), dtstart=parse_datetime(start_datetime), forceset=True)
+    return event
+
+
+def is_retryable(error):
+    """
+    Check whether a failed request is worth retrying, i.e. it was throttled or hit a server error.
+    A 403 is only retried when it reports a rate limit, not when access is actually forbidden.
+    """
+    if not isinstance(error, HttpError) or error.resp.status not in RETRY_STATUSES:
+        return False
+    if error.resp.status == 403:
+        return error_reason(error) in RATE_LIMIT_REASONS
+    return True
+
+
+def error_status(error):
+    """
+    Return the HTTP status of a failed request as a metric label, or "error" if it failed without a response
+    """
+    if isinstance(error, HttpError):
+        return str(error.resp.status)
+    return "error"
+
+
+def error_reason(error):
+    """
+    Return the reason given in the body of an API error, or None if there is none
+    """
+    try:
+        content = json.loads(error.content)
+        return content["error"]["errors"][0]["reason"]
+    except (ValueError, TypeError, KeyError, IndexError):
+        return None
+
+
+def retry_after(error):
+    """
+    Return the number of seconds the Retry-After header of an error asks to wait, or None if there is none
+    """
+    value = error.resp.get("retry-after") if hasattr(error.resp, "get") else None
+    if not isinstance(value, str):
+        return None
+    if value.strip().isdigit():
+        return int(value)
+    try:
+        retry_time = email.utils.parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    return max(0, (retry_time - datetime.datetime.now(datetime.timezone.utc)).total_seconds())
+
+
+class AsyncEventManager:
+    """
+    Asyncio version of EventManager. Each blocking call runs on a thread pool so it does not stall the event loop,
+    with at most max_in_flight calls running at once. The api must be safe to share between threads.
+    """
+
+    def __init__(self, api, cache=None, max_in_flight=DEFAULT_MAX_IN_FLIGHT, scheduler=None, user=None,
+                 calendar_ids=("primary",), metrics=None, reads=None, workers=1, shard="year",
+                 sync_interval=SYNC_INTERVAL, max_parallel=DEFAULT_MAX_PARALLEL, expand_recurring=False,
+                 time_zone=DEFAULT_TIME_ZONE):
+        if max_in_flight <= 0:
+            raise ValueError("Maximum in-flight requests must be at least 1.")
+        self.manager = EventManager(api, cache, workers=workers, shard=shard, scheduler=scheduler, user=user,
+                                    sync_interval=sync_interval, calendar_ids=calendar_ids, max_parallel=max_parallel,
+                                    expand_recurring=expand_recurring, time_zone=time_zone, metrics=metrics,
+                                    reads=reads)
+        self.executor = ThreadPoolExecutor(max_workers=max_in_flight)
+
+    async def run(self, function, *args, **kwargs):
+        """
+        Run a blocking function on the thread pool and wait for its result
+        """
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self.executor, functools.partial(function, *args, **kwargs))
+
+    def close(self):
+        """
+        Shut down the thread pool once every call has finished
+        """
+        self.executor.shutdown(wait=True)
+
+    async def get_upcoming_events(self, starting_time, number_of_events, fields=LIST_FIELDS):
+        return await self.run(self.manager.get_upcoming_events, starting_time, number_of_events, fields)
+
+    async def list_events(self, time_min, time_max, show_deleted=False, page_size=DEFAULT_PAGE_SIZE, fields=None):
+        return await self.run(self.manager.list_events, time_min, time_max, show_deleted, page_size, fields)
+
+    async def get_events_from_year(self, year):
+        return await self.run(self.manager.get_events_from_year, year)
+
+    async def get_past_events(self):
+        return await self.run(self.manager.get_past_events)
+
+    async def get_cancelled_past_events(self):
+        return await self.run(self.manager.get_cancelled_past_events)
+
+    async def get_future_events(self):
+        return await self.run(self.manager.get_future_events)
+
+    async def search_by_keyword(self, keyword):
+        return await self.run(self.manager.search_by_keyword, keyword)
+
+    async def add_new_events(self, name, location, attendees, date, time, recurrence=None):
+        return await self.run(self.manager.add_new_events, name, location, attendees, date, time, recurrence)
+
+    async def add_events(self, specs):
+        """
+        Insert every [name, location, attendees, date, time] spec with concurrent requests, returning the created
+        events in order
+        """
+        return await asyncio.gather(*(self.add_new_events(*spec) for spec in specs))
+
+    async def add_events_bulk(self, specs, batch_size=BATCH_LIMIT, retries=BATCH_RETRIES):
+        return await self.run(self.manager.add_events_bulk, list(specs), batch_size, retries)
+
+    async def delete_event(self, event):
+        return await self.run(self.manager.delete_event, event)
+
+    async def cancel_event(self, event):
+        return await self.run(self.manager.cancel_event, event)
+
+    async def restore_event(self, event):
+        return await self.run(self.manager.restore_event, event)
+
+    async def bulk_update(self, action, time_min, time_max, keyword=None, status=None, dry_run=False,
+                          batch_size=BATCH_LIMIT, retries=BATCH_RETRIES):
+        return await self.run(self.manager.bulk_update, action, time_min, time_max, keyword, status, dry_run,
+                              batch_size, retries)
+
+    async def export_event(self, event, json_filename):
+        return await self.run(self.manager.export_event, event, json_filename)
+
+    async def iter_events(self, time_min, time_max, show_deleted=False, page_size=DEFAULT_PAGE_SIZE, fields=None):
+        """
+        Yield every event between time_min and time_max, taking up to page_size events at a time from
+        EventManager.iter_events on the thread pool, so memory stays bounded as it does there
+        """
+        events = self.manager.iter_events(time_min, time_max, show_deleted, page_size, fields)
+        try:
+            while True:
+                chunk = await self.run(lambda: list(itertools.islice(events, page_size)))
+                if not chunk:
+                    return
+                for event in chunk:
+                    yield event
+        finally:
+            events.close()
+
+    async def find_conflicts(self, bookings):
+        return await self.run(self.manager.find_conflicts, list(bookings))
+
+    async def check_conflicts(self, start, end, attendees):
+        return await self.run(self.manager.check_conflicts, start, end, attendees)
+
+    async def find_free_slots(self, attendees, duration, window, working_hours=DEFAULT_WORKING_HOURS, step=SLOT_STEP,
+                              limit=DEFAULT_SLOT_LIMIT):
+        return await self.run(self.manager.find_free_slots, attendees, duration, window, working_hours, step, limit)
+
+    async def change_organizer(self):
+        return await self.run(self.manager.change_organizer)
+
+    async def import_event(self):
+        return await self.run(self.manager.import_event)
+
+    async def import_events(self, json_filename, batch_size=BATCH_LIMIT, retries=BATCH_RETRIES,
+                            checkpoint_filename=None):
+        return await self.run(self.manager.import_events, json_filename, batch_size, retries, checkpoint_filename)
+
+    async def export_events(self, time_min, time_max, filename, export_format=None, show_deleted=False):
+        return await self.run(self.manager.export_events, time_min, time_max, filename, export_format, show_deleted)
+
+
+def is_past_event(event):
+    """
+    Check whether an event started at least a day ago, which is required for it to be deleted
+    """
+    time_diff = datetime.datetime.now(datetime.timezone.utc) - to_event(event).start
+    return time_diff.days > 0
+
+
+def bulk_action_error(action, event):
+    """
+    Return the reason an action cannot be applied to an event, or None if it can
+    """
+    event = to_event(event)
+    if action == "delete" and not is_past_event(event):
+        return "Cannot delete a present or future event."
+    if action == "cancel" and event.status is EventStatus.CANCELLED:
+        return "Event is already cancelled."
+    if action == "restore" and event.status is not EventStatus.CANCELLED:
+        return "Event is not cancelled."
+    return None
+
+
+def build_import_event(json_data):
+    """
+    Build the API request body importing an event from its JSON representation.
+    Raises KeyError or TypeError if a required field is missing or malformed.
+    """
+    if not isinstance(json_data["summary"], str) or not isinstance(json_data["start"]["dateTime"], str) \
+            or not isinstance(json_data["end"]["dateTime"], str):
+        raise TypeError("Event summary and times must be strings.")
+    return {
+        'summary': json_data["summary"],
+        'location': json_data.get("location", ""),
+        'organizer': {
+            'email': json_data["organizer"]["email"],
+        },
+        'start': {
+            'dateTime': json_data["start"]["dateTime"]
+        },
+        'end': {
+            'dateTime': json_data["end"]["dateTime"]
+        },
+        'attendees': json_data.get("attendees", []),
+        'reminders': {'useDefault': True},
+        'iCalUID': json_data["id"]
+    }
+
+
+def iter_json_records(json_file, chunk_size=JSON_CHUNK_SIZE):
+    """
+    Yield the records of a JSON array file, or of an NDJSON file with one record per line, reading the file in
+    chunks so that only one record needs to be held in memory at a time
+    """
+    buffer = json_file.read(chunk_size).lstrip()
+    if not buffer.startswith("["):
+        yield from iter_ndjson(itertools.chain([buffer], iter(lambda: json_file.read(chunk_size), "")))
+        return
+
+    decoder = json.JSONDecoder()
+    # The buffer is only trimmed when a chunk is read, so decoding a record does not copy the rest of the chunk
+    position = 1
+    while True:
+        position = skip_whitespace(buffer, position)
+        if buffer.startswith(",", position):
+            position = skip_whitespace(buffer, position + 1)
+        if buffer.startswith("]", position):
+            return
+        try:
+            record, position = decoder.raw_decode(buffer, position)
+        except json.JSONDecodeError:
+            chunk = json_file.read(chunk_size)
+            if not chunk or len(buffer) - position > MAX_RECORD_SIZE:
+                raise ValueError("Invalid JSON array.")
+            buffer = buffer[position:] + chunk
+            position = 0
+            continue
+        yield record
+
+
+def skip_whitespace(text, position):
+    """
+    Return the position of the first character of text at or after position that is not JSON whitespace
+    """
+    return JSON_WHITESPACE.match(text, position).end()
+
+
+def iter_ndjson(chunks):
+    """
+    Yield the records of NDJSON text arriving in chunks, skipping blank lines. Lines that are not valid JSON are
+    yielded as None so that the caller can count them as invalid records.
+    """
+    remainder = ""
+    for chunk in chunks:
+        lines = (remainder + chunk).split("\n")
+        remainder = lines.pop()
+        for line in lines:
+            if line.strip():
+                yield parse_json_line(line)
+    if remainder.strip():
+        yield parse_json_line(remainder)
+
+
+def parse_json_line(line):
+    """
+    Parse one NDJSON line, returning None if it is not valid JSON
+    """
+    try:
+        return json.loads(line)
+    except json.JSONDecodeError:
+        return None
+
+
+def save_checkpoint(checkpoint_filename, processed, report):
+    """
+    Atomically record how many records of an import have been processed
+    """
+    temporary_filename = checkpoint_filename + ".tmp"
+    with open(temporary_filename, "w") as checkpoint:
+        json.dump({"processed": processed, "report": report}, checkpoint)
+    os.replace(temporary_filename, checkpoint_filename)
+
+
+def export_format_from_filename(filename):
+    """
+    Work out the export format from the extension of a file name
+    """
+    if filename.endswith(".gz"):
+        return "ndjson.gz"
+    if filename.endswith(".ics"):
+        return "ics"
+    return "ndjson"
+
+
+def escape_ics_text(text):
+    """
+    Escape a TEXT value as required by RFC 5545
+    """
+    return text.replace("\\", "\\\\").replace(";", "\\;").replace(",", "\\,").replace("\r\n", "\\n") \
+        .replace("\n", "\\n")
+
+
+def fold_ics_line(line):
+    """
+    Fold a content line so that no line is longer than 75 octets, continuing on lines starting with a space
+    """
+    if len(line) <= ICS_LINE_LIMIT and line.isascii():
+        return line + "\r\n"
+
+    parts = []
+    current = ""
+    size = 0
+    limit = ICS_LINE_LIMIT
+    for character in line:
+        width = len(character.encode("utf-8"))
+        if size + width > limit:
+            parts.append(current)
+            current = ""
+            size = 0
+            limit = ICS_LINE_LIMIT - 1
+        current += character
+        size += width
+    parts.append(current)
+    return "\r\n ".join(parts) + "\r\n"
+
+
+def format_ics_time(event_time, all_day):
+    """
+    Format a datetime as an iCalendar UTC DATE-TIME, or as a DATE for all-day events
+    """
+    if all_day:
+        return f";VALUE=DATE:{event_time.year:04d}{event_time.month:02d}{event_time.day:02d}"
+    event_time = event_time.astimezone(datetime.timezone.utc)
+    return (f":{event_time.year:04d}{event_time.month:02d}{event_time.day:02d}T"
+            f"{event_time.hour:02d}{event_time.minute:02d}{event_time.second:02d}Z")
+
+
+def event_to_ics(event):
+    """
+    Convert an event into an RFC 5545 VEVENT component. Times missing from the event, as on cancelled tombstones,
+    are left out.
+    """
+    resource = event.to_api() if isinstance(event, Event) else event
+    event = to_event(event)
+    lines = ["BEGIN:VEVENT",
+             f"UID:{escape_ics_text(resource.get('iCalUID', event.id))}",
+             f"DTSTAMP{format_ics_time(datetime.datetime.now(datetime.timezone.utc), False)}"]
+    if event.start is not None:
+        lines.append(f"DTSTART{format_ics_time(event.start, event.all_day)}")
+    if event.end is not None:
+        lines.append(f"DTEND{format_ics_time(event.end, event.all_day)}")
+    lines += [f"SUMMARY:{escape_ics_text(event.summary)}", f"STATUS:{event.status.value.upper()}"]
+    if resource.get("location"):
+        lines.append(f"LOCATION:{escape_ics_text(resource['location'])}")
+    if resource.get("description"):
+        lines.append(f"DESCRIPTION:{escape_ics_text(resource['description'])}")
+    if resource.get("organizer", {}).get("email"):
+        lines.append(f"ORGANIZER:mailto:{resource['organizer']['email']}")
+    # Attendees such as resources and groups can be listed by display name alone
+    for attendee in resource.get("attendees", []):
+        if attendee.get("email"):
+            lines.append(f"ATTENDEE:mailto:{attendee['email']}")
+    lines.append("END:VEVENT")
+    return "".join(fold_ics_line(line) for line in lines)
+
 
 def create_event():
     """
@@ -403,11 +3006,35 @@ def convert_date_string(date_string):
         return date_string
 
 
-def format_dateTime(date, time):
+def format_dateTime(date, time, time_zone=DEFAULT_TIME_ZONE):
+    """
+    Format a local date and time in a time zone as an RFC 3339 dateTime, with the UTC offset in effect on that date
+    """
+    return get_time_zone(time_zone).localize(datetime.datetime.fromisoformat(f"{date}T{time}")).isoformat()
+
+
+def get_import_files():
     """
-    Format datetime with GMT adjustment
+    Get the user input for the file to import events from, and for the checkpoint file that lets an interrupted
+    import resume, which is None for the default next to the imported file
     """
-    return f"{date}T{time}:00{HOUR_ADJUSTMENT}"
+    json_filename = input("Enter the name of the NDJSON or JSON file to import events from: ")
+    checkpoint_filename = input(f"Enter the name of the checkpoint file "
+                                f"(press enter for {json_filename + CHECKPOINT_SUFFIX}): ")
+    return json_filename, checkpoint_filename or None
+
+
+def get_export_range(time_zone=DEFAULT_TIME_ZONE):
+    """
+    Get the user input for the first and last days to export events from, in the user's time zone, and the file to
+    export them to. Returns the days as a [time_min, time_max) window of RFC 3339 times, and the file name.
+    """
+    first_day = convert_date_string(input("Please enter the first day to export (YYYY-MM-DD/DD-MON-YY): "))
+    last_day = convert_date_string(input("Please enter the last day to export (YYYY-MM-DD/DD-MON-YY): "))
+    filename = input("Enter the name of the file (with .ndjson, .ndjson.gz or .ics extension) to export to: ")
+    day_after = datetime.date.fromisoformat(last_day) + datetime.timedelta(days=1)
+    return format_dateTime(first_day, "00:00", time_zone), format_dateTime(day_after.isoformat(), "00:00", time_zone), \
+        filename
 
 
 def get_user_keyword():
@@ -417,7 +3044,7 @@ def get_user_keyword():
     return input("Please enter a keyword to search for: ")
 
 
-def get_event_to_delete(events_response):
+def get_event_to_delete(events_response, renderer=None):
     """
     Get the event to be deleted by printing all available events and asking for user input
     Is also used for cancelling events.
@@ -427,13 +3054,13 @@ def get_event_to_delete(events_response):
         print("No events found.")
         return None
     else:
-        print_events(events)
+        (renderer or EventRenderer()).render(events)
         event_index = int(input("Please select an event to delete/cancel: ")) - 1
         event = events_response["items"][event_index]
         return event
 
 
-def get_event_to_restore(events_response):
+def get_event_to_restore(events_response, renderer=None):
     """
     Get the event to be restored by printing all cancelled events and asking for user input
     """
@@ -442,13 +3069,13 @@ def get_event_to_restore(events_response):
         print("No events found.")
         return None
     else:
-        if not print_cancelled_events(events):
-            event_index = int(input("Please select an event to restore: ")) - 1
-            event = events_response["items"][event_index]
-            return event
+        (renderer or EventRenderer()).render(events, cancelled=True)
+        event_index = int(input("Please select an event to restore: ")) - 1
+        event = events_response["items"][event_index]
+        return event
 
 
-def get_event_to_export(events_response):
+def get_event_to_export(events_response, renderer=None):
     """
     Get the event to be exported by printing all available events and asking for user input
     """
@@ -457,7 +3084,7 @@ def get_event_to_export(events_response):
         print("No events found.")
         return None
     else:
-        print_events(events)
+        (renderer or EventRenderer()).render(events)
         event_index = int(input("Please select an event to export: ")) - 1
         event = events_response["items"][event_index]
         return event
@@ -467,30 +3094,144 @@ def print_cancelled_events(events):
     """
     Printing cancelled events in a formatted manner
     """
-    print("-------------------------------------------------------------------------")
-    for i in range(len(events)):
-        if events[i]["status"] == "cancelled":
-            start = events[i]['start'].get('dateTime', events[i]['start'].get('date'))
-            date_time = start.split("T", 1)
-            print(f"{i + 1}.", date_time[0], events[i]['summary'])
-    print("-------------------------------------------------------------------------")
+    EventRenderer().render(events, cancelled=True)
 
 
-def print_events(events):
+def print_events(events, time_zone=None):
     """
-    Printing events in a formatted manner
+    Printing events in a formatted manner, in their own UTC offsets or converted to a TimeZone
     """
-    if not events:
-        print("-------------------------------------------------------------------------")
-        print('No events found.')
-        print("-------------------------------------------------------------------------")
-    else:
-        print("-------------------------------------------------------------------------")
-        for i in range(len(events)):
-            start = events[i]['start'].get('dateTime', events[i]['start'].get('date'))
-            date_time = start.split("T", 1)
-            print(f"{i + 1}.", date_time[0], date_time[1][:5], f"GMT{date_time[1][8:14]}", events[i]['summary'])
-        print("-------------------------------------------------------------------------")
+    EventRenderer(time_zone).render(events)
+
+
+def terminal_page_size(stream=None):
+    """
+    Return how many events fit on the terminal between the rules and the pager prompt, or None if the stream is not
+    a terminal and should not be paged
+    """
+    stream = stream or sys.stdout
+    if not stream.isatty():
+        return None
+    return max(shutil.get_terminal_size().lines - 3, 1)
+
+
+class EventRenderer:
+    """
+    Lists events on a stream, formatting them in bulk and writing each listing, or each page of it, with one write.
+    Text is numbered for the user to pick from, while tsv and jsonl give a row per event for piping to other tools.
+    With a page_size, text is shown a page at a time and only the rows on the page are formatted.
+    """
+
+    def __init__(self, time_zone=None, output_format="text", page_size=None, stream=None, prompt=input):
+        if output_format not in OUTPUT_FORMATS:
+            raise ValueError(f"Output format must be one of: {', '.join(OUTPUT_FORMATS)}.")
+        if page_size is not None and page_size <= 0:
+            raise ValueError("Page size must be at least 1.")
+        self.time_zone = time_zone
+        self.output_format = output_format
+        self.page_size = page_size
+        # None writes to whatever sys.stdout is when rendering
+        self.stream = stream
+        self.prompt = prompt
+
+    def render(self, events, cancelled=False):
+        """
+        List events, numbered by their position in events. With cancelled, only the cancelled ones are listed.
+        """
+        numbered = [(number, event) for number, event in enumerate(events, 1)
+                    if not cancelled or is_cancelled(event)]
+        if self.output_format != "text":
+            lines = self.format(numbered)
+            if self.output_format == "tsv":
+                lines.insert(0, "\t".join(OUTPUT_COLUMNS))
+            if lines:
+                self.write(lines)
+            return
+        if not numbered and not cancelled:
+            self.write([OUTPUT_RULE, "No events found.", OUTPUT_RULE])
+        elif self.page_size is None or len(numbered) <= self.page_size:
+            self.write([OUTPUT_RULE, *self.format(numbered, cancelled), OUTPUT_RULE])
+        else:
+            self.page(numbered, cancelled)
+
+    def page(self, numbered, cancelled):
+        """
+        Show numbered events a page at a time, moving forward, back or stopping as the user asks after each page
+        """
+        first = 0
+        while True:
+            last = min(first + self.page_size, len(numbered))
+            self.write([OUTPUT_RULE, *self.format(numbered[first:last], cancelled), OUTPUT_RULE])
+            if last == len(numbered):
+                return
+            answer = self.prompt(f"Events {first + 1}-{last} of {len(numbered)}. "
+                                 f"Press enter for more, p for the previous page or q to stop: ").strip().lower()
+            if answer == "q":
+                return
+            first = max(first - self.page_size, 0) if answer == "p" else last
+
+    def format(self, numbered, cancelled=False):
+        """
+        Return the output lines of (number, event) pairs
+        """
+        rows = self.rows(numbered)
+        if self.output_format == "jsonl":
+            return [json.dumps(dict(zip(OUTPUT_COLUMNS, row))) for row in rows]
+        if self.output_format == "tsv":
+            return [f"{number}\t{str(event_id).translate(TSV_ESCAPES)}\t{status}\t{date}\t{time_of_day}\t{offset}\t"
+                    f"{summary.translate(TSV_ESCAPES)}"
+                    for number, event_id, status, date, time_of_day, offset, summary in rows]
+        if cancelled:
+            return [f"{row[0]}. {row[3]} {row[6]}" for row in rows]
+        return [f"{number}. {date} {time_of_day} GMT{offset} {summary}"
+                for number, _, _, date, time_of_day, offset, summary in rows]
+
+    def rows(self, numbered):
+        """
+        Return the number, id, status, date, time, UTC offset and summary of (number, event) pairs. Starts of API
+        resources shown in their own offsets are sliced from the string, and others converted to the TimeZone in one
+        batch.
+        """
+        rows = []
+        converting = []
+        for number, event in numbered:
+            if isinstance(event, Event):
+                row = [number, event.id, event.status.value, None, None, None, event.summary]
+                start, all_day = event.start, event.all_day
+            else:
+                row = [number, event.get("id"), event.get("status", "confirmed"), None, None, None,
+                       event.get("summary", "")]
+                start = event.get("start", {})
+                all_day = "date" in start
+                start = start.get("dateTime", start.get("date"))
+                match = START_PATTERN.fullmatch(start) if self.time_zone is None and not all_day else None
+                if match is not None:
+                    date, time_of_day, offset = match.groups()
+                    row[3:6] = date, time_of_day, "+00:00" if offset == "Z" else offset
+                    rows.append(row)
+                    continue
+                start = parse_datetime(start)
+            if self.time_zone is not None and not all_day:
+                converting.append((row, start.timestamp()))
+            else:
+                row[3:6] = start_columns(start, all_day)
+            rows.append(row)
+        if converting:
+            for (row, _), start in zip(converting, self.time_zone.convert(timestamp for _, timestamp in converting)):
+                row[3:6] = start_columns(start, False)
+        return rows
+
+    def write(self, lines):
+        (self.stream or sys.stdout).write("\n".join(lines) + "\n")
+
+
+def is_cancelled(event):
+    """
+    Return whether an Event or API event resource is cancelled
+    """
+    if isinstance(event, Event):
+        return event.status is EventStatus.CANCELLED
+    return event.get("status") == EventStatus.CANCELLED.value
 
 
 def user_choice():
@@ -508,7 +3249,9 @@ def user_choice():
     print("8. Delete an event")
     print("9. Import event from JSON file")
     print("10. Export event from calendar into a JSON file")
-    print("11. Exit")
+    print("11. Import events in bulk from an NDJSON or JSON file")
+    print("12. Export the events between two dates to a file")
+    print("13. Exit")
 
     choice = int(input("Please provide your selection as an integer: "))
 
@@ -520,20 +3263,25 @@ def main():
     The main program UI (not tested in coverage)
     """
     api = get_calendar_api()
-    time_now = datetime.datetime.utcnow().isoformat() + HOUR_ADJUSTMENT  # 'Z' indicates UTC time
-
-    calendar = EventManager(api)
+    metrics_file = os.environ.get(METRICS_ENV)
+    metrics = PrometheusSink() if metrics_file else None
+    calendar = EventManager(api, EventCache(), metrics=metrics)
+    # Listings may be piped to other tools, but events to pick from are always numbered text, a page at a time
+    page_size = terminal_page_size()
+    listing = EventRenderer(calendar.time_zone, os.environ.get(OUTPUT_FORMAT_ENV, "text"), page_size)
+    picking = EventRenderer(page_size=page_size)
+    time_now = calendar.time_zone.now().isoformat()
     choice = user_choice()  # Change to True before running. Set as False to test pipeline
 
-    while choice != 11:
+    while choice != 13:
         if choice == 1:
             events = calendar.get_upcoming_events(time_now, 10)
-            print_events(events)
+            listing.render(events)
 
         elif choice == 2:
             year = input("Please enter the year you wish to navigate to: ")
             events = calendar.get_events_from_year(year)
-            print_events(events)
+            listing.render(events)
 
         elif choice == 3:
             keyword = get_user_keyword()
@@ -541,6 +3289,15 @@ def main():
 
         elif choice == 4:
             inputs = create_event()
+            try:
+                conflicts = calendar.check_conflicts(format_dateTime(convert_date_string(inputs[3][0]), inputs[4][0]),
+                                                     format_dateTime(convert_date_string(inputs[3][1]), inputs[4][1]),
+                                                     inputs[2])
+            except ValueError as error:
+                print(f"Warning: {error}")
+                conflicts = {}
+            for calendar_id in conflicts:
+                print(f"Warning: {calendar_id} is busy at that time.")
             event = calendar.add_new_events(inputs[0], inputs[1], inputs[2], inputs[3], inputs[4])
 
         elif choice == 5:
@@ -548,19 +3305,19 @@ def main():
 
         elif choice == 6:
             events_response = calendar.get_past_events()
-            event = get_event_to_delete(events_response)
+            event = get_event_to_delete(events_response, picking)
             if event is not None:
                 calendar.cancel_event(event)
 
         elif choice == 7:
             events_response = calendar.get_cancelled_past_events()
-            event = get_event_to_restore(events_response)
+            event = get_event_to_restore(events_response, picking)
             if event is not None:
                 calendar.restore_event(event)
 
         elif choice == 8:
             events_response = calendar.get_past_events()
-            event = get_event_to_delete(events_response)
+            event = get_event_to_delete(events_response, picking)
             if event is not None:
                 calendar.delete_event(event)
 
@@ -569,14 +3326,30 @@ def main():
 
         elif choice == 10:
             events_response = calendar.get_past_events()
-            event = get_event_to_export(events_response)
+            event = get_event_to_export(events_response, picking)
             if event is not None:
                 json_filename = input("Enter the name of file (with.json extension) to store events in: ")
                 calendar.export_event(event, json_filename)
 
+        elif choice == 11:
+            json_filename, checkpoint_filename = get_import_files()
+            report = calendar.import_events(json_filename, checkpoint_filename=checkpoint_filename)
+            print(f"Import finished: {report['imported']} imported, {report['failed']} failed, "
+                  f"{report['invalid']} invalid, {report['skipped']} skipped")
+
+        elif choice == 12:
+            try:
+                time_min, time_max, filename = get_export_range(calendar.time_zone.name)
+                count = calendar.export_events(time_min, time_max, filename)
+                print(f"Exported {count} events to {filename}")
+            except (KeyError, ValueError) as error:
+                print(f"Could not export events: {error}")
+
         else:
             print("Invalid input - please provide your selection as an integer listed above.")
 
+        if metrics is not None:
+            metrics.write(metrics_file)
         print()
         choice = user_choice()
 
@@ -0,0 +1,502 @@
+import argparse
+import contextlib
+import datetime
+import io
+import itertools
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import timeit
+import tracemalloc
+
+# Benchmarks for MyEventManager. The startup benchmark needs a valid token.pickle in the working directory.
+# With --suite, every EventManager hot path is instead run against the in-process API emulator on synthetic calendars
+# of each size, and the results are checked against the history of earlier runs, then added to it if none regressed.
+
+STARTUP_RUNS = 5
+MODEL_EVENTS = 100000
+SLOT_ATTENDEES = 20
+SLOT_DAYS = 31
+SLOT_TARGET = 0.05
+RECURRING_YEARS = 5
+PARSE_COUNT = 1000000
+METRICS_EVENTS = 20000
+RENDER_EVENTS = 100000
+COLD_START = "import MyEventManager; MyEventManager.get_calendar_api()"
+SUITE_SIZES = (1000, 100000, 1000000)
+SUITE_START = "2019-01-01T00:00:00+10:00"
+SUITE_END = "2200-01-01T00:00:00+10:00"
+SUITE_YEAR = 2020
+# A week of the synthetic calendar, in the past, which the delete, cancel and restore cases change
+SUITE_BULK_WINDOW = ("2020-01-08T00:00:00+10:00", "2020-01-15T00:00:00+10:00")
+SUITE_KEYWORDS = ("team", "event 42", "clayton campus", "missing")
+SUITE_ADD_COUNT = 1000
+SUITE_IMPORT_COUNT = 10000
+SUITE_DISPLAY_COUNT = 10000
+# Quota high enough that the rate limiter never waits, so only EventManager and the emulator are measured
+SUITE_RATE = 10 ** 9
+HISTORY_FILE = "benchmark_history.ndjson"
+# Runs of a case a new result is compared with, and how much slower, or bigger, than their median it may be
+HISTORY_WINDOW = 10
+REGRESSION_TOLERANCE = 1.5
+# Slowdowns smaller than this are timing noise rather than regressions
+MIN_REGRESSION_SECONDS = 0.05
+# Result keys of the per-case memory measurements, with how they are described
+MEMORY_MEASURES = (("rss_peak_mb", "peak RSS"), ("heap_peak_mb", "Python heap peak"))
+
+
+def benchmark_startup(runs=STARTUP_RUNS):
+    """
+    Time a cold start, i.e. a fresh interpreter importing the module and building the API client as a short-lived
+    CLI or cron invocation does, then the cost of getting the client again within the same process
+    """
+    cold = []
+    for _ in range(runs):
+        start = timeit.default_timer()
+        subprocess.run([sys.executable, "-c", COLD_START], check=True)
+        cold.append(timeit.default_timer() - start)
+
+    import MyEventManager
+    MyEventManager.get_calendar_api()
+    warm = timeit.timeit(MyEventManager.get_calendar_api, number=1000) / 1000
+
+    print(f"Cold start: median {statistics.median(cold) * 1000:.1f} ms over {runs} runs")
+    print(f"Warm get_calendar_api(): {warm * 1e6:.2f} us")
+    return cold, warm
+
+
+def make_events(count, start=datetime.datetime(2020, 1, 1, 9, 0)):
+    """
+    Build a synthetic calendar of API event resources, one every hour from start
+    """
+    events = []
+    for i in range(count):
+        begin = start + datetime.timedelta(hours=i)
+        events.append({
+            'kind': 'calendar#event',
+            'etag': f'"{i}"',
+            'id': f"event{i}",
+            'status': "confirmed",
+            'summary': f"Event {i} team meeting",
+            'location': "Clayton Campus",
+            'start': {'dateTime': begin.isoformat() + "+10:00", 'timeZone': 'Australia/Melbourne'},
+            'end': {'dateTime': (begin + datetime.timedelta(minutes=30)).isoformat() + "+10:00",
+                    'timeZone': 'Australia/Melbourne'},
+            'attendees': [{'email': f"stso{i % 100:04d}@student.monash.edu"}],
+            'reminders': {'useDefault': True}
+        })
+    return events
+
+
+def measure_memory(build):
+    """
+    Return the result of build() and the memory it allocated in bytes
+    """
+    tracemalloc.start()
+    result = build()
+    size = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    return result, size
+
+
+def benchmark_event_model(count=MODEL_EVENTS):
+    """
+    Compare memory per event, and the cost of ordering events and selecting a time window, between raw API dicts and
+    Event objects
+    """
+    import MyEventManager
+
+    payload = json.dumps(make_events(count))
+    raw, raw_size = measure_memory(lambda: json.loads(payload))
+    models, model_size = measure_memory(lambda: [MyEventManager.Event.from_api(event) for event in raw])
+
+    window_start = datetime.datetime(2024, 1, 1, tzinfo=datetime.timezone.utc)
+    window_end = datetime.datetime(2025, 1, 1, tzinfo=datetime.timezone.utc)
+
+    def legacy_loop():
+        # Order the events and select a window, parsing the start strings as the dict-based code paths do
+        ordered = sorted(raw, key=MyEventManager.event_start_key)
+        return [event for event in ordered
+                if window_start <= MyEventManager.parse_datetime(event['start']['dateTime']) < window_end]
+
+    def model_loop():
+        ordered = sorted(models, key=lambda event: event.start)
+        return [event for event in ordered if window_start <= event.start < window_end]
+
+    legacy = min(timeit.repeat(legacy_loop, number=1, repeat=3))
+    model = min(timeit.repeat(model_loop, number=1, repeat=3))
+
+    print(f"Memory per event: dict {raw_size / count:.0f} B, Event {model_size / count:.0f} B")
+    print(f"Sort and window filter over {count} events: dict {legacy * 1000:.1f} ms, Event {model * 1000:.1f} ms")
+    return raw_size, model_size, legacy, model
+
+
+def benchmark_free_slots(attendees=SLOT_ATTENDEES, days=SLOT_DAYS):
+    """
+    Time find_free_slots over a month for 20 attendees with a few meetings each per day, against a canned free/busy
+    response so only the local work is measured
+    """
+    import random
+    from unittest.mock import MagicMock
+    import MyEventManager
+
+    generator = random.Random(2107)
+    start = datetime.datetime(2050, 3, 1, tzinfo=datetime.timezone.utc)
+    calendars = {"primary": {"busy": []}}
+    for i in range(attendees):
+        busy = []
+        for day in range(days):
+            for _ in range(4):
+                begin = start + datetime.timedelta(days=day, hours=generator.randint(-2, 9),
+                                                   minutes=15 * generator.randint(0, 3))
+                busy.append({"start": begin.isoformat(), "end": (begin + datetime.timedelta(minutes=45)).isoformat()})
+        calendars[f"stso{i:04d}@student.monash.edu"] = {"busy": busy}
+    api = MagicMock()
+    api.freebusy.return_value.query.return_value.execute.return_value = {"calendars": calendars}
+    manager = MyEventManager.EventManager(api)
+    window = ("2050-03-01T00:00:00+10:00", "2050-03-31T00:00:00+10:00")
+
+    elapsed = min(timeit.repeat(lambda: manager.find_free_slots(list(calendars)[1:], datetime.timedelta(minutes=30),
+                                                                window), number=1, repeat=5))
+
+    print(f"find_free_slots for {attendees} attendees over {days} days: {elapsed * 1000:.1f} ms "
+          f"(target {SLOT_TARGET * 1000:.0f} ms)")
+    return elapsed
+
+
+def benchmark_recurring(years=RECURRING_YEARS):
+    """
+    Compare the response size and memory of a daily standup over several years expanded by the server, as listed with
+    singleEvents=True, against its master event, and time expanding a month of it locally
+    """
+    import MyEventManager
+
+    master = make_events(1)[0]
+    master["id"] = "standup"
+    master["recurrence"] = [f"RRULE:FREQ=DAILY;COUNT={365 * years}"]
+    time_min = master["start"]["dateTime"]
+    time_max = f"{2020 + years}-01-01T00:00:00+10:00"
+
+    instances = list(MyEventManager.expand_events([master], time_min, time_max))
+    expanded_bytes = len(json.dumps({"items": instances}))
+    master_bytes = len(json.dumps({"items": [master]}))
+    expanded, expanded_size = measure_memory(lambda: json.loads(json.dumps(instances)))
+    masters, master_size = measure_memory(lambda: json.loads(json.dumps([master])))
+
+    def expand_month():
+        return list(MyEventManager.expand_events(masters, "2022-06-01T00:00:00+10:00", "2022-07-01T00:00:00+10:00"))
+
+    month = min(timeit.repeat(expand_month, number=1, repeat=5))
+
+    print(f"Daily standup over {years} years: {len(instances)} instances, response {expanded_bytes / 1024:.0f} KiB "
+          f"expanded vs {master_bytes / 1024:.1f} KiB master, memory {expanded_size / 1024:.0f} KiB vs "
+          f"{master_size / 1024:.1f} KiB")
+    print(f"Expand a month of it locally: {month * 1000:.2f} ms")
+    return expanded_bytes, master_bytes, month
+
+
+def benchmark_batch_parsing(count=PARSE_COUNT):
+    """
+    Compare parsing a mix of RFC 3339 and DD-MON-YY strings one at a time, as the event paths do, against
+    parse_datetimes() turning them into a datetime64 array in one pass
+    """
+    import MyEventManager
+
+    start = datetime.datetime(2020, 1, 1)
+    strings = []
+    for i in range(count):
+        moment = start + datetime.timedelta(minutes=37 * i)
+        if i % 4 == 0:
+            strings.append(moment.strftime("%d-%b-%y").upper())
+        elif i % 4 == 1:
+            strings.append(moment.isoformat() + "Z")
+        else:
+            strings.append(moment.isoformat() + "+10:00")
+
+    def per_item():
+        return [MyEventManager.parse_datetime(MyEventManager.convert_date_string(string)) for string in strings]
+
+    single = min(timeit.repeat(per_item, number=1, repeat=3))
+    batch = min(timeit.repeat(lambda: MyEventManager.parse_datetimes(strings), number=1, repeat=3))
+
+    print(f"Parse {count} timestamps: per item {single * 1000:.0f} ms, batch {batch * 1000:.0f} ms "
+          f"({single / batch:.1f}x)")
+    return single, batch
+
+
+def benchmark_instrumentation(count=METRICS_EVENTS):
+    """
+    Compare listing a calendar through the API emulator without metrics, with the MetricsSink that discards
+    everything, and with a PrometheusSink
+    """
+    import MyEventManager
+    from MyEventManagerEmulator import CalendarEmulator
+
+    api = CalendarEmulator()
+    api.load(make_events(count))
+    scheduler = MyEventManager.RequestScheduler(project_rate=SUITE_RATE, user_rate=SUITE_RATE, burst=SUITE_RATE)
+    timings = {}
+    for name, metrics in (("disabled", None), ("no-op sink", MyEventManager.MetricsSink()),
+                          ("Prometheus", MyEventManager.PrometheusSink())):
+        manager = MyEventManager.EventManager(api, scheduler=scheduler, metrics=metrics)
+        timings[name] = min(timeit.repeat(lambda: sum(1 for _ in manager.iter_events(SUITE_START, SUITE_END)),
+                                          number=1, repeat=5))
+
+    print(f"List {count} events: " + ", ".join(f"{name} {seconds * 1000:.1f} ms" for name, seconds in timings.items()))
+    return timings
+
+
+def print_events_per_line(events, time_zone=None):
+    """
+    The printer EventRenderer replaced, which built an Event and called print() once per event
+    """
+    import MyEventManager
+
+    print("-------------------------------------------------------------------------")
+    events = [MyEventManager.to_event(event) for event in events]
+    if time_zone is not None:
+        starts = iter(time_zone.convert(event.start.timestamp() for event in events if not event.all_day))
+        for event in events:
+            if not event.all_day:
+                event.start = next(starts)
+    for i in range(len(events)):
+        event = events[i]
+        print(f"{i + 1}.", *MyEventManager.format_start(event), f"GMT{MyEventManager.format_offset(event.start)}",
+              event.summary)
+    print("-------------------------------------------------------------------------")
+
+
+def benchmark_rendering(count=RENDER_EVENTS):
+    """
+    Compare listing events on a file, as when piping the program's output, with the old print-per-event printer and
+    with EventRenderer in each output format, in the events' own offsets and converted to the user's time zone
+    """
+    import MyEventManager
+
+    events = make_events(count)
+    time_zone = MyEventManager.get_time_zone()
+    cases = {
+        "print per event": print_events_per_line,
+        "print per event, converted": lambda listed: print_events_per_line(listed, time_zone),
+    }
+    for output_format in MyEventManager.OUTPUT_FORMATS:
+        cases[output_format] = MyEventManager.EventRenderer(output_format=output_format).render
+        cases[f"{output_format}, converted"] = MyEventManager.EventRenderer(time_zone, output_format).render
+    timings = {}
+    with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+        for name, render in cases.items():
+            timings[name] = min(timeit.repeat(lambda: render(events), number=1, repeat=3))
+
+    print(f"Render {count} events: " + ", ".join(f"{name} {seconds * 1000:.0f} ms"
+                                                  for name, seconds in timings.items()))
+    return timings
+
+
+def heap_peak_mb(case):
+    """
+    Run case() on its own under tracemalloc and return the most memory the Python heap held at once in MiB. This
+    leaves out memory allocated outside the Python allocator, such as NumPy buffers and the SQLite page cache.
+    """
+    tracemalloc.start()
+    try:
+        case()
+        return tracemalloc.get_traced_memory()[1] / (1024 * 1024)
+    finally:
+        tracemalloc.stop()
+
+
+def reset_peak_rss():
+    """
+    Reset the peak resident set size of this process to its current size, returning False where that is not
+    supported, which is everywhere but Linux
+    """
+    try:
+        with open("/proc/self/clear_refs", "w") as clear_refs:
+            clear_refs.write("5")
+    except OSError:
+        return False
+    return True
+
+
+def peak_rss_mb():
+    """
+    Return the peak resident set size of this process since it was last reset in MiB
+    """
+    with open("/proc/self/status") as status:
+        for line in status:
+            if line.startswith("VmHWM:"):
+                return int(line.split()[1]) / 1024
+    return None
+
+
+def suite_cases(size, directory):
+    """
+    Build the suite's cases for a synthetic calendar of size events, as (name, case) pairs in the order they must
+    run, where case() does the work and returns the number of items it handled
+    """
+    import MyEventManager
+    from MyEventManagerEmulator import CalendarEmulator
+
+    api = CalendarEmulator()
+    api.load(make_events(size))
+    scheduler = MyEventManager.RequestScheduler(project_rate=SUITE_RATE, user_rate=SUITE_RATE, burst=SUITE_RATE)
+    manager = MyEventManager.EventManager(api, scheduler=scheduler)
+    cached = MyEventManager.EventManager(api, cache=MyEventManager.EventCache(":memory:"), scheduler=scheduler,
+                                         sync_interval=float("inf"))
+    export_file = os.path.join(directory, f"export{size}.ndjson")
+    import_file = os.path.join(directory, f"import{size}.ndjson")
+    specs = [[f"Bulk {i}", "Clayton Campus", [{"email": f"stso{i % 100:04d}@student.monash.edu"}],
+              ["2030-01-01", "2030-01-01"], ["10:00", "11:00"]] for i in range(SUITE_ADD_COUNT)]
+
+    def sync():
+        cached.sync()
+        return size
+
+    def display():
+        events = list(itertools.islice(manager.iter_events(SUITE_START, SUITE_END, fields=MyEventManager.LIST_FIELDS),
+                                       SUITE_DISPLAY_COUNT))
+        MyEventManager.print_events(events)
+        return len(events)
+
+    def bulk_update(action):
+        report = manager.bulk_update(action, *SUITE_BULK_WINDOW)
+        return report["succeeded"]
+
+    def import_events():
+        with open(export_file) as exported, open(import_file, "w") as records:
+            records.writelines(itertools.islice(exported, SUITE_IMPORT_COUNT))
+        target = MyEventManager.EventManager(CalendarEmulator(), scheduler=scheduler)
+        return target.import_events(import_file)["imported"]
+
+    return [
+        ("list", lambda: sum(1 for _ in manager.iter_events(SUITE_START, SUITE_END,
+                                                             fields=MyEventManager.LIST_FIELDS))),
+        ("sync", sync),
+        ("search", lambda: sum(len(cached.search_cache("primary", keyword)) for keyword in SUITE_KEYWORDS)),
+        ("year", lambda: len(manager.get_events_from_year(SUITE_YEAR))),
+        ("year_cached", lambda: len(cached.get_events_from_year(SUITE_YEAR))),
+        ("display", display),
+        ("bulk_add", lambda: len(manager.add_events_bulk(specs))),
+        ("cancel", lambda: bulk_update("cancel")),
+        ("restore", lambda: bulk_update("restore")),
+        ("delete", lambda: bulk_update("delete")),
+        ("export", lambda: manager.export_events(SUITE_START, SUITE_END, export_file)),
+        ("import", import_events)
+    ]
+
+
+def run_suite(sizes=SUITE_SIZES):
+    """
+    Run every case of the suite on a calendar of each size, smallest first, and return the latency, throughput, peak
+    RSS and Python heap peak of each. The peak RSS is reset before each case, so that each case reports its own
+    rather than the process's, and is None where it cannot be reset. The heap peak is measured on a second, untimed
+    pass over fresh cases, so that tracing does not slow the timings. Output printed by the cases is discarded.
+    """
+    results = []
+    with tempfile.TemporaryDirectory() as directory:
+        for size in sorted(sizes):
+            with contextlib.redirect_stdout(io.StringIO()):
+                cases = suite_cases(size, directory)
+            for name, case in cases:
+                with contextlib.redirect_stdout(io.StringIO()):
+                    reset = reset_peak_rss()
+                    start = timeit.default_timer()
+                    items = case()
+                    elapsed = timeit.default_timer() - start
+                results.append({"case": name, "size": size, "seconds": elapsed, "items": items,
+                                "throughput": items / elapsed if elapsed else None,
+                                "rss_peak_mb": peak_rss_mb() if reset else None})
+            with contextlib.redirect_stdout(io.StringIO()):
+                cases = suite_cases(size, directory)
+                peaks = [heap_peak_mb(case) for _, case in cases]
+            for result, peak in zip(results[-len(cases):], peaks):
+                result["heap_peak_mb"] = peak
+                rss = "n/a" if result["rss_peak_mb"] is None else f"{result['rss_peak_mb']:.1f} MiB"
+                print(f"{result['case']:>12} {size:>8} events: {result['seconds'] * 1000:10.1f} ms, "
+                      f"{result['items'] / result['seconds']:12.0f} items/s, peak RSS {rss}, "
+                      f"Python heap peak {peak:.1f} MiB")
+    return results
+
+
+def load_history(filename=HISTORY_FILE):
+    """
+    Return the recorded suite runs, oldest first
+    """
+    if not os.path.exists(filename):
+        return []
+    with open(filename) as history:
+        return [json.loads(line) for line in history if line.strip()]
+
+
+def record_run(results, filename=HISTORY_FILE):
+    """
+    Append a suite run to the history, along with the commit and Python version it was measured on
+    """
+    try:
+        commit = subprocess.run(["git", "rev-parse", "HEAD"], capture_output=True, text=True).stdout.strip() or None
+    except OSError:
+        commit = None
+    run = {"time": datetime.datetime.now(datetime.timezone.utc).isoformat(), "commit": commit,
+           "python": sys.version.split()[0], "results": results}
+    with open(filename, "a") as history:
+        history.write(json.dumps(run) + "\n")
+
+
+def find_regressions(results, history, tolerance=REGRESSION_TOLERANCE, window=HISTORY_WINDOW):
+    """
+    Compare each result with the median of the same case and size over the last window runs, returning a message for
+    every case that got more than tolerance times slower, or whose peak RSS or Python heap peak grew by as much
+    """
+    regressions = []
+    for result in results:
+        previous = [earlier for run in history[-window:] for earlier in run["results"]
+                    if earlier["case"] == result["case"] and earlier["size"] == result["size"]]
+        if not previous:
+            continue
+        seconds = statistics.median(earlier["seconds"] for earlier in previous)
+        if result["seconds"] > seconds * tolerance and result["seconds"] - seconds > MIN_REGRESSION_SECONDS:
+            regressions.append(f"{result['case']} at {result['size']} events took {result['seconds'] * 1000:.1f} ms, "
+                               f"against a median of {seconds * 1000:.1f} ms")
+        for key, label in MEMORY_MEASURES:
+            peaks = [earlier[key] for earlier in previous if earlier.get(key) is not None]
+            if peaks and result[key] is not None and result[key] > statistics.median(peaks) * tolerance:
+                regressions.append(f"{result['case']} at {result['size']} events had a {label} of "
+                                   f"{result[key]:.1f} MiB, against a median of {statistics.median(peaks):.1f} MiB")
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark MyEventManager.")
+    parser.add_argument("--suite", action="store_true",
+                        help="run the regression suite against the API emulator instead of the single benchmarks")
+    parser.add_argument("--sizes", type=int, nargs="+", default=SUITE_SIZES, help="calendar sizes for the suite")
+    parser.add_argument("--history", default=HISTORY_FILE, help="file of earlier suite runs to compare with")
+    parser.add_argument("--tolerance", type=float, default=REGRESSION_TOLERANCE,
+                        help="slowdown or memory growth over the recent median counted as a regression")
+    args = parser.parse_args(argv)
+
+    if not args.suite:
+        benchmark_startup()
+        benchmark_event_model()
+        benchmark_free_slots()
+        benchmark_recurring()
+        benchmark_batch_parsing()
+        benchmark_instrumentation()
+        benchmark_rendering()
+        return 0
+
+    results = run_suite(args.sizes)
+    regressions = find_regressions(results, load_history(args.history), args.tolerance)
+    # A run that regressed is left out of the history, so that it cannot drag the median towards itself
+    if not regressions:
+        record_run(results, args.history)
+    for regression in regressions:
+        print(f"Regression: {regression}")
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
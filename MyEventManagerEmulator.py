@@ -0,0 +1,966 @@
+import bisect
+import collections
+import datetime
+import functools
+import heapq
+import http
+import itertools
+import json
+import random
+import re
+import threading
+import time
+import uuid
+import zoneinfo
+from dateutil.rrule import rrulestr
+from googleapiclient.errors import HttpError
+from MyEventManager import BATCH_LIMIT, DEFAULT_PAGE_SIZE, DEFAULT_TIME_ZONE, FREEBUSY_CALENDAR_LIMIT, \
+    FREEBUSY_MAX_SPAN, MAX_YEAR, event_start_key, event_times, expand_recurring_event, get_time_zone, \
+    iter_json_records, merge_intervals, parse_datetime, tokenize
+
+# In-process emulator of the parts of the Google Calendar API v3 used by MyEventManager, so that EventManager can be
+# tested and load-tested without a network. Set CALENDAR_EMULATOR for get_calendar_api() to return one.
+
+EMULATOR_URI = "emulator://www.googleapis.com/calendar/v3"
+EMULATOR_EMAIL = "user@example.com"
+MAX_PAGE_SIZE = 2500
+# Listings whose pages can still be requested, and the events they may hold between them, oldest dropped first
+SNAPSHOT_LIMIT = 256
+SNAPSHOT_ITEMS = 4000000
+# Recurring events are expanded between these instants when a listing has no timeMin or timeMax
+EXPANSION_START = "1970-01-01T00:00:00+00:00"
+EXPANSION_END = f"{MAX_YEAR + 1}-01-01T00:00:00+00:00"
+# Event ids are base32hex, as the API requires of ids chosen by the client
+EVENT_ID_PATTERN = re.compile(r"[a-v0-9]{5,1024}")
+FIELD_PATTERN = re.compile(r"\*|[A-Za-z0-9_]+(?:/[A-Za-z0-9_]+)*")
+# Errors picked at random when error_rate is set
+INJECTED_ERRORS = ((503, "backendError"), (429, "rateLimitExceeded"), (403, "userRateLimitExceeded"))
+ERROR_REASONS = {
+    400: "badRequest",
+    403: "forbidden",
+    404: "notFound",
+    409: "duplicate",
+    410: "deleted",
+    429: "rateLimitExceeded",
+    500: "backendError",
+    503: "backendError"
+}
+COMMON_PARAMETERS = {"fields", "prettyPrint", "quotaUser"}
+# HTTP method, required parameters and optional parameters of every emulated method
+METHODS = {
+    "events.list": ("GET", ("calendarId",), {
+        "alwaysIncludeEmail", "eventTypes", "iCalUID", "maxAttendees", "maxResults", "orderBy", "pageToken",
+        "privateExtendedProperty", "q", "sharedExtendedProperty", "showDeleted", "showHiddenInvitations",
+        "singleEvents", "syncToken", "timeMax", "timeMin", "timeZone", "updatedMin"}),
+    "events.get": ("GET", ("calendarId", "eventId"), {"alwaysIncludeEmail", "maxAttendees", "timeZone"}),
+    "events.insert": ("POST", ("calendarId", "body"), {
+        "conferenceDataVersion", "maxAttendees", "sendNotifications", "sendUpdates", "supportsAttachments"}),
+    "events.update": ("PUT", ("calendarId", "eventId", "body"), {
+        "alwaysIncludeEmail", "conferenceDataVersion", "maxAttendees", "sendNotifications", "sendUpdates",
+        "supportsAttachments"}),
+    "events.patch": ("PATCH", ("calendarId", "eventId", "body"), {
+        "alwaysIncludeEmail", "conferenceDataVersion", "maxAttendees", "sendNotifications", "sendUpdates",
+        "supportsAttachments"}),
+    "events.delete": ("DELETE", ("calendarId", "eventId"), {"sendNotifications", "sendUpdates"}),
+    "events.move": ("POST", ("calendarId", "eventId", "destination"), {"sendNotifications", "sendUpdates"}),
+    "events.import": ("POST", ("calendarId", "body"), {"conferenceDataVersion", "supportsAttachments"}),
+    "freebusy.query": ("POST", ("body",), set())
+}
+
+
+class EmulatorResponse(dict):
+    """
+    HTTP response headers of an emulated error, with its status like an httplib2.Response
+    """
+
+    def __init__(self, status, headers=None):
+        super().__init__(headers or {})
+        self.status = status
+        self.reason = http.HTTPStatus(status).phrase
+
+
+def decode_response(resp, content):
+    """
+    Decode the JSON body of a response, as the client library's model does
+    """
+    return json.loads(content) if content else ""
+
+
+def http_error(status, reason=None, message=None, uri=EMULATOR_URI, retry_after=None):
+    """
+    Build the HttpError the client library raises for an error response, with the body the API sends
+    """
+    reason = reason or ERROR_REASONS.get(status, "backendError")
+    message = message or http.HTTPStatus(status).phrase
+    headers = {"retry-after": str(retry_after)} if retry_after is not None else {}
+    content = json.dumps({"error": {"errors": [{"domain": "global", "reason": reason, "message": message}],
+                                    "code": status, "message": message}})
+    return HttpError(EmulatorResponse(status, headers), content.encode(), uri=uri)
+
+
+@functools.lru_cache(maxsize=None)
+def parse_fields(fields):
+    """
+    Parse a partial response selector such as "nextPageToken,items(id,start/dateTime)" into nested dicts mapping
+    each selected key to the selection within it, or to None when the whole value is selected
+    """
+    selection, position = parse_selection(fields, 0)
+    if position != len(fields):
+        raise ValueError(f"Invalid field selection: {fields}")
+    return selection
+
+
+def parse_selection(fields, position):
+    """
+    Parse a comma separated selection starting at position, returning it and the position after it
+    """
+    selection = {}
+    while True:
+        match = FIELD_PATTERN.match(fields, position)
+        if match is None:
+            raise ValueError(f"Invalid field selection: {fields}")
+        path = match.group().split("/")
+        position = match.end()
+        inner = None
+        if fields.startswith("(", position):
+            inner, position = parse_selection(fields, position + 1)
+            if not fields.startswith(")", position):
+                raise ValueError(f"Invalid field selection: {fields}")
+            position += 1
+        target = selection
+        for name in path[:-1]:
+            target = target.setdefault(name, {})
+        target[path[-1]] = inner
+        if not fields.startswith(",", position):
+            return selection, position
+        position += 1
+
+
+def project(value, selection):
+    """
+    Keep only the selected parts of a response value
+    """
+    if selection is None:
+        return value
+    if isinstance(value, list):
+        return [project(item, selection) for item in value]
+    if not isinstance(value, dict):
+        return value
+    if "*" in selection:
+        return value
+    return {key: project(value[key], inner) for key, inner in selection.items() if key in value}
+
+
+def merge_patch(resource, patch):
+    """
+    Apply patch semantics to a resource: objects are merged key by key, and anything else is replaced
+    """
+    merged = dict(resource)
+    for key, value in patch.items():
+        if isinstance(value, dict) and isinstance(merged.get(key), dict):
+            merged[key] = merge_patch(merged[key], value)
+        else:
+            merged[key] = value
+    return merged
+
+
+def to_instant(date_time, time_zone):
+    """
+    Convert an RFC 3339 dateTime or all-day date string to seconds since the epoch. Strings without an offset are
+    taken as local time in the time zone.
+    """
+    if len(date_time) == 10:
+        date_time = f"{date_time}T00:00:00"
+    parsed = datetime.datetime.fromisoformat(date_time.replace("Z", "+00:00"))
+    if parsed.tzinfo is None:
+        parsed = get_time_zone(time_zone).localize(parsed)
+    return parsed.timestamp()
+
+
+def event_instants(event, time_zone):
+    """
+    Return the start and end of an event resource in seconds since the epoch
+    """
+    start, end = event_times(event)
+    return (to_instant(start, event["start"].get("timeZone") or time_zone),
+            to_instant(end, event.get("end", event["start"]).get("timeZone") or time_zone))
+
+
+def format_instant(instant):
+    """
+    Format seconds since the epoch as an RFC 3339 UTC dateTime
+    """
+    return datetime.datetime.fromtimestamp(instant, datetime.timezone.utc).strftime("%Y-%m-%dT%H:%M:%SZ")
+
+
+def parse_time_parameter(name, value):
+    """
+    Parse a timeMin, timeMax or updatedMin parameter, which the API requires to carry a UTC offset
+    """
+    try:
+        parsed = datetime.datetime.fromisoformat(value.replace("Z", "+00:00"))
+    except (AttributeError, ValueError):
+        parsed = None
+    if parsed is None or parsed.tzinfo is None:
+        raise http_error(400, "badRequest", f"Invalid value for {name}: {value}")
+    return parsed.timestamp()
+
+
+def validate_event(body):
+    """
+    Reject an event body the API would refuse to store
+    """
+    if not isinstance(body, dict):
+        raise http_error(400, "badRequest", "Invalid event body.")
+    if "start" not in body:
+        raise http_error(400, "required", "Missing start time.")
+    if "end" not in body:
+        raise http_error(400, "required", "Missing end time.")
+    times = []
+    for name in ("start", "end"):
+        when = body[name]
+        if not isinstance(when, dict) or ("date" in when) == ("dateTime" in when):
+            raise http_error(400, "invalid", f"Invalid {name} time.")
+        time_zone = when.get("timeZone")
+        if time_zone is not None:
+            try:
+                zoneinfo.ZoneInfo(time_zone)
+            except (ValueError, zoneinfo.ZoneInfoNotFoundError):
+                raise http_error(400, "invalid", f"Invalid time zone definition for {name} time.")
+        value = when.get("dateTime", when.get("date"))
+        try:
+            parsed = parse_datetime(value) if "date" in when else \
+                datetime.datetime.fromisoformat(value.replace("Z", "+00:00"))
+        except (AttributeError, TypeError, ValueError):
+            raise http_error(400, "invalid", f"Invalid {name} time.")
+        if parsed.tzinfo is None and time_zone is None:
+            raise http_error(400, "required", f"Missing time zone definition for {name} time.")
+        times.append((value, time_zone or DEFAULT_TIME_ZONE))
+    if ("date" in body["start"]) != ("date" in body["end"]):
+        raise http_error(400, "invalid", "Start and end times must either both be date or both be dateTime.")
+    if to_instant(*times[1]) < to_instant(*times[0]):
+        raise http_error(400, "timeRangeEmpty", "The specified time range is empty.")
+    if body.get("recurrence"):
+        if "dateTime" in body["start"] and not body["start"].get("timeZone"):
+            raise http_error(400, "required", "Missing time zone definition for start time.")
+        try:
+            rrulestr("\n".join(body["recurrence"]), dtstart=parse_datetime(times[0][0]), forceset=True)
+        except (TypeError, ValueError):
+            raise http_error(400, "invalid", "Invalid recurrence rule.")
+
+
+class EmulatedCalendar:
+    """
+    Events of one emulated calendar, including deleted ones, with an index of start times for time window listings
+    and a change log for sync tokens. Stored event dicts are never modified, only replaced.
+    """
+
+    def __init__(self, calendar_id, time_zone=DEFAULT_TIME_ZONE):
+        self.id = calendar_id
+        self.time_zone = time_zone
+        self.events = {}
+        # Start and end of every event which is not a recurring master, and (start, id) pairs sorted by start
+        self.times = {}
+        self.index = []
+        self.index_sorted = True
+        self.max_length = 0
+        self.masters = set()
+        # Ids of modified instances of recurring events
+        self.override_ids = set()
+        self.ical_uids = {}
+        # Event ids in the order they last changed, mapped to the change sequence number
+        self.changes = {}
+        self.sequence = 0
+        # Bumped to invalidate every sync token handed out so far
+        self.epoch = 0
+
+    def store(self, event, bulk=False):
+        """
+        Store a new version of an event and log the change. With bulk the start index is only sorted before it is
+        next read, which makes loading many events at once faster.
+        """
+        event_id = event["id"]
+        self.sequence += 1
+        event["etag"] = f'"{self.sequence}"'
+        self.events[event_id] = event
+        self.changes.pop(event_id, None)
+        self.changes[event_id] = self.sequence
+        self.ical_uids[event["iCalUID"]] = event_id
+        if "recurringEventId" in event:
+            self.override_ids.add(event_id)
+
+        previous = self.times.get(event_id)
+        if "recurrence" in event:
+            self.masters.add(event_id)
+            times = None
+        else:
+            self.masters.discard(event_id)
+            times = event_instants(event, self.time_zone)
+            self.max_length = max(self.max_length, times[1] - times[0])
+        if times is None:
+            self.times.pop(event_id, None)
+        else:
+            self.times[event_id] = times
+        if previous is not None and times is not None and previous[0] == times[0]:
+            return
+        if not bulk and self.index_sorted:
+            if previous is not None:
+                position = bisect.bisect_left(self.index, (previous[0], event_id))
+                del self.index[position]
+            if times is not None:
+                bisect.insort(self.index, (times[0], event_id))
+        elif times is not None:
+            self.index.append((times[0], event_id))
+            self.index_sorted = False
+
+    def sort_index(self):
+        """
+        Sort the start index after a bulk load, dropping entries left behind by events which have since moved
+        """
+        if not self.index_sorted:
+            self.index = sorted({entry for entry in self.index
+                                 if self.times.get(entry[1], (None,))[0] == entry[0]})
+            self.index_sorted = True
+
+    def window(self, time_min=None, time_max=None):
+        """
+        Yield the events, other than recurring masters, overlapping (time_min, time_max) in order of their start.
+        Bounds are seconds since the epoch, or None for no bound.
+        """
+        self.sort_index()
+        low = 0 if time_min is None else bisect.bisect_left(self.index, (time_min - self.max_length,))
+        high = len(self.index) if time_max is None else bisect.bisect_left(self.index, (time_max,))
+        for position in range(low, high):
+            event_id = self.index[position][1]
+            if time_min is not None and self.times[event_id][1] <= time_min:
+                continue
+            yield self.events[event_id]
+
+    def changed_since(self, sequence):
+        """
+        Return the events changed after the given sequence number, in the order they changed
+        """
+        changed = []
+        for event_id in reversed(self.changes):
+            if self.changes[event_id] <= sequence:
+                break
+            changed.append(self.events[event_id])
+        changed.reverse()
+        return changed
+
+    def overrides(self, master_id):
+        """
+        Return the modified instances of a recurring event
+        """
+        return [self.events[event_id] for event_id in self.override_ids
+                if self.events[event_id]["recurringEventId"] == master_id]
+
+    def single_events(self, window_min, window_max, time_min, time_max, show_deleted=False, wanted=None):
+        """
+        Return the events overlapping a window, given both in seconds and as strings, with recurring events expanded
+        into their instances in order of their start, as a listing with singleEvents=True does. Modified instances
+        replace the instances they were made from, and only events for which wanted(event) is true are included.
+        """
+        singles = [event for event in self.window(window_min, window_max)
+                   if (show_deleted or event.get("status") != "cancelled") and (wanted is None or wanted(event))]
+        masters = [self.events[event_id] for event_id in self.masters
+                   if self.events[event_id].get("status") != "cancelled"
+                   and (wanted is None or wanted(self.events[event_id]))]
+        if not masters:
+            return singles
+        return list(heapq.merge(singles, *(expand_recurring_event(master, time_min, time_max, self.override_ids)
+                                           for master in masters), key=event_start_key))
+
+    def sync_token(self):
+        """
+        Return a sync token for the changes made to the calendar so far
+        """
+        return f"{self.epoch}.{self.sequence}"
+
+
+class EmulatedRequest:
+    """
+    A request to an emulated method, executed like a googleapiclient HttpRequest. As with HttpRequest, the body is
+    serialised when the request is built, and postproc decodes the response.
+    """
+
+    def __init__(self, emulator, method_id, method, parameters):
+        self.emulator = emulator
+        self.methodId = f"calendar.{method_id}"
+        self.method = method
+        self.uri = f"{EMULATOR_URI}/{method_id}"
+        self.body = json.dumps(parameters.pop("body")) if "body" in parameters else None
+        self.parameters = parameters
+        self.postproc = decode_response
+
+    def execute(self, http=None, num_retries=0):
+        return self.emulator.execute(self)
+
+
+class EmulatedBatch:
+    """
+    A batch of emulated requests, sent as a single round trip like a googleapiclient BatchHttpRequest
+    """
+    method = "POST"
+
+    def __init__(self, emulator, callback=None):
+        self.emulator = emulator
+        self.callback = callback
+        self.requests = {}
+
+    def add(self, request, callback=None, request_id=None):
+        if request_id is None:
+            request_id = str(len(self.requests) + 1)
+        if request_id in self.requests:
+            raise KeyError(f"A request with this ID already exists: {request_id}")
+        self.requests[request_id] = (request, callback)
+
+    def execute(self, http=None):
+        self.emulator.execute_batch(self)
+
+
+class EventsResource:
+    """
+    The events collection of the emulated API
+    """
+
+    def __init__(self, emulator):
+        self.emulator = emulator
+
+    def list(self, **parameters):
+        return self.emulator.request("events.list", parameters)
+
+    def list_next(self, previous_request, previous_response):
+        if not previous_response.get("nextPageToken"):
+            return None
+        return self.list(**dict(previous_request.parameters, pageToken=previous_response["nextPageToken"]))
+
+    def get(self, **parameters):
+        return self.emulator.request("events.get", parameters)
+
+    def insert(self, **parameters):
+        return self.emulator.request("events.insert", parameters)
+
+    def update(self, **parameters):
+        return self.emulator.request("events.update", parameters)
+
+    def patch(self, **parameters):
+        return self.emulator.request("events.patch", parameters)
+
+    def delete(self, **parameters):
+        return self.emulator.request("events.delete", parameters)
+
+    def move(self, **parameters):
+        return self.emulator.request("events.move", parameters)
+
+    def import_(self, **parameters):
+        return self.emulator.request("events.import", parameters)
+
+
+class FreebusyResource:
+    """
+    The free/busy collection of the emulated API
+    """
+
+    def __init__(self, emulator):
+        self.emulator = emulator
+
+    def query(self, **parameters):
+        return self.emulator.request("freebusy.query", parameters)
+
+
+class CalendarEmulator:
+    """
+    In-process stand-in for the Calendar API service returned by get_calendar_api(). Events are kept in memory with
+    the API's semantics for paging, ordering, time windows, deleted events, recurring events, sync tokens, batches,
+    free/busy queries and partial responses, and every response is serialised to JSON and back as if it had come
+    over the network.
+    Every round trip, a single request or a whole batch, waits for latency seconds, or for what latency() returns.
+    Each request then fails with probability error_rate with one of errors, and errors queued with fail_next() are
+    raised first.
+    """
+
+    def __init__(self, calendar_ids=("primary",), time_zone=DEFAULT_TIME_ZONE, latency=0, error_rate=0,
+                 errors=INJECTED_ERRORS, seed=None, clock=time.time, sleep=time.sleep):
+        self.calendars = {}
+        for calendar_id in calendar_ids:
+            self.add_calendar(calendar_id, time_zone)
+        self.latency = latency
+        self.error_rate = error_rate
+        self.errors = errors
+        self.random = random.Random(seed)
+        self.clock = clock
+        self.sleep = sleep
+        self.lock = threading.RLock()
+        self.failures = collections.deque()
+        self.snapshots = collections.OrderedDict()
+        self.snapshot_ids = itertools.count(1)
+        self.snapshot_items = 0
+        self.calls = collections.Counter()
+        self.round_trips = 0
+        self.bytes_sent = 0
+        self.injected_errors = 0
+
+    @classmethod
+    def from_file(cls, path, **kwargs):
+        """
+        Build an emulator whose primary calendar holds the event resources of an NDJSON or JSON array file
+        """
+        emulator = cls(**kwargs)
+        with open(path) as events_file:
+            emulator.load(event for event in iter_json_records(events_file) if event is not None)
+        return emulator
+
+    @classmethod
+    def from_setting(cls, setting):
+        """
+        Build the emulator asked for by the CALENDAR_EMULATOR setting, either "1" for empty calendars or the path
+        of a file of events to load
+        """
+        if setting in ("", "1"):
+            return cls()
+        return cls.from_file(setting)
+
+    def add_calendar(self, calendar_id, time_zone=DEFAULT_TIME_ZONE):
+        """
+        Add an empty calendar
+        """
+        self.calendars[calendar_id] = EmulatedCalendar(calendar_id, time_zone)
+
+    def load(self, events, calendar_id="primary"):
+        """
+        Store event resources directly, without requests or validation, as a fast way of filling a calendar for
+        tests and benchmarks. The emulator takes ownership of the events, which must not be modified afterwards.
+        Returns the number of events loaded.
+        """
+        calendar = self.calendars[calendar_id]
+        now = self.timestamp()
+        count = 0
+        with self.lock:
+            for event in events:
+                event = dict(event)
+                event.setdefault("id", uuid.uuid4().hex)
+                self.fill_event(calendar, event, now)
+                calendar.store(event, bulk=True)
+                count += 1
+        return count
+
+    def fail_next(self, status, reason=None, count=1, retry_after=None):
+        """
+        Make the next count requests fail with the given HTTP status
+        """
+        with self.lock:
+            self.failures.extend([(status, reason, retry_after)] * count)
+
+    def expire_sync_tokens(self, calendar_id=None):
+        """
+        Invalidate the sync tokens of a calendar, or of every calendar, so that syncing with them fails with 410 Gone
+        """
+        with self.lock:
+            for calendar in self.calendars.values():
+                if calendar_id is None or calendar.id == calendar_id:
+                    calendar.epoch += 1
+
+    def events(self):
+        return EventsResource(self)
+
+    def freebusy(self):
+        return FreebusyResource(self)
+
+    def new_batch_http_request(self, callback=None):
+        return EmulatedBatch(self, callback)
+
+    def request(self, method_id, parameters):
+        """
+        Build a request, checking its parameters as the discovery-based client does. Parameters set to None are
+        left out.
+        """
+        method, required, optional = METHODS[method_id]
+        parameters = {name: value for name, value in parameters.items() if value is not None}
+        for name in parameters:
+            if name not in required and name not in optional and name not in COMMON_PARAMETERS:
+                raise TypeError(f"Got an unexpected keyword argument {name}")
+        for name in required:
+            if name not in parameters:
+                raise TypeError(f'Missing required parameter "{name}"')
+        return EmulatedRequest(self, method_id, method, parameters)
+
+    def round_trip(self):
+        """
+        Wait for the latency of one round trip to the API
+        """
+        latency = self.latency() if callable(self.latency) else self.latency
+        with self.lock:
+            self.round_trips += 1
+        if latency > 0:
+            self.sleep(latency)
+
+    def execute(self, request):
+        """
+        Send a single request and return its response
+        """
+        self.round_trip()
+        return self.dispatch(request)
+
+    def execute_batch(self, batch):
+        """
+        Send every request of a batch in one round trip, passing each response or error to the callbacks
+        """
+        if len(batch.requests) > BATCH_LIMIT:
+            raise http_error(400, "badRequest", f"A batch may hold at most {BATCH_LIMIT} requests.")
+        self.round_trip()
+        for request_id, (request, callback) in batch.requests.items():
+            try:
+                response, exception = self.dispatch(request), None
+            except HttpError as error:
+                response, exception = None, error
+            for receiver in (callback, batch.callback):
+                if receiver is not None:
+                    receiver(request_id, response, exception)
+
+    def dispatch(self, request):
+        """
+        Run the handler of a request, unless an error is injected, and serialise its response
+        """
+        error = self.injected_error(request)
+        if error is not None:
+            raise error
+        parameters = dict(request.parameters)
+        if request.body is not None:
+            parameters["body"] = json.loads(request.body)
+        fields = parameters.pop("fields", None)
+        parameters.pop("prettyPrint", None)
+        parameters.pop("quotaUser", None)
+        with self.lock:
+            self.calls[request.methodId] += 1
+            handler = getattr(self, "handle_" + request.methodId.split(".", 1)[1].replace(".", "_"))
+            response = handler(**parameters)
+        if response is None:
+            return request.postproc(EmulatorResponse(204), "")
+        if fields is not None:
+            try:
+                response = project(response, parse_fields(fields))
+            except ValueError as error:
+                raise http_error(400, "invalidParameter", str(error), request.uri)
+        text = json.dumps(response)
+        with self.lock:
+            self.bytes_sent += len(text)
+        return request.postproc(EmulatorResponse(200), text)
+
+    def injected_error(self, request):
+        """
+        Return the error to fail a request with, if any
+        """
+        with self.lock:
+            if self.failures:
+                status, reason, retry_after = self.failures.popleft()
+            elif self.error_rate and self.random.random() < self.error_rate:
+                status, reason = self.random.choice(self.errors)
+                retry_after = None
+            else:
+                return None
+            self.injected_errors += 1
+        return http_error(status, reason, uri=request.uri, retry_after=retry_after)
+
+    def timestamp(self):
+        """
+        Return the current time as the API formats created and updated times
+        """
+        now = datetime.datetime.fromtimestamp(self.clock(), datetime.timezone.utc)
+        return now.isoformat(timespec="milliseconds").replace("+00:00", "Z")
+
+    def calendar(self, calendar_id):
+        """
+        Return a calendar, failing with 404 Not Found if there is no such calendar
+        """
+        calendar = self.calendars.get(calendar_id)
+        if calendar is None:
+            raise http_error(404, "notFound", "Not Found")
+        return calendar
+
+    def fill_event(self, calendar, event, now, previous=None):
+        """
+        Fill in the fields the API sets on a stored event
+        """
+        owner = {"email": calendar.id if "@" in calendar.id else EMULATOR_EMAIL, "self": True}
+        event["kind"] = "calendar#event"
+        event.setdefault("status", "confirmed")
+        event["htmlLink"] = f"https://www.google.com/calendar/event?eid={event['id']}"
+        event["created"] = previous["created"] if previous is not None else event.get("created", now)
+        event["updated"] = now
+        event.setdefault("iCalUID", previous["iCalUID"] if previous is not None else f"{event['id']}@google.com")
+        event["sequence"] = previous.get("sequence", 0) + 1 if previous is not None else event.get("sequence", 0)
+        event.setdefault("creator", owner)
+        event.setdefault("organizer", owner)
+        event.setdefault("reminders", {"useDefault": True})
+        event.setdefault("eventType", "default")
+        return event
+
+    def new_event(self, calendar, body, event_id, previous=None):
+        """
+        Validate an event body and build the event stored for it
+        """
+        validate_event(body)
+        event = json.loads(json.dumps(body))
+        event["id"] = event_id
+        for attendee in event.get("attendees", []):
+            attendee.setdefault("responseStatus", "needsAction")
+        if previous is not None:
+            for key in ("recurringEventId", "originalStartTime"):
+                if key in previous:
+                    event.setdefault(key, previous[key])
+        return self.fill_event(calendar, event, self.timestamp(), previous)
+
+    def find(self, calendar, event_id):
+        """
+        Return a stored event or an instance of a recurring event, failing with 404 Not Found if there is neither
+        """
+        event = calendar.events.get(event_id)
+        if event is None:
+            event = self.find_instance(calendar, event_id)
+        if event is None:
+            raise http_error(404, "notFound", "Not Found")
+        return event
+
+    def find_instance(self, calendar, event_id):
+        """
+        Return the unmodified instance of a recurring event with the given instance id, or None
+        """
+        master_id, _, suffix = event_id.rpartition("_")
+        master = calendar.events.get(master_id)
+        if master is None or "recurrence" not in master or master.get("status") == "cancelled":
+            return None
+        try:
+            if len(suffix) == 8:
+                moment = parse_datetime(datetime.datetime.strptime(suffix, "%Y%m%d").date().isoformat())
+            else:
+                moment = datetime.datetime.strptime(suffix, "%Y%m%dT%H%M%SZ").replace(tzinfo=datetime.timezone.utc)
+        except ValueError:
+            return None
+        window_end = moment + datetime.timedelta(days=1 if len(suffix) == 8 else 0, seconds=1)
+        for instance in expand_recurring_event(master, moment.isoformat(), window_end.isoformat()):
+            if instance["id"] == event_id:
+                return instance
+        return None
+
+    def limit_attendees(self, event, max_attendees):
+        """
+        Leave out attendees beyond max_attendees, as the API does when asked to
+        """
+        if max_attendees is None or len(event.get("attendees", [])) <= max_attendees:
+            return event
+        return dict(event, attendees=event["attendees"][:max_attendees], attendeesOmitted=True)
+
+    def handle_events_list(self, calendarId, maxResults=DEFAULT_PAGE_SIZE, pageToken=None, syncToken=None,
+                           singleEvents=False, orderBy=None, timeMin=None, timeMax=None, showDeleted=False, q=None,
+                           iCalUID=None, updatedMin=None, maxAttendees=None, **ignored):
+        calendar = self.calendar(calendarId)
+        if maxResults < 1:
+            raise http_error(400, "invalid", "Invalid value for maxResults.")
+        if orderBy not in (None, "startTime", "updated"):
+            raise http_error(400, "invalid", f"Invalid value for orderBy: {orderBy}")
+        if orderBy == "startTime" and not singleEvents:
+            raise http_error(400, "badRequest", "The requested ordering is not available for the particular query.")
+        if syncToken is not None and any(value is not None for value in (timeMin, timeMax, orderBy, q, iCalUID,
+                                                                         updatedMin)):
+            raise http_error(400, "invalid", "Sync token cannot be used with other request restrictions.")
+
+        if pageToken is None:
+            if syncToken is None:
+                items = self.matching_events(calendar, singleEvents, orderBy, timeMin, timeMax, showDeleted, q,
+                                             iCalUID, updatedMin)
+            else:
+                items = self.changed_events(calendar, syncToken, singleEvents)
+            snapshot_id = str(next(self.snapshot_ids))
+            offset = 0
+            self.snapshots[snapshot_id] = (items, calendar.sync_token())
+            self.snapshot_items += len(items)
+            while len(self.snapshots) > SNAPSHOT_LIMIT or \
+                    len(self.snapshots) > 1 and self.snapshot_items > SNAPSHOT_ITEMS:
+                self.snapshot_items -= len(self.snapshots.popitem(last=False)[1][0])
+        else:
+            snapshot_id, _, offset = pageToken.partition(".")
+            if snapshot_id not in self.snapshots or not offset.isdigit():
+                raise http_error(400, "invalid", "Invalid page token value.")
+            offset = int(offset)
+
+        items, sync_token = self.snapshots[snapshot_id]
+        end = offset + min(maxResults, MAX_PAGE_SIZE)
+        response = {
+            "kind": "calendar#events",
+            "summary": calendar.id,
+            "updated": self.timestamp(),
+            "timeZone": calendar.time_zone,
+            "accessRole": "owner",
+            "defaultReminders": [],
+            "items": [self.limit_attendees(event, maxAttendees) for event in items[offset:end]]
+        }
+        if end < len(items):
+            response["nextPageToken"] = f"{snapshot_id}.{end}"
+        else:
+            response["nextSyncToken"] = sync_token
+        return response
+
+    def matching_events(self, calendar, single_events, order_by, time_min, time_max, show_deleted, q, ical_uid,
+                        updated_min):
+        """
+        Return every event of a listing without a sync token, expanding recurring events into their instances with
+        single_events. Instances are in order of their start, as are events otherwise unless ordered by update.
+        """
+        window_min = parse_time_parameter("timeMin", time_min) if time_min is not None else None
+        window_max = parse_time_parameter("timeMax", time_max) if time_max is not None else None
+        minimum_update = parse_time_parameter("updatedMin", updated_min) if updated_min is not None else None
+        terms = tokenize(q) if q else []
+
+        def wanted(event):
+            if ical_uid is not None and event.get("iCalUID") != ical_uid:
+                return False
+            if minimum_update is not None and parse_datetime(event["updated"]).timestamp() < minimum_update:
+                return False
+            if terms:
+                text = set(tokenize(" ".join([event.get("summary", ""), event.get("description", ""),
+                                              event.get("location", "")] +
+                                             [attendee.get("email", "") for attendee in event.get("attendees", [])])))
+                if not all(term in text for term in terms):
+                    return False
+            return True
+
+        expansion_min = time_min or EXPANSION_START
+        expansion_max = time_max or EXPANSION_END
+        if single_events:
+            return calendar.single_events(window_min, window_max, expansion_min, expansion_max, show_deleted, wanted)
+
+        singles = [event for event in calendar.window(window_min, window_max) if wanted(event)]
+        masters = [calendar.events[event_id] for event_id in calendar.masters if wanted(calendar.events[event_id])]
+        if not show_deleted:
+            # Cancelled instances of recurring events are still listed, so they can be left out when expanding
+            singles = [event for event in singles if event.get("status") != "cancelled" or "recurringEventId" in event]
+            masters = [event for event in masters if event.get("status") != "cancelled"]
+        masters = [event for event in masters
+                   if next(expand_recurring_event(event, expansion_min, expansion_max), None) is not None]
+        events = singles + sorted(masters, key=lambda event: event_instants(event, calendar.time_zone))
+        if order_by == "updated":
+            events.sort(key=lambda event: event["updated"])
+        return events
+
+    def changed_events(self, calendar, sync_token, single_events):
+        """
+        Return the events changed since a sync token, deleted ones included, failing with 410 Gone if the token has
+        expired. With single_events, changed recurring events are replaced by all of their instances.
+        """
+        epoch, _, sequence = sync_token.partition(".")
+        if not epoch.isdigit() or not sequence.isdigit():
+            raise http_error(400, "invalid", "Invalid sync token value.")
+        if int(epoch) != calendar.epoch:
+            raise http_error(410, "fullSyncRequired", "Sync token is no longer valid, a full sync is required.")
+        changed = calendar.changed_since(int(sequence))
+        if not single_events:
+            return changed
+
+        events = []
+        for event in changed:
+            if "recurrence" not in event or event.get("status") == "cancelled":
+                events.append(event)
+            else:
+                events.extend(expand_recurring_event(event, EXPANSION_START, EXPANSION_END, calendar.override_ids))
+        return events
+
+    def handle_events_get(self, calendarId, eventId, maxAttendees=None, **ignored):
+        return self.limit_attendees(self.find(self.calendar(calendarId), eventId), maxAttendees)
+
+    def handle_events_insert(self, calendarId, body, maxAttendees=None, **ignored):
+        calendar = self.calendar(calendarId)
+        event_id = body.get("id") if isinstance(body, dict) and body.get("id") else uuid.uuid4().hex
+        if not EVENT_ID_PATTERN.fullmatch(event_id):
+            raise http_error(400, "invalid", "Invalid resource id value.")
+        if event_id in calendar.events:
+            raise http_error(409, "duplicate", "The requested identifier already exists.")
+        event = self.new_event(calendar, body, event_id)
+        calendar.store(event)
+        return self.limit_attendees(event, maxAttendees)
+
+    def handle_events_update(self, calendarId, eventId, body, maxAttendees=None, **ignored):
+        calendar = self.calendar(calendarId)
+        previous = self.find(calendar, eventId)
+        event = self.new_event(calendar, body, eventId, previous)
+        calendar.store(event)
+        return self.limit_attendees(event, maxAttendees)
+
+    def handle_events_patch(self, calendarId, eventId, body, maxAttendees=None, **ignored):
+        calendar = self.calendar(calendarId)
+        previous = self.find(calendar, eventId)
+        event = self.new_event(calendar, merge_patch(previous, body), eventId, previous)
+        calendar.store(event)
+        return self.limit_attendees(event, maxAttendees)
+
+    def handle_events_delete(self, calendarId, eventId, **ignored):
+        calendar = self.calendar(calendarId)
+        event = self.find(calendar, eventId)
+        if event.get("status") == "cancelled":
+            raise http_error(410, "deleted", "Resource has been deleted")
+        now = self.timestamp()
+        calendar.store(dict(event, status="cancelled", updated=now))
+        if "recurrence" in event:
+            for override in calendar.overrides(eventId):
+                if override.get("status") != "cancelled":
+                    calendar.store(dict(override, status="cancelled", updated=now))
+        return None
+
+    def handle_events_move(self, calendarId, eventId, destination, **ignored):
+        source = self.calendar(calendarId)
+        target = self.calendar(destination)
+        event = source.events.get(eventId)
+        if event is None and self.find_instance(source, eventId) is not None:
+            raise http_error(400, "cannotChangeOrganizerOfInstance", "Cannot change the organizer of an instance.")
+        if event is None or event.get("status") == "cancelled":
+            raise http_error(404, "notFound", "Not Found")
+        existing = target.events.get(eventId)
+        if existing is not None and existing.get("status") != "cancelled":
+            raise http_error(409, "duplicate", "The requested identifier already exists.")
+        now = self.timestamp()
+        source.store(dict(event, status="cancelled", updated=now))
+        organizer = {"email": target.id if "@" in target.id else EMULATOR_EMAIL, "self": True}
+        moved = dict(event, organizer=organizer, updated=now)
+        target.store(moved)
+        return moved
+
+    def handle_events_import(self, calendarId, body, **ignored):
+        calendar = self.calendar(calendarId)
+        if not isinstance(body, dict) or not body.get("iCalUID"):
+            raise http_error(400, "required", "Missing iCalUID.")
+        event_id = calendar.ical_uids.get(body["iCalUID"])
+        previous = calendar.events.get(event_id) if event_id is not None else None
+        if previous is None:
+            event_id = body.get("id") or uuid.uuid4().hex
+        event = self.new_event(calendar, body, event_id, previous)
+        calendar.store(event)
+        return event
+
+    def handle_freebusy_query(self, body, **ignored):
+        if not body.get("timeMin") or not body.get("timeMax"):
+            raise http_error(400, "required", "Missing timeMin or timeMax.")
+        items = body.get("items", [])
+        if len(items) > FREEBUSY_CALENDAR_LIMIT:
+            raise http_error(400, "tooManyCalendarsRequested", "The number of calendars requested is too large.")
+        window_min = parse_time_parameter("timeMin", body["timeMin"])
+        window_max = parse_time_parameter("timeMax", body["timeMax"])
+        if window_max - window_min > FREEBUSY_MAX_SPAN.total_seconds():
+            raise http_error(400, "timeRangeTooLong", "The requested time range is too long.")
+
+        calendars = {}
+        for item in items:
+            calendar = self.calendars.get(item["id"])
+            if calendar is None:
+                calendars[item["id"]] = {"errors": [{"domain": "global", "reason": "notFound"}], "busy": []}
+                continue
+            intervals = []
+            for event in calendar.single_events(window_min, window_max, body["timeMin"], body["timeMax"]):
+                if event.get("transparency") == "transparent":
+                    continue
+                start, end = event_instants(event, calendar.time_zone)
+                if start < window_max and end > window_min:
+                    intervals.append((max(start, window_min), min(end, window_max)))
+            calendars[item["id"]] = {"busy": [{"start": format_instant(start), "end": format_instant(end)}
+                                              for start, end in merge_intervals(intervals)]}
+        return {"kind": "calendar#freeBusy", "timeMin": body["timeMin"], "timeMax": body["timeMax"],
+                "calendars": calendars}
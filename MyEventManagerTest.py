@@ -1,11 +1,25 @@
+import asyncio
 import datetime
+import functools
+import gzip
 import unittest
-from unittest.mock import MagicMock, Mock, patch
+from unittest.mock import MagicMock, Mock, call, patch
 import MyEventManager
 from MyEventManager import *
+from MyEventManagerEmulator import CalendarEmulator
+import os
+import random
 import sys
+import tempfile
+import threading
+import time
 from io import StringIO
 
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
 
 # Add other imports here if needed
 
@@ -47,6 +61,7 @@ class MyEventManagerTestGet(unittest.TestCase):
         """
         This test case tests that the api method is called successfully when getting past events
         """
+        self.mock_api.events.return_value.list.return_value.execute.return_value = {"items": []}
         events = self.calendar.get_past_events()
         self.assertEqual(1, self.mock_api.events.return_value.list.return_value.execute.call_count)
 
@@ -54,6 +69,7 @@ class MyEventManagerTestGet(unittest.TestCase):
         """
         This test case tests that getting past events only gets events up to 5 years in the past
         """
+        self.mock_api.events.return_value.list.return_value.execute.return_value = {"items": []}
         now = datetime.datetime.now().today().isoformat()
 
         past_date = f"{int(now[:4])-5}{now[4:10]}"
@@ -67,6 +83,7 @@ class MyEventManagerTestGet(unittest.TestCase):
         This test case tests that get_cancelled_past_events() successfully gets cancelled events as well as confirmed
         events by checking the showDeleted parameter in the api method
         """
+        self.mock_api.events.return_value.list.return_value.execute.return_value = {"items": []}
         showDeleted = True
         events = self.calendar.get_cancelled_past_events()
         self.assertEqual(1, self.mock_api.events.return_value.list.return_value.execute.call_count)
@@ -78,6 +95,7 @@ class MyEventManagerTestGet(unittest.TestCase):
         """
         This test case tests that the api method is called successfully when getting future events
         """
+        self.mock_api.events.return_value.list.return_value.execute.return_value = {"items": []}
         events = self.calendar.get_future_events()
         self.assertEqual(1, self.mock_api.events.return_value.list.return_value.execute.call_count)
 
@@ -85,6 +103,7 @@ class MyEventManagerTestGet(unittest.TestCase):
         """
         This test case tests that getting future events only get events up to 5 years in the future
         """
+        self.mock_api.events.return_value.list.return_value.execute.return_value = {"items": []}
         current_date = datetime.datetime.now().today().isoformat()
 
         future_date = f"{int(current_date[:4])+5}{current_date[4:10]}"
@@ -98,14 +117,15 @@ class MyEventManagerTestGet(unittest.TestCase):
         This test case tests the time range passed into the api method to get events are from the beginning
         of input year to the end of input year and that the api method is called successfully
         """
+        self.mock_api.events.return_value.list.return_value.execute.return_value = {"items": []}
         current_date = datetime.date.today().isoformat()
         current_year = current_date[:4]
         self.calendar.get_events_from_year(current_year)
         self.assertEqual(1, self.mock_api.events.return_value.list.return_value.execute.call_count)
 
         args, kwargs = self.mock_api.events.return_value.list.call_args_list[0]
-        start_of_year = f"{current_year}-01-01T00:00:00{HOUR_ADJUSTMENT}"
-        end_of_year = f"{current_year}-12-31T23:59:59{HOUR_ADJUSTMENT}"
+        start_of_year = f"{current_year}-01-01T00:00:00+11:00"
+        end_of_year = f"{current_year}-12-31T23:59:59+11:00"
         self.assertEqual(start_of_year, kwargs["timeMin"])
         self.assertEqual(end_of_year, kwargs["timeMax"])
 
@@ -140,6 +160,33 @@ class MyEventManagerTestGet(unittest.TestCase):
         self.assertEqual(f"{date_yesterday} {time} {event1['summary']}\n"
                          f"{date_tomorrow} {time} {event2['summary']}\n", console_output)
 
+    def test_search_by_keyword_matches_like_the_index(self):
+        """
+        This test case tests that calendars without a cache are searched case-insensitively for every term of the
+        keyword, across the same fields and in the same ranked order as the cache's keyword index
+        """
+        events = [
+            {'id': '1', 'summary': 'Team lunch', 'start': {'dateTime': '2022-09-12T12:00:00+10:00'}},
+            {'id': '2', 'summary': 'Planning', 'location': 'Team room',
+             'start': {'dateTime': '2022-09-13T09:00:00+10:00'}},
+            {'id': '3', 'summary': 'TEAM standup', 'start': {'dateTime': '2022-09-14T09:00:00+10:00'}},
+            {'id': '4', 'summary': 'Lunch', 'start': {'dateTime': '2022-09-15T12:00:00+10:00'}}
+        ]
+        self.calendar.get_past_events = MagicMock(return_value={"items": events[:2]})
+        self.calendar.get_future_events = MagicMock(return_value={"items": events[2:]})
+
+        with patch("sys.stdout", new=StringIO()) as buff:
+            self.calendar.search_by_keyword("team")
+            self.calendar.search_by_keyword("lunch TEAM")
+        self.assertEqual("2022-09-12 12:00 Team lunch\n2022-09-14 09:00 TEAM standup\n2022-09-13 09:00 Planning\n"
+                         "2022-09-12 12:00 Team lunch\n", buff.getvalue())
+
+        index = KeywordIndex()
+        for event in events:
+            index.add(event)
+        self.assertEqual(["1", "3", "2"], index.search("team"))
+        self.calendar.get_past_events.assert_called_with(fields=MyEventManager.SEARCH_FIELDS)
+
     def test_search_by_keyword_no_result(self):
         """
         This test case tests that an appropriate message is printed when no events are found containing the keyword
@@ -584,6 +631,7 @@ class MyEventManagerTestJSON(unittest.TestCase):
         with patch.object(MyEventManager, "input", side_effect=[1]):
             e = MyEventManager.get_event_to_export(self.calendar.get_past_events())
 
+        self.mock_api.events.return_value.get.return_value.execute.return_value = event
         file_name = "test_export.json"
         self.calendar.export_event(event, file_name)
 
@@ -650,9 +698,28 @@ class MyEventManagerTestHelper(unittest.TestCase):
                          "8. Delete an event\n"
                          "9. Import event from JSON file\n"
                          "10. Export event from calendar into a JSON file\n"
-                         "11. Exit\n", console_output)
+                         "11. Import events in bulk from an NDJSON or JSON file\n"
+                         "12. Export the events between two dates to a file\n"
+                         "13. Exit\n", console_output)
         self.assertEqual(inp, res)
 
+    def test_get_import_files(self):
+        """
+        This test case tests that the checkpoint file defaults to the one next to the imported file when left blank
+        """
+        with patch.object(MyEventManager, "input", side_effect=["events.ndjson", "", "events.ndjson", "run.ckpt"]):
+            self.assertEqual(("events.ndjson", None), MyEventManager.get_import_files())
+            self.assertEqual(("events.ndjson", "run.ckpt"), MyEventManager.get_import_files())
+
+    def test_get_export_range(self):
+        """
+        This test case tests that the days to export cover the whole of both days in the user's time zone, across the
+        end of daylight saving, in either date format
+        """
+        with patch.object(MyEventManager, "input", side_effect=["2022-04-02", "03-APR-22", "april.ics"]):
+            self.assertEqual(("2022-04-02T00:00:00+11:00", "2022-04-04T00:00:00+10:00", "april.ics"),
+                             MyEventManager.get_export_range("Australia/Melbourne"))
+
     def test_user_keyword(self):
         """
         This test case tests that user input for searched keyword is successfully retrieved
@@ -663,6 +730,2146 @@ class MyEventManagerTestHelper(unittest.TestCase):
         self.assertEqual(keyword, res)
 
 
+class MyEventManagerTestPaging(unittest.TestCase):
+    def setUp(self):
+        self.mock_api = MagicMock()
+        self.calendar = EventManager(self.mock_api)
+
+    def test_iter_events_follows_page_token(self):
+        """
+        This test case tests that iter_events() keeps requesting pages until there is no nextPageToken left and
+        that the page token from each response is passed into the following request
+        """
+        event1 = {'id': '1', 'summary': 'First'}
+        event2 = {'id': '2', 'summary': 'Second'}
+        event3 = {'id': '3', 'summary': 'Third'}
+        self.mock_api.events.return_value.list.return_value.execute.side_effect = [
+            {"items": [event1, event2], "nextPageToken": "page2"},
+            {"items": [event3]}
+        ]
+
+        events = list(self.calendar.iter_events("2020-01-01T00:00:00+10:00", "2021-01-01T00:00:00+10:00",
+                                                page_size=2))
+
+        self.assertEqual([event1, event2, event3], events)
+        self.assertEqual(2, self.mock_api.events.return_value.list.return_value.execute.call_count)
+        first_call, second_call = self.mock_api.events.return_value.list.call_args_list
+        self.assertIsNone(first_call[1]["pageToken"])
+        self.assertEqual("page2", second_call[1]["pageToken"])
+        self.assertEqual(2, second_call[1]["maxResults"])
+
+    def test_iter_events_is_lazy(self):
+        """
+        This test case tests that no api call is made until the iterator returned by iter_events() is consumed
+        """
+        self.mock_api.events.return_value.list.return_value.execute.return_value = {"items": [{'id': '1'}]}
+        events = self.calendar.get_past_events(eager=False)
+        self.assertEqual(0, self.mock_api.events.return_value.list.return_value.execute.call_count)
+
+        self.assertEqual({'id': '1'}, next(events))
+        self.assertEqual(1, self.mock_api.events.return_value.list.return_value.execute.call_count)
+
+    def test_iter_events_invalid_page_size(self):
+        """
+        This test case tests the error handling of iter_events() when given a page size below the boundary of 1
+        """
+        with self.assertRaises(ValueError) as context:
+            list(self.calendar.iter_events("2020-01-01T00:00:00+10:00", "2021-01-01T00:00:00+10:00", page_size=0))
+
+        self.assertTrue("Page size must be at least 1." in str(context.exception))
+        self.assertEqual(0, self.mock_api.events.return_value.list.return_value.execute.call_count)
+
+    def test_list_events_legacy_shape(self):
+        """
+        This test case tests that the eager mode merges every page into a single legacy response dict
+        """
+        self.mock_api.events.return_value.list.return_value.execute.side_effect = [
+            {"items": [{'id': '1'}], "nextPageToken": "page2"},
+            {"items": [{'id': '2'}]}
+        ]
+        events_response = self.calendar.get_cancelled_past_events()
+        self.assertEqual({"items": [{'id': '1'}, {'id': '2'}]}, events_response)
+
+
+class MyEventManagerTestCache(unittest.TestCase):
+    def setUp(self):
+        self.mock_api = MagicMock()
+        self.cache = EventCache(":memory:")
+        self.calendar = EventManager(self.mock_api, self.cache, sync_interval=0)
+        self.event1 = {'id': '1', 'summary': 'First', 'status': 'confirmed',
+                       'start': {'dateTime': '2022-09-13T11:30:00+10:00'},
+                       'end': {'dateTime': '2022-09-13T12:30:00+10:00'}}
+        self.event2 = {'id': '2', 'summary': 'Second', 'status': 'confirmed',
+                       'start': {'dateTime': '2022-09-14T11:30:00+10:00'},
+                       'end': {'dateTime': '2022-09-14T12:30:00+10:00'}}
+
+    def test_full_then_incremental_sync(self):
+        """
+        This test case tests that the first sync downloads everything without a sync token, and that the following
+        sync only requests the changes since the saved sync token, applying cancelled tombstones to the cache
+        """
+        self.mock_api.events.return_value.list.return_value.execute.side_effect = [
+            {"items": [self.event2, self.event1], "nextSyncToken": "token1"},
+            {"items": [{'id': '1', 'status': 'cancelled'}], "nextSyncToken": "token2"}
+        ]
+
+        events = self.calendar.get_events_from_year("2022")
+        self.assertEqual([self.event1, self.event2], events)
+        args, kwargs = self.mock_api.events.return_value.list.call_args_list[0]
+        self.assertNotIn("syncToken", kwargs)
+
+        events = self.calendar.get_events_from_year("2022")
+        self.assertEqual([self.event2], events)
+        args, kwargs = self.mock_api.events.return_value.list.call_args_list[1]
+        self.assertEqual("token1", kwargs["syncToken"])
+        self.assertEqual("token2", self.cache.get_sync_token())
+
+        cancelled = list(self.cache.query("2022-01-01T00:00:00+10:00", "2023-01-01T00:00:00+10:00",
+                                          show_deleted=True))
+        self.assertEqual(["1", "2"], [event["id"] for event in cancelled])
+        self.assertEqual("cancelled", cancelled[0]["status"])
+        self.assertEqual("First", cancelled[0]["summary"])
+
+    def test_expired_sync_token(self):
+        """
+        This test case tests that an expired sync token (410 Gone) clears the cache and triggers a full sync
+        """
+        self.cache.store(self.event1)
+        self.cache.set_sync_token("expired")
+        self.mock_api.events.return_value.list.return_value.execute.side_effect = [
+            HttpError(MagicMock(status=410), b"Gone"),
+            {"items": [self.event2], "nextSyncToken": "token1"}
+        ]
+
+        events = self.calendar.get_events_from_year("2022")
+
+        self.assertEqual([self.event2], events)
+        self.assertEqual("token1", self.cache.get_sync_token())
+
+    def test_query_time_window(self):
+        """
+        This test case tests that only cached events overlapping the requested window are returned, comparing times
+        across different UTC offsets
+        """
+        self.cache.store(self.event1)
+        self.cache.store(self.event2)
+
+        events = list(self.cache.query("2022-09-13T02:30:00Z", "2022-09-14T02:00:00Z"))
+
+        self.assertEqual([self.event2], events)
+
+    def test_read_only_requests_keep_the_cache_in_sync(self):
+        """
+        This test case tests that free/busy queries, which are POSTs, and batches of reads neither force a sync nor
+        empty the read cache, while writes do both
+        """
+        api = CalendarEmulator(calendar_ids=("primary", "stso0001@student.monash.edu"))
+        calendar = EventManager(api, cache=EventCache(":memory:"), scheduler=RequestScheduler(sleep=lambda s: None),
+                                reads=ReadCoalescer())
+        calendar.get_upcoming_events("2030-01-01T00:00:00+11:00", 5)
+        calendar.get_calendar_upcoming_events("primary", "2030-01-01T00:00:00+11:00", 5)
+        reads = calendar.reads.stats()["entries"]
+
+        calendar.check_conflicts("2030-02-01T10:00:00+11:00", "2030-02-01T11:00:00+11:00",
+                                 ["stso0001@student.monash.edu"])
+        calendar.execute_batch(lambda event_id: api.events().get(calendarId="primary", eventId=event_id), ["a"])
+        calendar.get_upcoming_events("2030-01-01T00:00:00+11:00", 5)
+        self.assertIn("primary", calendar.synced_at)
+        self.assertEqual(reads, calendar.reads.stats()["entries"])
+        self.assertEqual(2, api.calls["calendar.events.list"])
+
+        calendar.add_events_bulk([["Tutorial", "Clayton", [], ["2030-02-01", "2030-02-01"], ["10:00", "11:00"]]])
+        self.assertEqual({}, calendar.synced_at)
+        self.assertEqual(0, calendar.reads.stats()["entries"])
+
+
+class MyEventManagerTestKeywordIndex(unittest.TestCase):
+    def setUp(self):
+        self.index = KeywordIndex()
+        self.index.add({'id': '1', 'summary': 'FIT2107 Workshop', 'location': 'Clayton Campus',
+                        'attendees': [{'email': 'stso0004@student.monash.edu'}]})
+        self.index.add({'id': '2', 'summary': 'Team meeting', 'description': 'Discuss the workshop plan'})
+        self.index.add({'id': '3', 'summary': 'Lunch', 'location': 'Workshop cafe'})
+
+    def test_search_case_insensitive_and_ranked(self):
+        """
+        This test case tests that searches ignore case and rank summary matches above location and description
+        matches
+        """
+        self.assertEqual(["1", "3", "2"], self.index.search("WORKSHOP"))
+
+    def test_search_prefix_and_multi_term(self):
+        """
+        This test case tests prefix matching, attendee email matching, and that every term of a multi-term query
+        must match
+        """
+        self.assertEqual(["1", "3", "2"], self.index.search("work"))
+        self.assertEqual([], self.index.search("work", prefix=False))
+        self.assertEqual(["1"], self.index.search("workshop stso0004"))
+        self.assertEqual([], self.index.search("workshop lunch team"))
+
+    def test_incremental_update(self):
+        """
+        This test case tests that re-adding or removing an event updates the index without a rebuild
+        """
+        self.index.add({'id': '3', 'summary': 'Lunch', 'location': 'Food court'})
+        self.index.remove('2')
+
+        self.assertEqual(["1"], self.index.search("workshop"))
+        self.assertNotIn("cafe", self.index.tokens)
+
+    def test_search_by_keyword_uses_index(self):
+        """
+        This test case tests that search_by_keyword() answers from the cache index when a cache is available
+        """
+        mock_api = MagicMock()
+        mock_api.events.return_value.list.return_value.execute.return_value = {"items": [
+            {'id': '1', 'summary': 'Event with Keyword', 'status': 'confirmed',
+             'start': {'dateTime': '2022-09-13T11:30:00+10:00'}, 'end': {'dateTime': '2022-09-13T12:30:00+10:00'}},
+            {'id': '2', 'summary': 'Other event', 'status': 'confirmed',
+             'start': {'dateTime': '2022-09-14T11:30:00+10:00'}, 'end': {'dateTime': '2022-09-14T12:30:00+10:00'}}
+        ]}
+        calendar = EventManager(mock_api, EventCache(":memory:"))
+
+        buff = StringIO()
+        sys.stdout = buff
+        calendar.search_by_keyword("keyword")
+        calendar.search_by_keyword("missing")
+        console_output = buff.getvalue()
+        sys.stdout = sys.__stdout__
+
+        self.assertEqual("2022-09-13 11:30 Event with Keyword\nNo events found.\n", console_output)
+
+
+class FakeBatch:
+    """
+    Stand-in for a batch HTTP request which replays the outcome queued for each event summary, or for each event id
+    when the request body has no summary
+    """
+
+    def __init__(self, outcomes, callback):
+        self.outcomes = outcomes
+        self.callback = callback
+        self.requests = []
+
+    def add(self, request, request_id):
+        self.requests.append((request_id, request))
+
+    def execute(self):
+        for request_id, request in self.requests:
+            args, kwargs = request
+            key = kwargs["body"]["summary"] if "summary" in kwargs.get("body", {}) else kwargs["eventId"]
+            outcome = self.outcomes[key].pop(0)
+            if isinstance(outcome, Exception):
+                self.callback(request_id, None, outcome)
+            else:
+                self.callback(request_id, dict(kwargs.get("body", {}), id=outcome), None)
+
+
+class FakeBatchMixin:
+    """
+    Routes batch requests on self.mock_api to FakeBatch objects, collected in self.batches, which replay the outcomes
+    queued in self.outcomes
+    """
+
+    def use_fake_batches(self):
+        self.batches = []
+        self.outcomes = {}
+
+        def new_batch(callback):
+            batch = FakeBatch(self.outcomes, callback)
+            self.batches.append(batch)
+            return batch
+
+        self.mock_api.new_batch_http_request.side_effect = new_batch
+
+
+class MyEventManagerTestBulkAdd(FakeBatchMixin, unittest.TestCase):
+    def setUp(self):
+        self.mock_api = MagicMock()
+        self.clock = FakeClock()
+        self.calendar = EventManager(self.mock_api, scheduler=RequestScheduler(clock=self.clock.time,
+                                                                               sleep=self.clock.sleep))
+        self.use_fake_batches()
+        self.mock_api.events.return_value.insert.side_effect = lambda **kwargs: ((), kwargs)
+
+    def spec(self, name):
+        return [name, "Clayton", [], ["01-DEC-22", "2022-12-01"], ["16:00", "17:00"]]
+
+    def test_add_events_bulk_groups_into_batches(self):
+        """
+        This test case tests that inserts are grouped into batches no larger than the batch size and that results are
+        returned in the order of the specs
+        """
+        for i in range(5):
+            self.outcomes[f"Event {i}"] = [f"id{i}"]
+
+        with patch("sys.stdout", new=StringIO()) as buff:
+            results = self.calendar.add_events_bulk((self.spec(f"Event {i}") for i in range(5)), batch_size=2)
+
+        self.assertEqual([2, 2, 1], [len(batch.requests) for batch in self.batches])
+        self.assertEqual([f"id{i}" for i in range(5)], [event["id"] for event in results])
+        self.assertEqual("2022-12-01T16:00:00+11:00", results[0]["start"]["dateTime"])
+        self.assertEqual("Events created: 5/5\n", buff.getvalue())
+
+    def test_add_events_bulk_retries_failures_only(self):
+        """
+        This test case tests that only the sub-requests that failed with a retryable error are sent again, and that
+        a request failing with a non-retryable error is reported without being retried
+        """
+        throttled = HttpError(MagicMock(status=429), b"Too Many Requests")
+        bad_request = HttpError(MagicMock(status=400), b"Bad Request")
+        self.outcomes["Good"] = ["id1"]
+        self.outcomes["Throttled"] = [throttled, "id2"]
+        self.outcomes["Bad"] = [bad_request]
+
+        with patch.object(MyEventManager.random, "uniform", return_value=0.25) as uniform, \
+                patch("sys.stdout", new=StringIO()) as buff:
+            results = self.calendar.add_events_bulk([self.spec("Good"), self.spec("Throttled"), self.spec("Bad")])
+
+        self.assertEqual(2, len(self.batches))
+        self.assertEqual(["1"], [request_id for request_id, request in self.batches[1].requests])
+        self.assertEqual("id1", results[0]["id"])
+        self.assertEqual("id2", results[1]["id"])
+        self.assertIs(bad_request, results[2])
+        self.assertEqual([0.25], self.clock.sleeps)
+        uniform.assert_called_once_with(0, BACKOFF_BASE_DELAY)
+        self.assertEqual("Events created: 2/3\n", buff.getvalue())
+
+    def test_add_events_bulk_honours_retry_after(self):
+        """
+        This test case tests that a batch is resent after the longest Retry-After its throttled sub-requests ask for
+        """
+        self.outcomes["First"] = [HttpError(MagicMock(status=429, get={"retry-after": "3"}.get), b""), "id1"]
+        self.outcomes["Second"] = [HttpError(MagicMock(status=503, get={"retry-after": "7"}.get), b""), "id2"]
+
+        with patch("sys.stdout", new=StringIO()):
+            results = self.calendar.add_events_bulk([self.spec("First"), self.spec("Second")])
+
+        self.assertEqual(["id1", "id2"], [event["id"] for event in results])
+        self.assertEqual([7], self.clock.sleeps)
+
+    def test_add_events_bulk_invalid_batch_size(self):
+        """
+        This test case tests the boundaries of the batch size, which must be between 1 and the batch limit
+        """
+        for batch_size in [0, BATCH_LIMIT + 1]:
+            with self.assertRaises(ValueError) as context:
+                self.calendar.add_events_bulk([self.spec("Event")], batch_size=batch_size)
+            self.assertTrue(f"Batch size must be between 1 and {BATCH_LIMIT}." in str(context.exception))
+        self.assertEqual(0, self.mock_api.new_batch_http_request.call_count)
+
+
+class MyEventManagerTestBulkUpdate(FakeBatchMixin, unittest.TestCase):
+    def setUp(self):
+        self.mock_api = MagicMock()
+        self.calendar = EventManager(self.mock_api)
+        self.use_fake_batches()
+        self.mock_api.events.return_value.delete.side_effect = lambda **kwargs: ((), kwargs)
+        self.mock_api.events.return_value.patch.side_effect = lambda **kwargs: ((), kwargs)
+        last_week = (datetime.datetime.now() - datetime.timedelta(days=7)).isoformat()
+        tomorrow = (datetime.datetime.now() + datetime.timedelta(days=1)).isoformat()
+        self.events = [
+            {'id': '1', 'summary': 'Old Lecture', 'status': 'confirmed', 'start': {'dateTime': last_week}},
+            {'id': '2', 'summary': 'Old lecture recap', 'status': 'cancelled', 'start': {'dateTime': last_week}},
+            {'id': '3', 'summary': 'Upcoming lecture', 'status': 'confirmed', 'start': {'dateTime': tomorrow}},
+            {'id': '4', 'summary': 'Lunch', 'status': 'confirmed', 'start': {'dateTime': last_week}}
+        ]
+        self.mock_api.events.return_value.list.return_value.execute.return_value = {"items": self.events}
+
+    def test_bulk_delete_keeps_delete_rules(self):
+        """
+        This test case tests that a bulk delete only deletes past events matching the keyword, skipping future events
+        as delete_event() would, and reports progress
+        """
+        self.outcomes["1"] = [""]
+        self.outcomes["2"] = [""]
+
+        with patch("sys.stdout", new=StringIO()) as buff:
+            report = self.calendar.bulk_update("delete", "2020-01-01T00:00:00+10:00", "2050-01-01T00:00:00+10:00",
+                                               keyword="LECTURE")
+
+        self.assertEqual({"succeeded": 2, "failed": 0, "skipped": 1}, report)
+        self.assertEqual(["1", "2"], [request[1]["eventId"] for request_id, request in self.batches[0].requests])
+        self.assertEqual("Progress: 2 succeeded, 0 failed, 1 skipped\n", buff.getvalue())
+
+    def test_bulk_restore_status_filter(self):
+        """
+        This test case tests that a bulk restore only restores cancelled events and requests them with showDeleted
+        """
+        self.outcomes["2"] = ["2"]
+
+        with patch("sys.stdout", new=StringIO()):
+            report = self.calendar.bulk_update("restore", "2020-01-01T00:00:00+10:00", "2050-01-01T00:00:00+10:00",
+                                               status="cancelled")
+
+        self.assertEqual({"succeeded": 1, "failed": 0, "skipped": 0}, report)
+        args, kwargs = self.batches[0].requests[0][1]
+        self.assertEqual({"status": "confirmed"}, kwargs["body"])
+        args, kwargs = self.mock_api.events.return_value.list.call_args_list[0]
+        self.assertTrue(kwargs["showDeleted"])
+
+    def test_bulk_cancel_dry_run(self):
+        """
+        This test case tests that a dry run lists the events that would be cancelled without sending any request
+        """
+        with patch("sys.stdout", new=StringIO()) as buff:
+            report = self.calendar.bulk_update("cancel", "2020-01-01T00:00:00+10:00", "2050-01-01T00:00:00+10:00",
+                                               dry_run=True)
+
+        self.assertEqual({"succeeded": 3, "failed": 0, "skipped": 1}, report)
+        self.assertEqual(0, self.mock_api.new_batch_http_request.call_count)
+        self.assertEqual("Would cancel event `Old Lecture`\n"
+                         "Would cancel event `Upcoming lecture`\n"
+                         "Would cancel event `Lunch`\n", buff.getvalue())
+
+    def test_bulk_update_invalid_action(self):
+        """
+        This test case tests the error handling of bulk_update() when given an unknown action
+        """
+        with self.assertRaises(ValueError) as context:
+            self.calendar.bulk_update("archive", "2020-01-01T00:00:00+10:00", "2050-01-01T00:00:00+10:00")
+
+        self.assertTrue("Action must be one of: delete, cancel, restore." in str(context.exception))
+        self.assertEqual(0, self.mock_api.events.return_value.list.return_value.execute.call_count)
+
+
+class MyEventManagerTestAsync(unittest.IsolatedAsyncioTestCase):
+    def setUp(self):
+        self.api = CalendarEmulator(calendar_ids=("primary", "stso0004@student.monash.edu"))
+        self.calendar = AsyncEventManager(self.api, max_in_flight=2,
+                                          scheduler=RequestScheduler(sleep=lambda seconds: None))
+        self.directory = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        self.calendar.close()
+        self.directory.cleanup()
+
+    def insert(self, summary, start, end):
+        body = {'summary': summary, 'start': {'dateTime': start}, 'end': {'dateTime': end}}
+        return self.api.events().insert(calendarId="primary", body=body).execute()
+
+    async def test_concurrent_requests_are_bounded(self):
+        """
+        This test case tests that concurrent calls overlap, but never with more requests in flight than the limit.
+        The first requests wait at a barrier which only opens once the limit is reached.
+        """
+        barrier = threading.Barrier(2, timeout=10)
+        lock = threading.Lock()
+        state = {"calls": 0, "in_flight": 0, "peak": 0}
+
+        def round_trip(seconds):
+            with lock:
+                state["calls"] += 1
+                state["in_flight"] += 1
+                state["peak"] = max(state["peak"], state["in_flight"])
+                first = state["calls"] <= 2
+            if first:
+                barrier.wait()
+            with lock:
+                state["in_flight"] -= 1
+
+        self.api.latency = 1
+        self.api.sleep = round_trip
+
+        results = await asyncio.gather(*(self.calendar.get_events_from_year(str(year)) for year in range(2020, 2026)))
+
+        self.assertEqual([[]] * 6, results)
+        self.assertEqual(6, state["calls"])
+        self.assertEqual(2, state["peak"])
+
+    async def test_add_events(self):
+        """
+        This test case tests that add_events() inserts every spec and returns the created events in order
+        """
+        specs = [[f"Event {i}", "Clayton", [], ["2050-12-01", "2050-12-01"], ["16:00", "17:00"]] for i in range(3)]
+
+        with patch("sys.stdout", new=StringIO()):
+            events = await self.calendar.add_events(specs)
+
+        self.assertEqual(["Event 0", "Event 1", "Event 2"], [event["summary"] for event in events])
+        self.assertEqual(3, self.api.calls["calendar.events.insert"])
+
+    async def test_iter_events(self):
+        """
+        This test case tests that events are yielded in order across pages taken from the thread pool
+        """
+        for day in range(1, 8):
+            self.insert(f"Event {day}", f"2030-01-0{day}T10:00:00+11:00", f"2030-01-0{day}T11:00:00+11:00")
+
+        events = [event["summary"] async for event in self.calendar.iter_events(
+            "2030-01-01T00:00:00+11:00", "2030-02-01T00:00:00+11:00", page_size=3)]
+
+        self.assertEqual([f"Event {day}" for day in range(1, 8)], events)
+        self.assertEqual(3, self.api.calls["calendar.events.list"])
+
+    async def test_conflicts_and_free_slots(self):
+        """
+        This test case tests the free/busy methods, which clash with and avoid the events in the calendar
+        """
+        self.insert("Lecture", "2030-02-01T10:00:00+11:00", "2030-02-01T12:00:00+11:00")
+
+        conflicts = await self.calendar.find_conflicts([("2030-02-01T11:00:00+11:00", "2030-02-01T13:00:00+11:00",
+                                                         [])])
+        clashes = await self.calendar.check_conflicts("2030-02-01T13:00:00+11:00", "2030-02-01T14:00:00+11:00", [])
+        slots = await self.calendar.find_free_slots([], datetime.timedelta(hours=1),
+                                                    ("2030-02-01T00:00:00+11:00", "2030-02-02T00:00:00+11:00"),
+                                                    limit=20)
+
+        self.assertEqual(["primary"], list(conflicts[0]))
+        self.assertEqual({}, clashes)
+        self.assertTrue(slots)
+        self.assertFalse([slot for slot in slots if slot[0] < "2030-02-01T12:00:00+11:00"
+                          and slot[1] > "2030-02-01T10:00:00+11:00"])
+
+    async def test_import_and_export_events(self):
+        """
+        This test case tests a bulk import from a file followed by an export of the imported events to another
+        """
+        records = [{'id': f'uid{i}', 'summary': f'Event {i}', 'organizer': {'email': 'stso0004@student.monash.edu'},
+                    'start': {'dateTime': f'2030-01-0{i + 1}T11:30:00+11:00'},
+                    'end': {'dateTime': f'2030-01-0{i + 1}T13:30:00+11:00'}} for i in range(3)]
+        source = os.path.join(self.directory.name, "events.ndjson")
+        target = os.path.join(self.directory.name, "export.ndjson")
+        with open(source, "w") as outfile:
+            outfile.write("\n".join(json.dumps(record) for record in records))
+
+        with patch("sys.stdout", new=StringIO()):
+            report = await self.calendar.import_events(source, batch_size=2)
+            await self.calendar.export_events("2030-01-01T00:00:00+11:00", "2030-02-01T00:00:00+11:00", target)
+
+        self.assertEqual({"imported": 3, "failed": 0, "invalid": 0, "skipped": 0}, report)
+        with open(target) as exported:
+            self.assertEqual(["Event 0", "Event 1", "Event 2"], [json.loads(line)["summary"] for line in exported])
+
+    async def test_change_organizer(self):
+        """
+        This test case tests that the interactive organizer change moves the chosen event to the new organizer
+        """
+        tomorrow = datetime.datetime.now(datetime.timezone.utc) + datetime.timedelta(days=1)
+        self.insert("Meeting", tomorrow.isoformat(), (tomorrow + datetime.timedelta(hours=1)).isoformat())
+
+        with patch("builtins.input", side_effect=["1", "stso0004@student.monash.edu"]), \
+                patch("sys.stdout", new=StringIO()) as buff:
+            await self.calendar.change_organizer()
+
+        self.assertIn("New Organizer:  stso0004@student.monash.edu", buff.getvalue())
+        self.assertEqual(1, self.api.calls["calendar.events.move"])
+
+    async def test_manager_options(self):
+        """
+        This test case tests that the options of EventManager are passed on, so events are created and years read
+        in the user's own time zone
+        """
+        calendar = AsyncEventManager(self.api, scheduler=RequestScheduler(sleep=lambda seconds: None),
+                                     time_zone="America/New_York", workers=2, shard="quarter", expand_recurring=True)
+        self.addCleanup(calendar.close)
+
+        with patch("sys.stdout", new=StringIO()):
+            event = await calendar.add_new_events("Standup", "Online", [], ["2030-12-31", "2030-12-31"],
+                                                  ["23:00", "23:30"])
+        events = await calendar.get_events_from_year("2030")
+        next_year = await calendar.get_events_from_year("2031")
+
+        self.assertEqual("2030-12-31T23:00:00-05:00", event["start"]["dateTime"])
+        self.assertEqual(["Standup"], [event["summary"] for event in events])
+        self.assertEqual([], next_year)
+        self.assertEqual(("America/New_York", 2, "quarter", True),
+                         (calendar.manager.time_zone.name, calendar.manager.workers, calendar.manager.shard,
+                          calendar.manager.expand_recurring))
+
+    async def test_get_upcoming_events_none(self):
+        """
+        This test case tests that errors raised by EventManager are passed back to the awaiting caller
+        """
+        with self.assertRaises(ValueError) as context:
+            await self.calendar.get_upcoming_events("2020-08-03T00:00:00.000000Z", 0)
+
+        self.assertTrue("Number of events must be at least 1." in str(context.exception))
+
+    def test_invalid_in_flight_limit(self):
+        """
+        This test case tests the lower boundary of the in-flight request limit
+        """
+        with self.assertRaises(ValueError) as context:
+            AsyncEventManager(self.api, max_in_flight=0)
+
+        self.assertTrue("Maximum in-flight requests must be at least 1." in str(context.exception))
+
+
+class MyEventManagerTestSharding(unittest.TestCase):
+    def test_split_time_range_by_year(self):
+        """
+        This test case tests that a range is split on calendar year boundaries, keeping the original ends
+        """
+        shards = split_time_range("2020-06-15T10:00:00+10:00", "2022-03-01T00:00:00+10:00")
+        self.assertEqual([("2020-06-15T10:00:00+10:00", "2021-01-01T00:00:00+10:00"),
+                          ("2021-01-01T00:00:00+10:00", "2022-01-01T00:00:00+10:00"),
+                          ("2022-01-01T00:00:00+10:00", "2022-03-01T00:00:00+10:00")], shards)
+
+    def test_split_time_range_by_quarter(self):
+        """
+        This test case tests quarter shards across a year boundary, and the error handling of unknown shard sizes
+        """
+        shards = split_time_range("2021-11-01T00:00:00+10:00", "2022-05-01T00:00:00+10:00", "quarter")
+        self.assertEqual(["2021-11-01", "2022-01-01", "2022-04-01"], [shard[0][:10] for shard in shards])
+        self.assertEqual("2022-05-01", shards[-1][1][:10])
+
+        with self.assertRaises(ValueError) as context:
+            split_time_range("2021-11-01T00:00:00+10:00", "2022-05-01T00:00:00+10:00", "week")
+        self.assertTrue("Shard must be one of: year, quarter, month." in str(context.exception))
+
+    def test_sharded_fetch_merges_in_order(self):
+        """
+        This test case tests that shards fetched concurrently are merged into starting time order, and that an event
+        spanning a shard boundary is only returned once
+        """
+        spanning = {'id': 'span', 'start': {'dateTime': '2021-12-31T23:00:00+10:00'}}
+        events_by_year = {
+            "2021": [{'id': 'a', 'start': {'dateTime': '2021-03-01T09:00:00+10:00'}}, spanning],
+            "2022": [spanning, {'id': 'b', 'start': {'date': '2022-02-01'}}],
+            "2023": [{'id': 'c', 'start': {'dateTime': '2023-01-01T00:00:00Z'}}]
+        }
+        mock_api = MagicMock()
+        mock_api.events.return_value.list.side_effect = lambda **kwargs: MagicMock(
+            execute=MagicMock(return_value={"items": events_by_year[kwargs["timeMin"][:4]]}))
+        calendar = EventManager(mock_api, workers=3)
+
+        events = calendar.list_events("2021-01-01T00:00:00+10:00", "2023-06-01T00:00:00+10:00")
+
+        self.assertEqual(["a", "span", "b", "c"], [event["id"] for event in events["items"]])
+        self.assertEqual(3, mock_api.events.return_value.list.call_count)
+
+    def test_sharded_fetch_runs_concurrently(self):
+        """
+        This test case tests that as many shards are fetched at once as there are workers, and no more. The first
+        requests wait at a barrier which only opens once all the workers are inside a request.
+        """
+        workers = 5
+        barrier = threading.Barrier(workers, timeout=10)
+        lock = threading.Lock()
+        state = {"calls": 0, "in_flight": 0, "peak": 0}
+
+        def execute():
+            with lock:
+                state["calls"] += 1
+                state["in_flight"] += 1
+                state["peak"] = max(state["peak"], state["in_flight"])
+                first = state["calls"] <= workers
+            if first:
+                barrier.wait()
+            with lock:
+                state["in_flight"] -= 1
+            return {"items": []}
+
+        mock_api = MagicMock()
+        mock_api.events.return_value.list.return_value.execute.side_effect = execute
+        calendar = EventManager(mock_api, workers=workers)
+
+        calendar.list_events("2015-01-01T00:00:00+10:00", "2025-01-01T00:00:00+10:00")
+
+        self.assertEqual(10, state["calls"])
+        self.assertEqual(workers, state["peak"])
+
+    def test_streams_are_bounded(self):
+        """
+        This test case tests that concurrently read sources are merged as they are consumed, with no source running
+        more than its queue ahead of the caller, and that errors reach the caller
+        """
+        consumed = [0]
+        leads = []
+
+        def source(offset):
+            for i in range(100):
+                leads.append(i - consumed[0])
+                yield i * 3 + offset
+
+        items = []
+        for item in stream_concurrently([functools.partial(source, offset) for offset in range(3)], 2,
+                                        key=lambda item: item, queue_size=4):
+            items.append(item)
+            consumed[0] = len(items) // 3
+        self.assertEqual(list(range(300)), items)
+        # Besides its queue, a source may hold one item it is putting, and the merge one item from it
+        self.assertLessEqual(max(leads), 4 + 3)
+
+        def failing():
+            yield 1
+            raise ValueError("offline")
+
+        with self.assertRaises(ValueError):
+            list(stream_concurrently([failing, lambda: iter([2, 3])], 2))
+
+    def test_invalid_workers(self):
+        """
+        This test case tests the lower boundary of the number of workers
+        """
+        with self.assertRaises(ValueError) as context:
+            EventManager(MagicMock(), workers=0)
+
+        self.assertTrue("Number of workers must be at least 1." in str(context.exception))
+
+
+class MyEventManagerTestCredentials(unittest.TestCase):
+    def setUp(self):
+        self.creds = MagicMock(refresh_token="refresh")
+
+    def test_refresh_before_expiry(self):
+        """
+        This test case tests that credentials are refreshed once they are within the refresh margin of expiring
+        """
+        self.creds.expiry = datetime.datetime.utcnow() + TOKEN_REFRESH_MARGIN - datetime.timedelta(seconds=1)
+        with patch.object(MyEventManager, "save_credentials") as save:
+            self.assertTrue(MyEventManager.refresh_credentials(self.creds))
+
+        self.assertEqual(1, self.creds.refresh.call_count)
+        save.assert_called_once_with(self.creds)
+
+    def test_no_refresh_when_fresh(self):
+        """
+        This test case tests that credentials far from expiry, or without a refresh token, are left alone
+        """
+        self.creds.expiry = datetime.datetime.utcnow() + TOKEN_REFRESH_MARGIN + datetime.timedelta(minutes=1)
+        self.assertFalse(MyEventManager.refresh_credentials(self.creds))
+
+        self.creds.expiry = datetime.datetime.utcnow()
+        self.creds.refresh_token = None
+        self.assertFalse(MyEventManager.refresh_credentials(self.creds))
+        self.assertEqual(0, self.creds.refresh.call_count)
+
+    def test_http_reused_per_thread(self):
+        """
+        This test case tests that each thread reuses a single pooled connection, separate from other threads
+        """
+        first = MyEventManager.get_authorized_http(self.creds)
+        self.assertIs(first, MyEventManager.get_authorized_http(self.creds))
+
+        other = []
+        thread = threading.Thread(target=lambda: other.append(MyEventManager.get_authorized_http(self.creds)))
+        thread.start()
+        thread.join()
+        self.assertIsNot(first, other[0])
+
+
+class MyEventManagerTestProjection(unittest.TestCase):
+    def setUp(self):
+        self.mock_api = MagicMock()
+        self.calendar = EventManager(self.mock_api)
+        self.mock_api.events.return_value.list.return_value.execute.return_value = {"items": []}
+
+    def test_display_paths_use_minimal_fields(self):
+        """
+        This test case tests that the getters used for display and search request the minimal partial response by
+        default, while list_events() requests full bodies unless told otherwise
+        """
+        self.calendar.get_past_events()
+        self.calendar.get_events_from_year("2022")
+        self.calendar.list_events("2022-01-01T00:00:00+10:00", "2023-01-01T00:00:00+10:00")
+
+        calls = self.mock_api.events.return_value.list.call_args_list
+        self.assertEqual(LIST_FIELDS, calls[0][1]["fields"])
+        self.assertEqual(LIST_FIELDS, calls[1][1]["fields"])
+        self.assertIsNone(calls[2][1]["fields"])
+
+    def test_cancel_fetches_full_body(self):
+        """
+        This test case tests that cancelling a partial event fetches its full body first so the update does not
+        drop any fields
+        """
+        partial = {'id': '1', 'summary': 'Event Summary', 'status': 'confirmed',
+                   'start': {'dateTime': '2021-09-13T11:30:00+10:00'}}
+        full = dict(partial, etag='"1"', location='Clayton', attendees=[{'email': 'stso0004@student.monash.edu'}])
+        self.mock_api.events.return_value.get.return_value.execute.return_value = dict(full)
+
+        with patch("sys.stdout", new=StringIO()):
+            self.calendar.cancel_event(partial)
+
+        self.mock_api.events.return_value.get.assert_called_once_with(calendarId="primary", eventId="1")
+        args, kwargs = self.mock_api.events.return_value.update.call_args
+        self.assertEqual(dict(full, status="cancelled"), kwargs["body"])
+
+    def test_full_event_not_refetched(self):
+        """
+        This test case tests that an event which already has its full body is not fetched again
+        """
+        full = {'id': '1', 'etag': '"1"', 'summary': 'Event Summary'}
+        self.assertIs(full, self.calendar.get_full_event(full))
+        self.assertEqual(0, self.mock_api.events.return_value.get.call_count)
+
+
+class MyEventManagerTestEventModel(unittest.TestCase):
+    def setUp(self):
+        self.resource = {'kind': 'calendar#event', 'etag': '"1"', 'id': '1', 'status': 'confirmed',
+                         'summary': 'Workshop', 'location': 'Clayton',
+                         'start': {'dateTime': '2022-09-13T11:30:00+10:00', 'timeZone': 'Australia/Melbourne'},
+                         'end': {'dateTime': '2022-09-13T13:30:00+10:00', 'timeZone': 'Australia/Melbourne'},
+                         'attendees': [{'email': 'stso0004@student.monash.edu', 'responseStatus': 'accepted'}]}
+
+    def test_parse_once(self):
+        """
+        This test case tests that the start and end are parsed into timezone-aware datetimes and the status into an
+        interned enum member
+        """
+        event = Event.from_api(self.resource)
+
+        self.assertEqual(datetime.datetime(2022, 9, 13, 1, 30, tzinfo=datetime.timezone.utc), event.start)
+        self.assertEqual(datetime.timedelta(hours=2), event.end - event.start)
+        self.assertIs(EventStatus.CONFIRMED, event.status)
+        self.assertFalse(event.all_day)
+        self.assertFalse(hasattr(event, "__dict__"))
+
+    def test_round_trip(self):
+        """
+        This test case tests that converting to an Event and back gives the original resource, including a status
+        change made through the Event
+        """
+        event = Event.from_api(self.resource)
+        self.assertEqual(self.resource, event.to_api())
+
+        event.status = EventStatus.CANCELLED
+        self.assertEqual(dict(self.resource, status="cancelled"), event.to_api())
+
+    def test_all_day_event(self):
+        """
+        This test case tests that all-day events are parsed from their date and printed without a time
+        """
+        event = Event.from_api({'id': '2', 'summary': 'Holiday', 'start': {'date': '2022-12-25'},
+                                'end': {'date': '2022-12-26'}})
+
+        self.assertTrue(event.all_day)
+        self.assertEqual(("2022-12-25", "All day"), format_start(event))
+
+        buff = StringIO()
+        sys.stdout = buff
+        print_events([event, self.resource])
+        console_output = buff.getvalue()
+        sys.stdout = sys.__stdout__
+        self.assertEqual("-------------------------------------------------------------------------\n"
+                         "1. 2022-12-25 All day GMT+11:00 Holiday\n"
+                         "2. 2022-09-13 11:30 GMT+10:00 Workshop\n"
+                         "-------------------------------------------------------------------------\n",
+                         console_output)
+
+
+class MyEventManagerTestBulkImport(FakeBatchMixin, unittest.TestCase):
+    def setUp(self):
+        self.mock_api = MagicMock()
+        self.calendar = EventManager(self.mock_api)
+        self.use_fake_batches()
+        self.mock_api.events.return_value.import_.side_effect = lambda **kwargs: ((), kwargs)
+        self.directory = tempfile.TemporaryDirectory()
+        self.records = [{'id': f'uid{i}', 'summary': f'Event {i}',
+                         'organizer': {'email': 'stso0004@student.monash.edu'},
+                         'start': {'dateTime': '2022-09-13T11:30:00+10:00'},
+                         'end': {'dateTime': '2022-09-13T13:30:00+10:00'}} for i in range(5)]
+        for i in range(5):
+            self.outcomes[f"Event {i}"] = [f"id{i}"]
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def write(self, name, text):
+        path = os.path.join(self.directory.name, name)
+        with open(path, "w") as outfile:
+            outfile.write(text)
+        return path
+
+    def test_iter_json_records_array(self):
+        """
+        This test case tests that a JSON array is read incrementally, with chunks that split records, whitespace and
+        separators at arbitrary points
+        """
+        path = self.write("events.json", json.dumps(self.records, indent=2))
+        with open(path) as json_file:
+            records = list(MyEventManager.iter_json_records(json_file, chunk_size=7))
+        self.assertEqual(self.records, records)
+
+        path = self.write("empty.json", " [ ] ")
+        with open(path) as json_file:
+            self.assertEqual([], list(MyEventManager.iter_json_records(json_file, chunk_size=2)))
+
+    def test_iter_json_records_ndjson(self):
+        """
+        This test case tests NDJSON input with blank lines, a malformed line and no trailing newline
+        """
+        text = json.dumps(self.records[0]) + "\n\n{not json\n" + json.dumps(self.records[1])
+        path = self.write("events.ndjson", text)
+        with open(path) as json_file:
+            records = list(MyEventManager.iter_json_records(json_file, chunk_size=10))
+        self.assertEqual([self.records[0], None, self.records[1]], records)
+
+    def test_import_events_in_batches(self):
+        """
+        This test case tests that records are imported in batches, invalid records are counted and skipped, and
+        the checkpoint is removed once the import finishes
+        """
+        invalid = {'id': 'bad', 'summary': 'No times', 'organizer': {'email': 'stso0004@student.monash.edu'}}
+        path = self.write("events.ndjson", "\n".join(json.dumps(record) for record in
+                                                      self.records[:2] + [invalid] + self.records[2:]))
+
+        with patch("sys.stdout", new=StringIO()):
+            report = self.calendar.import_events(path, batch_size=2)
+
+        self.assertEqual({"imported": 5, "failed": 0, "invalid": 1, "skipped": 0}, report)
+        self.assertEqual([2, 2, 1], [len(batch.requests) for batch in self.batches])
+        args, kwargs = self.batches[0].requests[0][1]
+        self.assertEqual("uid0", kwargs["body"]["iCalUID"])
+        self.assertFalse(os.path.exists(path + CHECKPOINT_SUFFIX))
+
+    def test_import_events_resumes_from_checkpoint(self):
+        """
+        This test case tests that an import interrupted part way through resumes after the last completed batch
+        instead of importing every record again
+        """
+        path = self.write("events.json", json.dumps(self.records))
+        batch_execute = FakeBatch.execute
+        calls = []
+
+        def crash_on_second_batch(batch):
+            calls.append(batch)
+            if len(calls) == 2:
+                raise RuntimeError("Connection lost")
+            batch_execute(batch)
+
+        with patch.object(FakeBatch, "execute", crash_on_second_batch), patch("sys.stdout", new=StringIO()):
+            with self.assertRaises(RuntimeError):
+                self.calendar.import_events(path, batch_size=2)
+        self.assertTrue(os.path.exists(path + CHECKPOINT_SUFFIX))
+
+        self.batches.clear()
+        with patch("sys.stdout", new=StringIO()) as buff:
+            report = self.calendar.import_events(path, batch_size=2)
+
+        self.assertEqual({"imported": 3, "failed": 0, "invalid": 0, "skipped": 2}, report)
+        self.assertEqual([["Event 2", "Event 3"], ["Event 4"]],
+                         [[request[1]["body"]["summary"] for request_id, request in batch.requests]
+                          for batch in self.batches])
+        self.assertTrue(buff.getvalue().startswith("Resuming import after record 2\n"))
+        self.assertFalse(os.path.exists(path + CHECKPOINT_SUFFIX))
+
+
+class MyEventManagerTestBulkExport(unittest.TestCase):
+    def setUp(self):
+        self.mock_api = MagicMock()
+        self.calendar = EventManager(self.mock_api)
+        self.directory = tempfile.TemporaryDirectory()
+        self.events = [
+            {'id': '1', 'iCalUID': '1@google.com', 'status': 'confirmed', 'summary': 'Review; notes, draft',
+             'location': 'Clayton', 'description': 'Line one\nLine two',
+             'organizer': {'email': 'stso0004@student.monash.edu'},
+             'attendees': [{'email': 'stso0001@student.monash.edu'}],
+             'start': {'dateTime': '2022-09-13T11:30:00+10:00'}, 'end': {'dateTime': '2022-09-13T13:30:00+10:00'}},
+            {'id': '2', 'status': 'confirmed', 'summary': 'Holiday', 'start': {'date': '2022-12-25'},
+             'end': {'date': '2022-12-26'}}
+        ]
+        self.mock_api.events.return_value.list.return_value.execute.return_value = {"items": self.events}
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def export(self, name):
+        path = os.path.join(self.directory.name, name)
+        with patch("sys.stdout", new=StringIO()):
+            count = self.calendar.export_events("2022-01-01T00:00:00+10:00", "2023-01-01T00:00:00+10:00", path)
+        self.assertEqual(2, count)
+        return path
+
+    def test_export_ndjson(self):
+        """
+        This test case tests that events are exported one per line as NDJSON that can be read back losslessly
+        """
+        with open(self.export("events.ndjson")) as infile:
+            self.assertEqual(self.events, [json.loads(line) for line in infile])
+
+    def test_export_gzip_ndjson(self):
+        """
+        This test case tests that a .gz file name exports gzip-compressed NDJSON
+        """
+        with gzip.open(self.export("events.ndjson.gz"), "rt") as infile:
+            self.assertEqual(self.events, [json.loads(line) for line in infile])
+
+    def test_export_ics(self):
+        """
+        This test case tests that an .ics export is a valid calendar with escaped text, UTC times and all-day dates
+        """
+        with open(self.export("events.ics"), newline="") as infile:
+            text = infile.read()
+
+        lines = text.split("\r\n")
+        self.assertEqual(["BEGIN:VCALENDAR", "VERSION:2.0"], lines[:2])
+        self.assertEqual(["END:VCALENDAR", ""], lines[-2:])
+        self.assertIn("UID:1@google.com", lines)
+        self.assertIn("DTSTART:20220913T013000Z", lines)
+        self.assertIn("SUMMARY:Review\\; notes\\, draft", lines)
+        self.assertIn("DESCRIPTION:Line one\\nLine two", lines)
+        self.assertIn("ATTENDEE:mailto:stso0001@student.monash.edu", lines)
+        self.assertIn("DTSTART;VALUE=DATE:20221225", lines)
+        self.assertEqual(2, lines.count("BEGIN:VEVENT"))
+
+    def test_export_ics_partial_events(self):
+        """
+        This test case tests that attendees without an email and cancelled tombstones without times are exported
+        without aborting the file
+        """
+        self.events[0]["attendees"].append({"displayName": "Room 101", "resource": True})
+        self.events.append({"id": "3", "status": "cancelled"})
+        path = os.path.join(self.directory.name, "events.ics")
+        with patch("sys.stdout", new=StringIO()):
+            count = self.calendar.export_events("2022-01-01T00:00:00+10:00", "2023-01-01T00:00:00+10:00", path,
+                                                show_deleted=True)
+        with open(path, newline="") as infile:
+            lines = infile.read().split("\r\n")
+
+        self.assertEqual(3, count)
+        self.assertEqual(["ATTENDEE:mailto:stso0001@student.monash.edu"],
+                         [line for line in lines if line.startswith("ATTENDEE")])
+        start = lines.index("UID:3") - 1
+        tombstone = lines[start:lines.index("END:VEVENT", start) + 1]
+        self.assertEqual(["BEGIN:VEVENT", "UID:3", "SUMMARY:", "STATUS:CANCELLED", "END:VEVENT"],
+                         [line for line in tombstone if not line.startswith("DTSTAMP")])
+        self.assertEqual(["END:VCALENDAR", ""], lines[-2:])
+
+    def test_fold_ics_line(self):
+        """
+        This test case tests that long lines, including multi-byte characters, are folded at 75 octets
+        """
+        line = "SUMMARY:" + "é" * 80
+        folded = MyEventManager.fold_ics_line(line)
+
+        parts = folded[:-2].split("\r\n")
+        self.assertTrue(all(len(part.encode("utf-8")) <= 75 for part in parts))
+        self.assertEqual(line, "".join(part[1:] if i else part for i, part in enumerate(parts)))
+        self.assertEqual("SHORT:line\r\n", MyEventManager.fold_ics_line("SHORT:line"))
+
+    def test_export_invalid_format(self):
+        """
+        This test case tests the error handling of export_events() when given an unsupported format
+        """
+        with self.assertRaises(ValueError) as context:
+            self.calendar.export_events("2022-01-01T00:00:00+10:00", "2023-01-01T00:00:00+10:00",
+                                        os.path.join(self.directory.name, "events.csv"), export_format="csv")
+
+        self.assertTrue("Export format must be one of: ndjson, ndjson.gz, ics." in str(context.exception))
+
+
+class FakeClock:
+    """
+    Clock for the scheduler which only moves forward when the scheduler sleeps
+    """
+
+    def __init__(self):
+        self.now = 0.0
+        self.sleeps = []
+
+    def time(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.sleeps.append(seconds)
+        self.now += seconds
+
+
+class MyEventManagerTestScheduler(unittest.TestCase):
+    def setUp(self):
+        self.clock = FakeClock()
+        self.scheduler = RequestScheduler(project_rate=100, user_rate=2, burst=2, max_retries=3, base_delay=1,
+                                          clock=self.clock.time, sleep=self.clock.sleep)
+
+    def throttle(self, status, retry_after=None, reason=None):
+        resp = {"retry-after": retry_after} if retry_after is not None else {}
+        content = json.dumps({"error": {"errors": [{"reason": reason}]}}).encode() if reason else b""
+        return HttpError(MagicMock(status=status, get=resp.get), content)
+
+    def test_token_bucket_rate(self):
+        """
+        This test case tests that a user can burst up to the bucket capacity, after which requests are spaced out at
+        the user's rate
+        """
+        request = MagicMock()
+        for _ in range(4):
+            self.scheduler.execute(request, user="stso0004")
+
+        self.assertEqual(4, request.execute.call_count)
+        self.assertEqual([0.5, 0.5], self.clock.sleeps)
+
+        self.scheduler.execute(request, user="another user")
+        self.assertEqual([0.5, 0.5], self.clock.sleeps)
+
+    def test_retry_after_and_backoff(self):
+        """
+        This test case tests that a throttled request honours Retry-After, a server error backs off with jitter, and
+        the retries are counted
+        """
+        request = MagicMock()
+        request.execute.side_effect = [self.throttle(429, retry_after="7"), self.throttle(503), {"items": []}]
+
+        with patch.object(MyEventManager.random, "uniform", return_value=0.25) as uniform:
+            result = self.scheduler.execute(request)
+
+        self.assertEqual({"items": []}, result)
+        self.assertEqual([7, 0.25], self.clock.sleeps)
+        uniform.assert_called_once_with(0, 2)
+        self.assertEqual({"queue_depth": 0, "retries": 2, "throttled": 1}, self.scheduler.stats())
+
+    def test_forbidden_not_retried(self):
+        """
+        This test case tests that a 403 is only retried when it reports a rate limit, and that a request still
+        failing after the maximum number of retries raises its error
+        """
+        request = MagicMock()
+        request.execute.side_effect = [self.throttle(403, reason="rateLimitExceeded"),
+                                       self.throttle(403, reason="forbidden")]
+        with patch.object(MyEventManager.random, "uniform", return_value=0):
+            with self.assertRaises(HttpError):
+                self.scheduler.execute(request)
+        self.assertEqual(2, request.execute.call_count)
+
+        request.execute.side_effect = [self.throttle(500)] * 4
+        with patch.object(MyEventManager.random, "uniform", return_value=0):
+            with self.assertRaises(HttpError):
+                self.scheduler.execute(request)
+        self.assertEqual(6, request.execute.call_count)
+
+    def test_event_manager_uses_scheduler(self):
+        """
+        This test case tests that EventManager sends its requests through its scheduler on behalf of its user
+        """
+        mock_api = MagicMock()
+        mock_api.events.return_value.list.return_value.execute.return_value = {"items": []}
+        scheduler = MagicMock(wraps=self.scheduler)
+        calendar = EventManager(mock_api, scheduler=scheduler, user="stso0004")
+
+        calendar.get_events_from_year("2022")
+
+        args, kwargs = scheduler.execute.call_args
+        self.assertEqual((mock_api.events.return_value.list.return_value, "stso0004", 1), args)
+
+
+class MyEventManagerTestConflicts(unittest.TestCase):
+    def setUp(self):
+        self.mock_api = MagicMock()
+        self.freebusy = {"calendars": {
+            "primary": {"busy": [{"start": "2050-12-01T05:00:00Z", "end": "2050-12-01T06:00:00Z"}]},
+            "stso0001@student.monash.edu": {"busy": [{"start": "2050-12-02T05:30:00Z",
+                                                      "end": "2050-12-02T07:00:00Z"}]},
+            "stso0002@student.monash.edu": {"busy": []}
+        }}
+        self.mock_api.freebusy.return_value.query.return_value.execute.return_value = self.freebusy
+        self.calendar = EventManager(self.mock_api)
+
+    def test_interval_index_matches_brute_force(self):
+        """
+        This test case tests overlap queries on the interval index against a linear scan, including after
+        intervals are replaced and removed
+        """
+        index = IntervalIndex()
+        intervals = {}
+        generator = random.Random(2107)
+        for key in range(300):
+            start = generator.uniform(0, 1000)
+            intervals[key] = (start, start + generator.uniform(0, 50))
+            index.add(key, *intervals[key])
+        for key in range(0, 300, 3):
+            index.remove(key)
+            del intervals[key]
+        for key in range(1, 300, 30):
+            intervals[key] = (500.0, 510.0)
+            index.add(key, *intervals[key])
+
+        for _ in range(200):
+            start = generator.uniform(-50, 1050)
+            end = start + generator.uniform(0, 100)
+            expected = sorted((interval[0], key) for key, interval in intervals.items()
+                              if interval[0] < end and interval[1] > start)
+            found = list(index.overlapping(start, end))
+            self.assertEqual(sorted(key for interval_start, key in expected), sorted(found))
+            self.assertEqual([intervals[key][0] for key in found], sorted(intervals[key][0] for key in found))
+        self.assertEqual(len(intervals), len(index))
+
+    def test_interval_index_updates_without_rebuilding(self):
+        """
+        This test case tests that adding and removing intervals only updates the tree along one path, so a query after
+        a change does not rebuild it
+        """
+        index = IntervalIndex()
+        for key in range(1000):
+            index.add(key, key * 10.0, key * 10.0 + 5)
+        with patch.object(index, "build", wraps=index.build) as build:
+            index.add("long", 15.0, 5000.0)
+            self.assertEqual(["long", 150, 151], list(index.overlapping(1500.0, 1511.0)))
+            index.remove("long")
+            index.remove(150)
+            self.assertEqual([151], list(index.overlapping(1500.0, 1511.0)))
+            build.assert_not_called()
+
+    def test_query_busy_shards_only_long_windows(self):
+        """
+        This test case tests that a window crossing a month boundary is still a single free/busy query, and that
+        windows longer than the endpoint allows are split into fixed-length chunks from their start
+        """
+        api = CalendarEmulator()
+        api.load([{"id": "busy", "summary": "Busy", "start": {"dateTime": "2030-04-30T10:00:00Z"},
+                   "end": {"dateTime": "2030-05-01T02:00:00Z"}}])
+        calendar = EventManager(api, scheduler=RequestScheduler(sleep=lambda s: None))
+
+        busy = calendar.query_busy(["primary"], "2030-04-28T00:00:00Z", "2030-05-05T00:00:00Z")
+        self.assertEqual(1, api.calls["calendar.freebusy.query"])
+        self.assertEqual([("2030-04-30T10:00:00Z", "2030-05-01T02:00:00Z")], list(busy["primary"].overlapping(
+            to_timestamp("2030-04-28T00:00:00Z"), to_timestamp("2030-05-05T00:00:00Z"))))
+
+        calendar.query_busy(["primary"], "2030-01-01T00:00:00Z", "2030-07-20T00:00:00Z")
+        self.assertEqual(5, api.calls["calendar.freebusy.query"])
+        self.assertEqual([("2030-01-01T00:00:00+00:00", "2030-03-02T00:00:00+00:00"),
+                          ("2030-03-02T00:00:00+00:00", "2030-05-01T00:00:00+00:00"),
+                          ("2030-05-01T00:00:00+00:00", "2030-06-30T00:00:00+00:00"),
+                          ("2030-06-30T00:00:00+00:00", "2030-07-20T00:00:00+00:00")],
+                         split_span("2030-01-01T00:00:00Z", "2030-07-20T00:00:00Z", FREEBUSY_MAX_SPAN))
+
+    def test_unreadable_calendars_are_not_free(self):
+        """
+        This test case tests that a calendar the free/busy endpoint cannot read, such as an unknown email, raises an
+        error naming it from conflict checks and free slot searches instead of being treated as free
+        """
+        api = CalendarEmulator()
+        calendar = EventManager(api, scheduler=RequestScheduler(sleep=lambda s: None))
+
+        with self.assertRaisesRegex(ValueError, r"nobody@example\.com \(notFound\)"):
+            calendar.check_conflicts("2030-02-01T10:00:00+11:00", "2030-02-01T11:00:00+11:00", ["nobody@example.com"])
+        with self.assertRaisesRegex(ValueError, r"nobody@example\.com \(notFound\)"):
+            calendar.find_free_slots(["nobody@example.com"], datetime.timedelta(hours=1),
+                                     ("2030-02-01T00:00:00+11:00", "2030-02-02T00:00:00+11:00"))
+        self.assertEqual({}, calendar.check_conflicts("2030-02-01T10:00:00+11:00", "2030-02-01T11:00:00+11:00", []))
+
+    def test_find_conflicts_single_query(self):
+        """
+        This test case tests that many bookings are checked with a single free/busy query, and that clashes with the
+        organizer and each attendee are reported while touching intervals are not
+        """
+        bookings = [
+            ("2050-12-01T15:30:00+10:00", "2050-12-01T16:30:00+10:00", [{"email": "stso0001@student.monash.edu"}]),
+            ("2050-12-02T15:00:00+10:00", "2050-12-02T16:00:00+10:00",
+             ["stso0001@student.monash.edu", "stso0002@student.monash.edu"]),
+            ("2050-12-02T17:00:00+10:00", "2050-12-02T18:00:00+10:00", ["stso0001@student.monash.edu"])
+        ]
+
+        conflicts = self.calendar.find_conflicts(bookings)
+
+        self.assertEqual([{"primary": [("2050-12-01T05:00:00Z", "2050-12-01T06:00:00Z")]},
+                          {"stso0001@student.monash.edu": [("2050-12-02T05:30:00Z", "2050-12-02T07:00:00Z")]},
+                          {}], conflicts)
+        self.assertEqual(1, self.mock_api.freebusy.return_value.query.call_count)
+        args, kwargs = self.mock_api.freebusy.return_value.query.call_args
+        self.assertEqual(["primary", "stso0001@student.monash.edu", "stso0002@student.monash.edu"],
+                         [item["id"] for item in kwargs["body"]["items"]])
+
+    def test_check_conflicts_with_cache(self):
+        """
+        This test case tests that the organizer's clashes come from the cached events, ignoring cancelled and
+        transparent events, without asking the free/busy endpoint about the primary calendar
+        """
+        self.mock_api.events.return_value.list.return_value.execute.return_value = {"items": [
+            {'id': '1', 'status': 'confirmed', 'summary': 'Busy', 'start': {'dateTime': '2050-12-03T10:00:00+10:00'},
+             'end': {'dateTime': '2050-12-03T11:00:00+10:00'}},
+            {'id': '2', 'status': 'cancelled', 'summary': 'Cancelled',
+             'start': {'dateTime': '2050-12-03T10:00:00+10:00'}, 'end': {'dateTime': '2050-12-03T11:00:00+10:00'}},
+            {'id': '3', 'status': 'confirmed', 'summary': 'Free', 'transparency': 'transparent',
+             'start': {'dateTime': '2050-12-03T10:00:00+10:00'}, 'end': {'dateTime': '2050-12-03T11:00:00+10:00'}}
+        ], "nextSyncToken": "token1"}
+        calendar = EventManager(self.mock_api, EventCache(":memory:"))
+
+        conflicts = calendar.check_conflicts("2050-12-03T10:30:00+10:00", "2050-12-03T12:00:00+10:00", [])
+
+        self.assertEqual({"primary": [("2050-12-03T10:00:00+10:00", "2050-12-03T11:00:00+10:00")]}, conflicts)
+        self.mock_api.freebusy.return_value.query.assert_not_called()
+
+
+class MyEventManagerTestTimeIndex(unittest.TestCase):
+    def setUp(self):
+        self.mock_api = MagicMock()
+        self.cache = EventCache(":memory:")
+        self.calendar = EventManager(self.mock_api, self.cache, sync_interval=60)
+        self.events = [
+            {'id': str(i), 'status': 'confirmed', 'summary': f'Event {i}',
+             'start': {'dateTime': f'{year}-06-0{i}T10:00:00+10:00'},
+             'end': {'dateTime': f'{year}-06-0{i}T11:00:00+10:00'}}
+            for i, year in enumerate(["2021", "2022", "2022", "2022", "2023"], 1)
+        ]
+        self.mock_api.events.return_value.list.return_value.execute.return_value = {
+            "items": list(reversed(self.events)), "nextSyncToken": "token1"}
+
+    def test_year_and_upcoming_answered_locally(self):
+        """
+        This test case tests that once synced, year and next N queries are answered from the cache without listing
+        the calendar again
+        """
+        events = self.calendar.get_events_from_year("2022")
+        self.assertEqual(self.events[1:4], events)
+
+        events = self.calendar.get_upcoming_events("2022-06-02T10:30:00+10:00", 2)
+        self.assertEqual(self.events[1:3], events)
+        self.assertEqual(self.events[4:], self.calendar.get_events_from_year("2023"))
+        self.assertEqual(1, self.mock_api.events.return_value.list.return_value.execute.call_count)
+
+    def test_write_forces_sync(self):
+        """
+        This test case tests that a write made through the manager makes the next read sync the cache again, and
+        that the sync deltas update the time index
+        """
+        self.calendar.get_events_from_year("2022")
+        self.mock_api.events.return_value.delete.return_value.method = "DELETE"
+        self.calendar.delete_event(self.events[2])
+        self.mock_api.events.return_value.list.return_value.execute.return_value = {
+            "items": [{'id': '3', 'status': 'cancelled'}], "nextSyncToken": "token2"}
+
+        events = self.calendar.get_events_from_year("2022")
+
+        self.assertEqual([self.events[1], self.events[3]], events)
+        self.assertEqual(2, self.mock_api.events.return_value.list.return_value.execute.call_count)
+        self.assertEqual(4, len(self.cache.timeline))
+
+    def test_query_matches_table(self):
+        """
+        This test case tests that window queries on the timeline return the same events, in the same order, as the
+        table does, including events spanning the edges of the window
+        """
+        for event in self.events:
+            self.cache.store(event)
+        windows = [("2022-06-02T10:30:00+10:00", "2022-06-03T10:00:00+10:00"),
+                   ("2021-01-01T00:00:00Z", "2024-01-01T00:00:00Z"),
+                   ("2022-06-04T11:00:00+10:00", "2023-06-05T10:00:00+10:00")]
+        for time_min, time_max in windows:
+            self.assertEqual(list(self.cache.query(time_min, time_max, show_deleted=True)),
+                             list(self.cache.query(time_min, time_max)))
+
+
+class MyEventManagerTestMultiCalendar(unittest.TestCase):
+    def setUp(self):
+        self.mock_api = MagicMock()
+        self.responses = {
+            "primary": {"items": [
+                {'id': '1', 'status': 'confirmed', 'summary': 'Lecture', 'etag': '"1"',
+                 'start': {'dateTime': '2022-09-13T11:30:00+10:00'}, 'end': {'dateTime': '2022-09-13T12:30:00+10:00'}},
+                {'id': '3', 'status': 'confirmed', 'summary': 'Workshop',
+                 'start': {'dateTime': '2022-09-15T09:00:00+10:00'}, 'end': {'dateTime': '2022-09-15T10:00:00+10:00'}}
+            ], "nextSyncToken": "primary1"},
+            "team@group.calendar.google.com": {"items": [
+                {'id': '2', 'status': 'confirmed', 'summary': 'Standup',
+                 'start': {'dateTime': '2022-09-14T00:30:00Z'}, 'end': {'dateTime': '2022-09-14T00:45:00Z'}}
+            ], "nextSyncToken": "team1"}
+        }
+
+        def list_events(**kwargs):
+            request = MagicMock(method="GET", methodId="calendar.events.list")
+            request.execute.return_value = self.responses[kwargs["calendarId"]]
+            return request
+
+        self.mock_api.events.return_value.list.side_effect = list_events
+        self.calendar_ids = ["primary", "team@group.calendar.google.com"]
+
+    def test_merged_in_start_order_and_tagged(self):
+        """
+        This test case tests that events from several calendars are merged into starting time order, across UTC
+        offsets, and tagged with the calendar they came from
+        """
+        calendar = EventManager(self.mock_api, calendar_ids=self.calendar_ids)
+
+        events = calendar.get_events_from_year("2022")
+
+        self.assertEqual([("1", "primary"), ("2", "team@group.calendar.google.com"), ("3", "primary")],
+                         [(event["id"], event[SOURCE_FIELD]) for event in events])
+        upcoming = calendar.get_upcoming_events("2022-09-13T12:00:00+10:00", 2)
+        self.assertEqual(["1", "2"], [event["id"] for event in upcoming])
+
+    def test_writes_go_to_source_calendar(self):
+        """
+        This test case tests that changes to an event are sent to the calendar it was read from, without the tag
+        """
+        calendar = EventManager(self.mock_api, calendar_ids=self.calendar_ids)
+        events = calendar.get_events_from_year("2022", fields=None)
+
+        calendar.cancel_event(events[0])
+        calendar.delete_event(events[1])
+
+        args, kwargs = self.mock_api.events.return_value.update.call_args
+        self.assertEqual("primary", kwargs["calendarId"])
+        self.assertNotIn(SOURCE_FIELD, kwargs["body"])
+        args, kwargs = self.mock_api.events.return_value.delete.call_args
+        self.assertEqual("team@group.calendar.google.com", kwargs["calendarId"])
+
+    def test_per_calendar_caches(self):
+        """
+        This test case tests that each calendar syncs into its own cache, and that reading again within the sync
+        interval costs no API calls
+        """
+        caches = {calendar_id: EventCache(":memory:") for calendar_id in self.calendar_ids}
+        calendar = EventManager(self.mock_api, caches, calendar_ids=self.calendar_ids, sync_interval=60)
+
+        first = calendar.get_events_from_year("2022")
+        second = calendar.get_events_from_year("2022")
+
+        self.assertEqual(["1", "2", "3"], [event["id"] for event in first])
+        self.assertEqual(first, second)
+        self.assertEqual(2, self.mock_api.events.return_value.list.call_count)
+        self.assertEqual("team1", caches["team@group.calendar.google.com"].get_sync_token())
+        self.assertEqual(["2"], [event["id"] for event in caches["team@group.calendar.google.com"].search("standup")])
+
+
+class MyEventManagerTestFreeSlots(unittest.TestCase):
+    def setUp(self):
+        self.mock_api = MagicMock()
+        self.mock_api.freebusy.return_value.query.return_value.execute.return_value = {"calendars": {
+            "primary": {"busy": [{"start": "2050-12-01T09:00:00+10:00", "end": "2050-12-01T10:00:00+10:00"}]},
+            "stso0001@student.monash.edu": {"busy": [
+                {"start": "2050-12-01T09:30:00+10:00", "end": "2050-12-01T11:10:00+10:00"},
+                {"start": "2050-12-01T15:00:00+10:00", "end": "2050-12-01T17:00:00+10:00"}
+            ]}
+        }}
+        self.calendar = EventManager(self.mock_api, time_zone="Australia/Brisbane")
+
+    def test_merge_intervals(self):
+        """
+        This test case tests that overlapping and touching busy intervals are merged and disjoint ones kept apart
+        """
+        self.assertEqual([(1, 5), (6, 8)], merge_intervals([(6, 7), (1, 3), (2, 4), (4, 5), (7, 8)]))
+        self.assertEqual([], merge_intervals([]))
+
+    def test_find_free_slots_ranked(self):
+        """
+        This test case tests that slots avoid the merged busy times of everyone and the hours outside the working
+        day, putting slots flush against a busy time or the end of the day first, using a single free/busy query
+        """
+        slots = self.calendar.find_free_slots([{"email": "stso0001@student.monash.edu"}], datetime.timedelta(hours=1),
+                                              ("2050-12-01T00:00:00+10:00", "2050-12-02T00:00:00+10:00"), limit=5)
+
+        self.assertEqual([("2050-12-01T11:10:00+10:00", "2050-12-01T12:10:00+10:00"),
+                          ("2050-12-01T14:00:00+10:00", "2050-12-01T15:00:00+10:00"),
+                          ("2050-12-01T11:30:00+10:00", "2050-12-01T12:30:00+10:00"),
+                          ("2050-12-01T12:00:00+10:00", "2050-12-01T13:00:00+10:00"),
+                          ("2050-12-01T12:30:00+10:00", "2050-12-01T13:30:00+10:00")], slots)
+        self.assertEqual(1, self.mock_api.freebusy.return_value.query.call_count)
+
+    def test_find_free_slots_window_and_working_hours(self):
+        """
+        This test case tests that slots are limited to the window and to custom working hours, and that no slot is
+        found when the free time is shorter than the duration
+        """
+        slots = self.calendar.find_free_slots(["stso0001@student.monash.edu"], datetime.timedelta(minutes=45),
+                                              ("2050-12-01T11:00:00+10:00", "2050-12-01T18:30:00+10:00"),
+                                              working_hours=(datetime.time(11), datetime.time(19)))
+        self.assertEqual(("2050-12-01T11:10:00+10:00", "2050-12-01T11:55:00+10:00"), slots[0])
+        self.assertIn(("2050-12-01T17:00:00+10:00", "2050-12-01T17:45:00+10:00"), slots)
+        self.assertTrue(all(end <= "2050-12-01T18:30:00+10:00" for start, end in slots))
+
+        slots = self.calendar.find_free_slots(["stso0001@student.monash.edu"], datetime.timedelta(hours=5),
+                                              ("2050-12-01T00:00:00+10:00", "2050-12-02T00:00:00+10:00"))
+        self.assertEqual([], slots)
+
+    def test_too_many_attendees(self):
+        """
+        This test case tests that more attendees than an event can hold are rejected
+        """
+        attendees = [f"stso{i:04d}@student.monash.edu" for i in range(21)]
+        with self.assertRaises(ValueError):
+            self.calendar.find_free_slots(attendees, datetime.timedelta(hours=1),
+                                          ("2050-12-01T00:00:00+10:00", "2050-12-02T00:00:00+10:00"))
+
+
+class MyEventManagerTestRecurring(unittest.TestCase):
+    def setUp(self):
+        self.mock_api = MagicMock()
+        self.master = {'id': 'standup', 'status': 'confirmed', 'summary': 'Standup',
+                       'start': {'dateTime': '2022-03-28T09:00:00+11:00', 'timeZone': 'Australia/Melbourne'},
+                       'end': {'dateTime': '2022-03-28T09:15:00+11:00', 'timeZone': 'Australia/Melbourne'},
+                       'recurrence': ['RRULE:FREQ=DAILY;COUNT=10',
+                                      'EXDATE;TZID=Australia/Melbourne:20220330T090000']}
+        self.moved = {'id': 'standup_20220331T220000Z', 'recurringEventId': 'standup', 'status': 'confirmed',
+                      'summary': 'Standup moved', 'start': {'dateTime': '2022-04-01T10:00:00+11:00'},
+                      'end': {'dateTime': '2022-04-01T10:15:00+11:00'}}
+        self.cancelled = {'id': 'standup_20220401T220000Z', 'recurringEventId': 'standup', 'status': 'cancelled'}
+        self.single = {'id': 'lecture', 'status': 'confirmed', 'summary': 'Lecture',
+                       'start': {'dateTime': '2022-03-29T12:00:00+11:00'},
+                       'end': {'dateTime': '2022-03-29T13:00:00+11:00'}}
+
+    def test_expand_events(self):
+        """
+        This test case tests that master events are expanded in their own time zone across a daylight saving change,
+        skipping excluded dates, replacing modified instances, dropping cancelled ones and merging in single events
+        """
+        events = list(expand_events([self.master, self.moved, self.cancelled, self.single],
+                                    "2022-03-29T00:00:00+11:00", "2022-04-05T00:00:00+10:00"))
+
+        self.assertEqual([("standup_20220328T220000Z", "2022-03-29T09:00:00+11:00"),
+                          ("lecture", "2022-03-29T12:00:00+11:00"),
+                          ("standup_20220330T220000Z", "2022-03-31T09:00:00+11:00"),
+                          ("standup_20220331T220000Z", "2022-04-01T10:00:00+11:00"),
+                          ("standup_20220402T230000Z", "2022-04-03T09:00:00+10:00"),
+                          ("standup_20220403T230000Z", "2022-04-04T09:00:00+10:00")],
+                         [(event["id"], event["start"]["dateTime"]) for event in events])
+        self.assertEqual("standup", events[0]["recurringEventId"])
+        self.assertEqual("2022-03-29T09:15:00+11:00", events[0]["end"]["dateTime"])
+        self.assertNotIn("recurrence", events[0])
+
+    def test_expand_all_day_events(self):
+        """
+        This test case tests that all-day recurring events are expanded into dates
+        """
+        master = {'id': 'holiday', 'summary': 'Christmas', 'start': {'date': '2022-12-25'},
+                  'end': {'date': '2022-12-26'}, 'recurrence': ['RRULE:FREQ=YEARLY']}
+
+        events = list(expand_events([master], "2023-12-25T12:00:00+10:00", "2026-01-01T00:00:00+10:00"))
+
+        self.assertEqual([{'date': '2023-12-25'}, {'date': '2024-12-25'}, {'date': '2025-12-25'}],
+                         [event["start"] for event in events])
+        self.assertEqual("holiday_20231225", events[0]["id"])
+
+    def test_masters_fetched_and_expanded(self):
+        """
+        This test case tests that in recurring mode events are listed without server-side expansion, asking for the
+        fields expansion needs, and that upcoming events are taken from the expanded instances
+        """
+        self.mock_api.events.return_value.list.return_value.execute.return_value = {
+            "items": [self.single, self.master, self.moved, self.cancelled]}
+        calendar = EventManager(self.mock_api, expand_recurring=True)
+
+        events = calendar.get_events_from_year("2022")
+        upcoming = calendar.get_upcoming_events("2022-03-29T11:00:00+11:00", 2)
+
+        self.assertEqual(9, len(events))
+        args, kwargs = self.mock_api.events.return_value.list.call_args_list[0]
+        self.assertFalse(kwargs["singleEvents"])
+        self.assertIsNone(kwargs["orderBy"])
+        self.assertEqual("nextPageToken,items(id,status,summary,start,end,recurrence,recurringEventId,"
+                         "originalStartTime)", kwargs["fields"])
+        self.assertEqual(["lecture", "standup_20220330T220000Z"], [event["id"] for event in upcoming])
+
+    def test_add_recurring_event(self):
+        """
+        This test case tests that add_new_events() creates a recurring series from a bare rule, and that rules which
+        cannot be parsed are rejected before anything is sent
+        """
+        calendar = EventManager(self.mock_api)
+        calendar.add_new_events("Workshop", "Clayton", [], ["2050-09-13", "2050-09-13"], ["10:00", "11:00"],
+                                "FREQ=WEEKLY;COUNT=12")
+
+        args, kwargs = self.mock_api.events.return_value.insert.call_args
+        self.assertEqual(["RRULE:FREQ=WEEKLY;COUNT=12"], kwargs["body"]["recurrence"])
+
+        with self.assertRaises(ValueError):
+            calendar.add_new_events("Workshop", "Clayton", [], ["2050-09-13", "2050-09-13"], ["10:00", "11:00"],
+                                    "FREQ=SOMETIMES")
+        self.assertEqual(1, self.mock_api.events.return_value.insert.call_count)
+
+
+class MyEventManagerTestTimeZone(unittest.TestCase):
+    def test_transitions_match_zoneinfo(self):
+        """
+        This test case tests that batch conversions using the precomputed transitions agree with zoneinfo on both
+        sides of every daylight saving change in a year, and outside the precomputed years
+        """
+        time_zone = get_time_zone("America/New_York")
+        start = datetime.datetime(2022, 1, 1, tzinfo=datetime.timezone.utc).timestamp()
+        timestamps = [start + hours * 3600 + 59 for hours in range(0, 366 * 24, 7)]
+        timestamps += [datetime.datetime(2060, 7, 1, tzinfo=datetime.timezone.utc).timestamp()]
+
+        converted = time_zone.convert(timestamps)
+
+        expected = [datetime.datetime.fromtimestamp(timestamp, time_zone.zone) for timestamp in timestamps]
+        self.assertEqual([date_time.isoformat() for date_time in expected],
+                         [date_time.isoformat() for date_time in converted])
+        self.assertIs(time_zone, get_time_zone("America/New_York"))
+
+    def test_format_dateTime_across_dst(self):
+        """
+        This test case tests that local times are given the UTC offset in effect on their date
+        """
+        self.assertEqual("2022-09-13T11:30:00+10:00", format_dateTime("2022-09-13", "11:30"))
+        self.assertEqual("2022-12-13T11:30:00+11:00", format_dateTime("2022-12-13", "11:30"))
+        self.assertEqual("2022-12-13T11:30:00-05:00", format_dateTime("2022-12-13", "11:30", "America/New_York"))
+
+    def test_user_time_zone_windows(self):
+        """
+        This test case tests that year windows and new events follow the time zone configured for the user
+        """
+        mock_api = MagicMock()
+        mock_api.events.return_value.list.return_value.execute.return_value = {"items": []}
+        calendar = EventManager(mock_api, time_zone="Europe/London")
+
+        calendar.get_events_from_year("2022")
+        calendar.add_new_events("Workshop", "London", [], ["2022-07-01", "2022-07-01"], ["10:00", "11:00"])
+
+        args, kwargs = mock_api.events.return_value.list.call_args
+        self.assertEqual("2022-01-01T00:00:00+00:00", kwargs["timeMin"])
+        args, kwargs = mock_api.events.return_value.insert.call_args
+        self.assertEqual({"dateTime": "2022-07-01T10:00:00+01:00", "timeZone": "Europe/London"},
+                         kwargs["body"]["start"])
+
+    def test_is_past_event_compares_instants(self):
+        """
+        This test case tests that whether an event is past does not depend on the offset it is written in
+        """
+        now = datetime.datetime.now(datetime.timezone.utc)
+        ahead = (now - datetime.timedelta(hours=20)).astimezone(datetime.timezone(datetime.timedelta(hours=14)))
+        behind = (now - datetime.timedelta(hours=30)).astimezone(datetime.timezone(datetime.timedelta(hours=-12)))
+
+        self.assertFalse(is_past_event({'id': '1', 'start': {'dateTime': ahead.isoformat()}}))
+        self.assertTrue(is_past_event({'id': '2', 'start': {'dateTime': behind.isoformat()}}))
+
+
+@unittest.skipIf(numpy is None, "NumPy is not installed")
+class MyEventManagerTestBatchParsing(unittest.TestCase):
+    def test_matches_per_item_parsing(self):
+        """
+        This test case tests that batch parsing gives the same instants as parsing each string on its own, for
+        every accepted format, including local times on either side of daylight saving changes
+        """
+        generator = random.Random(2107)
+        strings = []
+        for _ in range(2000):
+            moment = datetime.datetime(2020, 1, 1) + datetime.timedelta(minutes=generator.randrange(3 * 366 * 24 * 60))
+            offset = datetime.timezone(datetime.timedelta(minutes=generator.choice([-270, 0, 330, 600, 660])))
+            strings.append(generator.choice([
+                moment.isoformat(),
+                moment.date().isoformat(),
+                moment.replace(tzinfo=offset).isoformat(),
+                moment.replace(tzinfo=offset, microsecond=generator.randrange(10 ** 6)).isoformat(),
+                moment.isoformat() + "Z"
+            ]))
+
+        values, valid = parse_datetimes(strings)
+
+        self.assertTrue(valid.all())
+        expected = [parse_datetime(string).astimezone(datetime.timezone.utc).replace(tzinfo=None, microsecond=0)
+                    for string in strings]
+        self.assertEqual(expected, values.astype(datetime.datetime).tolist())
+
+    def test_dd_mon_yy_and_time_zone(self):
+        """
+        This test case tests that DD-MON-YY dates match convert_date_string() and are read in the given time zone
+        """
+        values, valid = parse_datetimes(["13-SEP-22", "25-DEC-22"], get_time_zone("Europe/London"))
+
+        self.assertTrue(valid.all())
+        self.assertEqual([numpy.datetime64("2022-09-12T23:00:00"), numpy.datetime64("2022-12-25T00:00:00")],
+                         list(values))
+
+    def test_validation_mask(self):
+        """
+        This test case tests that malformed rows are masked out as NaT without affecting the valid rows
+        """
+        strings = ["2022-09-13T11:30:00+10:00", "2022-02-29", "13-SEX-22", "2022-09-13T24:00:00Z", "not a date",
+                   "", "2022-09-13T11:30:00.5x+10:00", "2022-09-13T11:30:00+10:0", "2024-02-29", "31-APR-22",
+                   "2022-09-13T11:30:00\u00e9"]
+
+        values, valid = parse_datetimes(strings)
+
+        self.assertEqual([True, False, False, False, False, False, False, False, True, False, False], list(valid))
+        self.assertTrue(numpy.isnat(values[~valid]).all())
+        self.assertEqual(numpy.datetime64("2022-09-13T01:30:00"), values[0])
+
+
+class MyEventManagerTestEmulator(unittest.TestCase):
+    def setUp(self):
+        self.api = CalendarEmulator(calendar_ids=("primary", "stso0004@student.monash.edu"))
+        self.calendar = EventManager(self.api)
+
+    def insert(self, summary, start, end, calendar_id="primary", **fields):
+        body = dict({'summary': summary, 'start': {'dateTime': start}, 'end': {'dateTime': end}}, **fields)
+        return self.api.events().insert(calendarId=calendar_id, body=body).execute()
+
+    def test_paging_and_time_window(self):
+        """
+        This test case tests that events are listed a page at a time in order of their start, keeping events which
+        overlap timeMin and leaving out events ending at timeMin or starting at timeMax
+        """
+        for day in (5, 1, 3, 2, 4):
+            self.insert(f"Day {day}", f"2030-01-0{day}T10:00:00+11:00", f"2030-01-0{day}T12:00:00+11:00")
+
+        events = list(self.calendar.iter_events("2030-01-02T11:00:00+11:00", "2030-01-05T10:00:00+11:00",
+                                                page_size=2))
+
+        self.assertEqual(["Day 2", "Day 3", "Day 4"], [event["summary"] for event in events])
+        self.assertEqual(2, self.api.calls["calendar.events.list"])
+        self.assertEqual([], list(self.calendar.iter_events("2030-01-05T12:00:00+11:00",
+                                                            "2030-01-06T00:00:00+11:00")))
+
+    def test_api_semantics(self):
+        """
+        This test case tests that invalid requests fail as they do against the API: unknown parameters, ordering by
+        start without expanding recurring events, events ending before they start, unknown events, and deleting an
+        event twice
+        """
+        with self.assertRaises(TypeError):
+            self.api.events().list(calendarId="primary", startTime="2030-01-01T00:00:00Z")
+        with self.assertRaises(HttpError) as context:
+            self.api.events().list(calendarId="primary", orderBy="startTime").execute()
+        self.assertEqual(400, context.exception.resp.status)
+        with self.assertRaises(HttpError) as context:
+            self.insert("Backwards", "2030-01-01T10:00:00+11:00", "2030-01-01T09:00:00+11:00")
+        self.assertEqual(400, context.exception.resp.status)
+        with self.assertRaises(HttpError) as context:
+            self.api.events().get(calendarId="primary", eventId="missing").execute()
+        self.assertEqual(404, context.exception.resp.status)
+
+        event = self.insert("Meeting", "2020-01-01T10:00:00+11:00", "2020-01-01T11:00:00+11:00")
+        self.calendar.delete_event(event)
+        with self.assertRaises(HttpError) as context:
+            self.calendar.delete_event(event)
+        self.assertEqual(410, context.exception.resp.status)
+        listed = self.api.events().list(calendarId="primary", showDeleted=True,
+                                        fields="items(id,status)").execute()
+        self.assertEqual({"items": [{"id": event["id"], "status": "cancelled"}]}, listed)
+        self.assertEqual([], self.api.events().list(calendarId="primary").execute()["items"])
+
+    def test_sync_tokens(self):
+        """
+        This test case tests that a cache syncs only the changes since its last sync, and rebuilds itself when the
+        sync token expires
+        """
+        cache = EventCache(":memory:")
+        calendar = EventManager(self.api, cache=cache, sync_interval=0)
+        first = self.insert("First", "2030-01-01T10:00:00+11:00", "2030-01-01T11:00:00+11:00")
+        self.assertEqual(["First"], [event["summary"] for event in calendar.iter_events(
+            "2030-01-01T00:00:00+11:00", "2030-02-01T00:00:00+11:00")])
+
+        self.insert("Second", "2030-01-02T10:00:00+11:00", "2030-01-02T11:00:00+11:00")
+        self.api.events().delete(calendarId="primary", eventId=first["id"]).execute()
+        changes = self.api.events().list(calendarId="primary", syncToken=cache.get_sync_token(),
+                                         showDeleted=True, singleEvents=True).execute()
+        self.assertEqual([("cancelled", "First"), ("confirmed", "Second")],
+                         sorted((event["status"], event["summary"]) for event in changes["items"]))
+        self.assertEqual(["Second"], [event["summary"] for event in calendar.iter_events(
+            "2030-01-01T00:00:00+11:00", "2030-02-01T00:00:00+11:00")])
+
+        self.api.expire_sync_tokens()
+        self.insert("Third", "2030-01-03T10:00:00+11:00", "2030-01-03T11:00:00+11:00")
+        self.assertEqual(["Second", "Third"], [event["summary"] for event in calendar.iter_events(
+            "2030-01-01T00:00:00+11:00", "2030-02-01T00:00:00+11:00")])
+
+    def test_batch_with_injected_errors(self):
+        """
+        This test case tests that a bulk insert is sent as a single batch, and that sub-requests failing with an
+        injected error are retried
+        """
+        self.calendar = EventManager(self.api, scheduler=RequestScheduler(sleep=lambda seconds: None))
+        self.api.fail_next(503)
+        spec = ["Tutorial", "Clayton", [{"email": "stso0004@student.monash.edu"}], ["2030-02-01", "2030-02-01"],
+                ["10:00", "11:00"]]
+
+        results = self.calendar.add_events_bulk([spec] * 3)
+
+        self.assertTrue(all(result["status"] == "confirmed" for result in results))
+        self.assertEqual(2, self.api.round_trips)
+        self.assertEqual(3, len(self.api.events().list(calendarId="primary").execute()["items"]))
+        self.assertEqual(1, self.api.injected_errors)
+
+    def test_latency_and_error_rate(self):
+        """
+        This test case tests that every round trip waits for the configured latency, and that random errors are
+        retried by the scheduler
+        """
+        waits = []
+        api = CalendarEmulator(latency=0.25, error_rate=0.5, seed=2107, sleep=waits.append)
+        scheduler = RequestScheduler(sleep=lambda seconds: None)
+        calendar = EventManager(api, scheduler=scheduler)
+
+        for _ in range(10):
+            calendar.get_upcoming_events("2030-01-01T00:00:00+11:00", 5)
+
+        self.assertEqual([0.25] * api.round_trips, waits)
+        self.assertEqual(10, api.calls["calendar.events.list"])
+        self.assertEqual(api.injected_errors, scheduler.stats()["retries"])
+        self.assertGreater(api.injected_errors, 0)
+
+    def test_recurring_events(self):
+        """
+        This test case tests that recurring events are expanded into instances when listed, and that deleting an
+        instance only removes that instance
+        """
+        self.calendar.add_new_events("Standup", "Room 1", [], ["2030-03-01", "2030-03-01"], ["09:00", "09:15"],
+                                     recurrence="FREQ=DAILY;COUNT=4")
+        instances = list(self.calendar.iter_events("2030-03-01T00:00:00+11:00", "2030-04-01T00:00:00+11:00"))
+        self.assertEqual(["2030-03-01T09:00:00+11:00", "2030-03-02T09:00:00+11:00", "2030-03-03T09:00:00+11:00",
+                          "2030-03-04T09:00:00+11:00"], [event["start"]["dateTime"] for event in instances])
+
+        self.api.events().delete(calendarId="primary", eventId=instances[1]["id"]).execute()
+
+        for calendar in (self.calendar, EventManager(self.api, expand_recurring=True)):
+            self.assertEqual([instances[0]["id"], instances[2]["id"], instances[3]["id"]],
+                             [event["id"] for event in calendar.iter_events("2030-03-01T00:00:00+11:00",
+                                                                            "2030-04-01T00:00:00+11:00")])
+
+    def test_move_import_and_free_busy(self):
+        """
+        This test case tests moving an event to another calendar, importing an event twice by its iCalUID, and
+        free/busy queries over both calendars
+        """
+        event = self.insert("Consultation", "2030-01-01T10:00:00+11:00", "2030-01-01T11:00:00+11:00")
+        moved = self.api.events().move(calendarId="primary", eventId=event["id"],
+                                       destination="stso0004@student.monash.edu").execute()
+        self.assertEqual("stso0004@student.monash.edu", moved["organizer"]["email"])
+
+        body = {'summary': 'Imported', 'iCalUID': 'abc@example.com',
+                'start': {'dateTime': '2030-01-01T13:00:00+11:00'}, 'end': {'dateTime': '2030-01-01T14:00:00+11:00'}}
+        first = self.api.events().import_(calendarId="primary", body=body).execute()
+        body['summary'] = 'Imported again'
+        second = self.api.events().import_(calendarId="primary", body=body).execute()
+        self.assertEqual(first["id"], second["id"])
+
+        response = self.api.freebusy().query(body={
+            "timeMin": "2030-01-01T00:00:00+11:00", "timeMax": "2030-01-02T00:00:00+11:00",
+            "items": [{"id": "primary"}, {"id": "stso0004@student.monash.edu"}, {"id": "unknown@example.com"}]
+        }).execute()
+        self.assertEqual([{"start": "2030-01-01T02:00:00Z", "end": "2030-01-01T03:00:00Z"}],
+                         response["calendars"]["primary"]["busy"])
+        self.assertEqual([{"start": "2029-12-31T23:00:00Z", "end": "2030-01-01T00:00:00Z"}],
+                         response["calendars"]["stso0004@student.monash.edu"]["busy"])
+        self.assertEqual("notFound", response["calendars"]["unknown@example.com"]["errors"][0]["reason"])
+
+    def test_get_calendar_api_points_at_emulator(self):
+        """
+        This test case tests that setting CALENDAR_EMULATOR makes get_calendar_api() return an emulator loaded with
+        the events of the given file
+        """
+        with tempfile.TemporaryDirectory() as directory:
+            filename = os.path.join(directory, "events.ndjson")
+            with open(filename, "w") as events_file:
+                events_file.write('{"id": "seeded", "summary": "Seeded", "start": {"dateTime": '
+                                  '"2030-01-01T10:00:00+11:00"}, "end": {"dateTime": "2030-01-01T11:00:00+11:00"}}\n')
+            get_calendar_api.cache_clear()
+            try:
+                with patch.dict(os.environ, {EMULATOR_ENV: filename}):
+                    api = get_calendar_api()
+            finally:
+                get_calendar_api.cache_clear()
+
+        self.assertIsInstance(api, CalendarEmulator)
+        self.assertEqual(["Seeded"], [event["summary"] for event in EventManager(api).get_upcoming_events(
+            "2030-01-01T00:00:00+11:00", 10)])
+
+
+class MyEventManagerTestMetrics(unittest.TestCase):
+    def setUp(self):
+        self.api = CalendarEmulator()
+        self.sink = PrometheusSink()
+        self.scheduler = RequestScheduler(sleep=lambda seconds: None, metrics=self.sink)
+        self.calendar = EventManager(self.api, scheduler=self.scheduler, metrics=self.sink)
+
+    def sample(self, name, labels=()):
+        """
+        Return the value of a sample in the rendered metrics, or None if it is not there
+        """
+        prefix = f"myeventmanager_{name}{MyEventManager.format_labels(labels)} "
+        for line in self.sink.render().splitlines():
+            if line.startswith(prefix):
+                return float(line[len(prefix):])
+        return None
+
+    def test_api_calls_bytes_and_timings(self):
+        """
+        This test case tests that API calls, including those sent in a batch, are counted by method and outcome along
+        with the bytes sent and received, and that methods and requests are timed in histograms
+        """
+        spec = ["Tutorial", "Clayton", [{"email": "stso0004@student.monash.edu"}], ["2030-02-01", "2030-02-01"],
+                ["10:00", "11:00"]]
+        self.calendar.add_events_bulk([spec] * 3)
+        events = list(self.calendar.iter_events("2030-01-01T00:00:00+11:00", "2031-01-01T00:00:00+11:00",
+                                                page_size=2))
+
+        self.assertEqual(3, len(events))
+        self.assertEqual(3, self.sample("api_calls_total", (("method", "calendar.events.insert"), ("status", "ok"))))
+        self.assertEqual(2, self.sample("api_calls_total", (("method", "calendar.events.list"), ("status", "ok"))))
+        self.assertGreater(self.sample("api_request_bytes_total", (("method", "calendar.events.insert"),)), 0)
+        self.assertEqual(self.api.bytes_sent, self.sample("api_response_bytes_total",
+                                                          (("method", "calendar.events.insert"),)) +
+                         self.sample("api_response_bytes_total", (("method", "calendar.events.list"),)))
+        self.assertEqual(1, self.sample("method_seconds_count", (("method", "iter_events"),)))
+        self.assertEqual(1, self.sample("api_request_seconds_count", (("method", "batch"),)))
+        self.assertEqual(2, self.sample("api_decode_seconds_bucket", (("method", "calendar.events.list"),
+                                                                      ("le", "+Inf"))))
+        self.assertIn("# TYPE myeventmanager_method_seconds histogram", self.sink.render())
+
+    def test_errors_retries_and_cache_hits(self):
+        """
+        This test case tests that failed calls are counted by status, retries by the status that caused them, and
+        cache reads as hits or misses depending on whether the cache had to sync
+        """
+        self.api.fail_next(503)
+        with self.assertRaises(HttpError):
+            self.calendar.get_full_event({"id": "missing"})
+        calendar = EventManager(self.api, cache=EventCache(":memory:"), scheduler=self.scheduler,
+                                metrics=self.sink)
+        calendar.get_upcoming_events("2030-01-01T00:00:00+11:00", 5)
+        calendar.get_upcoming_events("2030-01-01T00:00:00+11:00", 5)
+
+        self.assertEqual(1, self.sample("api_retries_total", (("status", "503"),)))
+        self.assertEqual(1, self.sample("api_calls_total", (("method", "calendar.events.get"), ("status", "404"))))
+        self.assertEqual(1, self.sample("cache_requests_total", (("result", "miss"),)))
+        self.assertEqual(1, self.sample("cache_requests_total", (("result", "hit"),)))
+
+    def test_open_telemetry_spans(self):
+        """
+        This test case tests that a span named after the API method is opened around every request, alongside the
+        Prometheus metrics when both sinks are combined
+        """
+        tracer = MagicMock()
+        calendar = EventManager(self.api, metrics=CombinedSink(self.sink, OpenTelemetrySink(tracer)))
+
+        calendar.add_new_events("Tutorial", "Clayton", [], ["2030-02-01", "2030-02-01"], ["10:00", "11:00"])
+        calendar.get_upcoming_events("2030-01-01T00:00:00+11:00", 5)
+
+        self.assertEqual([call("calendar.events.insert", attributes={"http.method": "POST", "requests": 1}),
+                          call("calendar.events.list", attributes={"http.method": "GET", "requests": 1})],
+                         tracer.start_as_current_span.call_args_list)
+        self.assertEqual(1, self.sample("method_seconds_count", (("method", "add_new_events"),)))
+
+    def test_disabled_by_default(self):
+        """
+        This test case tests that without metrics no methods are wrapped, and that label values are escaped
+        """
+        calendar = EventManager(self.api)
+
+        self.assertIsNone(calendar.metrics)
+        self.assertFalse(any(name in vars(calendar) for name in INSTRUMENTED_METHODS))
+        self.assertEqual('{method="a\\"b\\\\c\\nd"}', MyEventManager.format_labels((("method", 'a"b\\c\nd'),)))
+
+
+class MyEventManagerTestReadCache(unittest.TestCase):
+    def setUp(self):
+        self.now = [0.0]
+        self.reads = ReadCoalescer(ttl=10, clock=lambda: self.now[0])
+
+    def test_concurrent_identical_reads_share_one_fetch(self):
+        """
+        This test case tests that identical requests made while one is in flight wait for it instead of fetching,
+        and that every caller gets its own copy of the response
+        """
+        release = threading.Event()
+        fetch = Mock(side_effect=lambda: release.wait() and {"items": [{"id": "a"}]})
+        results = []
+        threads = [threading.Thread(target=lambda: results.append(self.reads.fetch("key", fetch))) for _ in range(5)]
+        for thread in threads:
+            thread.start()
+        deadline = time.monotonic() + 5
+        while self.reads.stats()["shared"] + self.reads.stats()["misses"] < 5 and time.monotonic() < deadline:
+            time.sleep(0.001)
+        release.set()
+        for thread in threads:
+            thread.join()
+
+        fetch.assert_called_once()
+        self.assertEqual([{"items": [{"id": "a"}]}] * 5, results)
+        self.assertEqual(5, len({id(result) for result in results}))
+        self.assertEqual({"hits": 0, "misses": 1, "shared": 4}, {name: self.reads.stats()[name]
+                                                                 for name in ("hits", "misses", "shared")})
+
+    def test_failed_fetch_is_shared_but_not_cached(self):
+        """
+        This test case tests that an error raised by the fetch reaches the requests waiting on it and that the next
+        request fetches again
+        """
+        fetch = Mock(side_effect=[ValueError("offline"), {"items": []}])
+        with self.assertRaises(ValueError):
+            self.reads.fetch("key", fetch)
+        self.assertEqual({"items": []}, self.reads.fetch("key", fetch))
+        self.assertEqual(2, fetch.call_count)
+
+    def test_ttl_and_bounds(self):
+        """
+        This test case tests that responses are reused only for ttl seconds and that the least recently used ones
+        are evicted to stay within the entry and byte bounds
+        """
+        fetch = Mock(return_value={"items": []})
+        self.reads.fetch("key", fetch)
+        self.now[0] = 9.9
+        self.reads.fetch("key", fetch)
+        self.assertEqual(1, fetch.call_count)
+        self.now[0] = 10
+        self.reads.fetch("key", fetch)
+        self.assertEqual(2, fetch.call_count)
+
+        reads = ReadCoalescer(max_entries=2, max_bytes=40)
+        reads.fetch("a", lambda: "a")
+        reads.fetch("b", lambda: "b")
+        reads.fetch("a", Mock(side_effect=AssertionError))
+        reads.fetch("c", lambda: "c")
+        self.assertEqual(["a", "c"], list(reads.entries))
+        reads.fetch("d", lambda: "d" * 36)
+        self.assertEqual(["d"], list(reads.entries))
+        reads.fetch("e", lambda: "e" * 50)
+        self.assertEqual(["d"], list(reads.entries))
+        self.assertEqual(38, reads.stats()["bytes"])
+
+    def test_manager_reads_and_invalidation(self):
+        """
+        This test case tests that repeated listings by a manager are answered by one API call per page, that users do
+        not share responses, and that a write makes the next listing ask the API again
+        """
+        api = CalendarEmulator()
+        calendar = EventManager(api, scheduler=RequestScheduler(sleep=lambda seconds: None), reads=self.reads)
+        spec = ["Tutorial", "Clayton", [{"email": "stso0004@student.monash.edu"}], ["2030-02-01", "2030-02-01"],
+                ["10:00", "11:00"]]
+        calendar.add_events_bulk([spec] * 3)
+
+        first = calendar.get_calendar_upcoming_events("primary", "2030-01-01T00:00:00+11:00", 10)
+        second = calendar.get_calendar_upcoming_events("primary", "2029-12-31T13:00:00Z", 10)
+        pages = list(calendar.iter_events("2030-01-01T00:00:00+11:00", "2031-01-01T00:00:00+11:00", page_size=2))
+        pages_again = list(calendar.iter_events("2030-01-01T00:00:00+11:00", "2031-01-01T00:00:00+11:00",
+                                                page_size=2))
+        self.assertEqual(first, second)
+        self.assertEqual(pages, pages_again)
+        self.assertEqual(3, api.calls["calendar.events.list"])
+
+        other = EventManager(api, scheduler=RequestScheduler(sleep=lambda seconds: None), user="other",
+                             reads=self.reads)
+        other.get_calendar_upcoming_events("primary", "2030-01-01T00:00:00+11:00", 10)
+        self.assertEqual(4, api.calls["calendar.events.list"])
+
+        calendar.add_events_bulk([spec])
+        self.assertEqual(4, len(calendar.get_calendar_upcoming_events("primary", "2030-01-01T00:00:00+11:00", 10)))
+        self.assertEqual(5, api.calls["calendar.events.list"])
+
+    def test_concurrent_stale_reads_sync_once(self):
+        """
+        This test case tests that reads of a stale cache made at the same time wait for one sync instead of each
+        syncing the calendar
+        """
+        api = CalendarEmulator(latency=0.02)
+        api.load([{"id": f"event{i}", "summary": f"Event {i}", "start": {"dateTime": f"2030-02-{i + 1:02d}T10:00:00Z"},
+                   "end": {"dateTime": f"2030-02-{i + 1:02d}T11:00:00Z"}} for i in range(5)])
+        calendar = EventManager(api, cache=EventCache(":memory:"), scheduler=RequestScheduler(sleep=lambda s: None))
+        start = threading.Barrier(8)
+        results = []
+
+        def read():
+            start.wait()
+            results.append(calendar.get_upcoming_events("2030-01-01T00:00:00Z", 10))
+
+        threads = [threading.Thread(target=read) for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(1, api.calls["calendar.events.list"])
+        self.assertEqual([[f"event{i}" for i in range(5)]] * 8, [[event["id"] for event in events]
+                                                                   for events in results])
+
+    def test_shared_coalescer_keeps_accounts_apart(self):
+        """
+        This test case tests that managers for different accounts sharing a ReadCoalescer do not get each other's
+        listings, even when neither names its user
+        """
+        first, second = CalendarEmulator(), CalendarEmulator()
+        first.load([{"id": "mine", "summary": "Mine", "start": {"dateTime": "2030-02-01T10:00:00Z"},
+                     "end": {"dateTime": "2030-02-01T11:00:00Z"}}])
+        managers = [EventManager(api, scheduler=RequestScheduler(sleep=lambda s: None), reads=self.reads)
+                    for api in (first, second)]
+
+        listings = [manager.get_calendar_upcoming_events("primary", "2030-01-01T00:00:00Z", 10)
+                    for manager in managers]
+
+        self.assertEqual([["mine"], []], [[event["id"] for event in events] for events in listings])
+
+    def test_windows_are_aligned_to_the_minute(self):
+        """
+        This test case tests that the past and future windows asked for within the same minute are identical, so that
+        showing them again does not call the API
+        """
+        api = CalendarEmulator()
+        calendar = EventManager(api, scheduler=RequestScheduler(sleep=lambda seconds: None), reads=self.reads)
+        times = [datetime.datetime(2030, 2, 1, 10, 0, second, tzinfo=datetime.timezone.utc) for second in (5, 55)]
+        with patch.object(calendar.time_zone, "now", side_effect=times):
+            calendar.get_future_events()
+            calendar.get_future_events()
+        self.assertEqual(1, api.calls["calendar.events.list"])
+
+
+class MyEventManagerTestRenderer(unittest.TestCase):
+    def setUp(self):
+        self.events = [{"id": "a", "status": "confirmed", "summary": "Workshop",
+                        "start": {"dateTime": "2022-09-13T11:30:00+10:00"}},
+                       {"id": "b", "status": "cancelled", "summary": "Tab\there",
+                        "start": {"dateTime": "2022-09-14T01:00:00.000Z"}},
+                       Event.from_api({"id": "c", "summary": "Holiday", "start": {"date": "2022-12-25"},
+                                       "end": {"date": "2022-12-26"}})]
+        self.stream = StringIO()
+
+    def test_text_matches_the_event_model(self):
+        """
+        This test case tests that events sliced from their start strings are shown as they are after parsing, in
+        their own offsets and converted to a time zone
+        """
+        rule = "-" * 73 + "\n"
+        EventRenderer(stream=self.stream).render(self.events)
+        self.assertEqual(rule + "1. 2022-09-13 11:30 GMT+10:00 Workshop\n"
+                                "2. 2022-09-14 01:00 GMT+00:00 Tab\there\n"
+                                "3. 2022-12-25 All day GMT+11:00 Holiday\n" + rule, self.stream.getvalue())
+
+        stream = StringIO()
+        EventRenderer(get_time_zone("Australia/Melbourne"), stream=stream).render(self.events)
+        self.assertEqual(rule + "1. 2022-09-13 11:30 GMT+10:00 Workshop\n"
+                                "2. 2022-09-14 11:00 GMT+10:00 Tab\there\n"
+                                "3. 2022-12-25 All day GMT+11:00 Holiday\n" + rule, stream.getvalue())
+
+        stream = StringIO()
+        EventRenderer(stream=stream).render(self.events, cancelled=True)
+        self.assertEqual(rule + "2. 2022-09-14 Tab\there\n" + rule, stream.getvalue())
+
+    def test_tsv_and_json_lines(self):
+        """
+        This test case tests the machine readable formats, which have a row per event and escape tabs in TSV
+        """
+        EventRenderer(output_format="tsv", stream=self.stream).render(self.events)
+        self.assertEqual("number\tid\tstatus\tdate\ttime\toffset\tsummary\n"
+                         "1\ta\tconfirmed\t2022-09-13\t11:30\t+10:00\tWorkshop\n"
+                         "2\tb\tcancelled\t2022-09-14\t01:00\t+00:00\tTab\\there\n"
+                         "3\tc\tconfirmed\t2022-12-25\tAll day\t+11:00\tHoliday\n", self.stream.getvalue())
+
+        stream = StringIO()
+        EventRenderer(output_format="jsonl", stream=stream).render(self.events, cancelled=True)
+        self.assertEqual([{"number": 2, "id": "b", "status": "cancelled", "date": "2022-09-14", "time": "01:00",
+                           "offset": "+00:00", "summary": "Tab\there"}],
+                         [json.loads(line) for line in stream.getvalue().splitlines()])
+
+        stream = StringIO()
+        EventRenderer(output_format="jsonl", stream=stream).render([])
+        self.assertEqual("", stream.getvalue())
+        with self.assertRaises(ValueError):
+            EventRenderer(output_format="csv")
+
+    def test_one_write_per_listing(self):
+        """
+        This test case tests that a listing is written to the stream in a single write
+        """
+        stream = Mock()
+        EventRenderer(stream=stream).render(self.events * 1000)
+        stream.write.assert_called_once()
+        self.assertEqual(3002, stream.write.call_args[0][0].count("\n"))
+
+    def test_paging(self):
+        """
+        This test case tests that long listings are shown a page at a time, formatting only the page shown, and that
+        the user can go back a page or stop
+        """
+        prompt = Mock(side_effect=["", "p", "", "q"])
+        renderer = EventRenderer(page_size=2, stream=Mock(), prompt=prompt)
+        with patch.object(renderer, "rows", wraps=renderer.rows) as rows:
+            renderer.render(self.events * 3)
+
+        pages = [written[0][0].splitlines()[1:-1] for written in renderer.stream.write.call_args_list]
+        self.assertEqual([["1", "2"], ["3", "4"], ["1", "2"], ["3", "4"]],
+                         [[line.split(".")[0] for line in page] for page in pages])
+        self.assertEqual([2, 2, 2, 2], [len(called[0][0]) for called in rows.call_args_list])
+        self.assertEqual(call("Events 3-4 of 9. Press enter for more, p for the previous page or q to stop: "),
+                         prompt.call_args_list[1])
+
+        prompt = Mock(return_value="")
+        renderer = EventRenderer(page_size=4, stream=Mock(), prompt=prompt)
+        renderer.render(self.events * 3)
+        self.assertEqual(3, renderer.stream.write.call_count)
+        self.assertEqual(2, prompt.call_count)
+
+
 def main():
     get_suite = unittest.TestLoader().loadTestsFromTestCase(MyEventManagerTestGet)
     validate_suite = unittest.TestLoader().loadTestsFromTestCase(MyEventManagerTestValidate)
@@ -670,6 +2877,30 @@ def main():
     edit_suite = unittest.TestLoader().loadTestsFromTestCase(MyEventManagerTestEdit)
     JSON_suite = unittest.TestLoader().loadTestsFromTestCase(MyEventManagerTestJSON)
     helper_suite = unittest.TestLoader().loadTestsFromTestCase(MyEventManagerTestHelper)
+    paging_suite = unittest.TestLoader().loadTestsFromTestCase(MyEventManagerTestPaging)
+    cache_suite = unittest.TestLoader().loadTestsFromTestCase(MyEventManagerTestCache)
+    index_suite = unittest.TestLoader().loadTestsFromTestCase(MyEventManagerTestKeywordIndex)
+    bulk_add_suite = unittest.TestLoader().loadTestsFromTestCase(MyEventManagerTestBulkAdd)
+    bulk_update_suite = unittest.TestLoader().loadTestsFromTestCase(MyEventManagerTestBulkUpdate)
+    async_suite = unittest.TestLoader().loadTestsFromTestCase(MyEventManagerTestAsync)
+    sharding_suite = unittest.TestLoader().loadTestsFromTestCase(MyEventManagerTestSharding)
+    credentials_suite = unittest.TestLoader().loadTestsFromTestCase(MyEventManagerTestCredentials)
+    projection_suite = unittest.TestLoader().loadTestsFromTestCase(MyEventManagerTestProjection)
+    event_model_suite = unittest.TestLoader().loadTestsFromTestCase(MyEventManagerTestEventModel)
+    bulk_import_suite = unittest.TestLoader().loadTestsFromTestCase(MyEventManagerTestBulkImport)
+    bulk_export_suite = unittest.TestLoader().loadTestsFromTestCase(MyEventManagerTestBulkExport)
+    scheduler_suite = unittest.TestLoader().loadTestsFromTestCase(MyEventManagerTestScheduler)
+    conflicts_suite = unittest.TestLoader().loadTestsFromTestCase(MyEventManagerTestConflicts)
+    time_index_suite = unittest.TestLoader().loadTestsFromTestCase(MyEventManagerTestTimeIndex)
+    multi_calendar_suite = unittest.TestLoader().loadTestsFromTestCase(MyEventManagerTestMultiCalendar)
+    free_slots_suite = unittest.TestLoader().loadTestsFromTestCase(MyEventManagerTestFreeSlots)
+    recurring_suite = unittest.TestLoader().loadTestsFromTestCase(MyEventManagerTestRecurring)
+    time_zone_suite = unittest.TestLoader().loadTestsFromTestCase(MyEventManagerTestTimeZone)
+    batch_parsing_suite = unittest.TestLoader().loadTestsFromTestCase(MyEventManagerTestBatchParsing)
+    emulator_suite = unittest.TestLoader().loadTestsFromTestCase(MyEventManagerTestEmulator)
+    metrics_suite = unittest.TestLoader().loadTestsFromTestCase(MyEventManagerTestMetrics)
+    read_cache_suite = unittest.TestLoader().loadTestsFromTestCase(MyEventManagerTestReadCache)
+    renderer_suite = unittest.TestLoader().loadTestsFromTestCase(MyEventManagerTestRenderer)
 
     unittest.TextTestRunner(verbosity=2).run(get_suite)
     unittest.TextTestRunner(verbosity=2).run(validate_suite)
@@ -677,6 +2908,30 @@ def main():
     unittest.TextTestRunner(verbosity=2).run(edit_suite)
     unittest.TextTestRunner(verbosity=2).run(JSON_suite)
     unittest.TextTestRunner(verbosity=2).run(helper_suite)
+    unittest.TextTestRunner(verbosity=2).run(paging_suite)
+    unittest.TextTestRunner(verbosity=2).run(cache_suite)
+    unittest.TextTestRunner(verbosity=2).run(index_suite)
+    unittest.TextTestRunner(verbosity=2).run(bulk_add_suite)
+    unittest.TextTestRunner(verbosity=2).run(bulk_update_suite)
+    unittest.TextTestRunner(verbosity=2).run(async_suite)
+    unittest.TextTestRunner(verbosity=2).run(sharding_suite)
+    unittest.TextTestRunner(verbosity=2).run(credentials_suite)
+    unittest.TextTestRunner(verbosity=2).run(projection_suite)
+    unittest.TextTestRunner(verbosity=2).run(event_model_suite)
+    unittest.TextTestRunner(verbosity=2).run(bulk_import_suite)
+    unittest.TextTestRunner(verbosity=2).run(bulk_export_suite)
+    unittest.TextTestRunner(verbosity=2).run(scheduler_suite)
+    unittest.TextTestRunner(verbosity=2).run(conflicts_suite)
+    unittest.TextTestRunner(verbosity=2).run(time_index_suite)
+    unittest.TextTestRunner(verbosity=2).run(multi_calendar_suite)
+    unittest.TextTestRunner(verbosity=2).run(free_slots_suite)
+    unittest.TextTestRunner(verbosity=2).run(recurring_suite)
+    unittest.TextTestRunner(verbosity=2).run(time_zone_suite)
+    unittest.TextTestRunner(verbosity=2).run(batch_parsing_suite)
+    unittest.TextTestRunner(verbosity=2).run(emulator_suite)
+    unittest.TextTestRunner(verbosity=2).run(metrics_suite)
+    unittest.TextTestRunner(verbosity=2).run(read_cache_suite)
+    unittest.TextTestRunner(verbosity=2).run(renderer_suite)
 
 
 if __name__ == "__main__":